@@ -0,0 +1,56 @@
+"""meal entries and daily rollups
+
+Revision ID: 3b9e1f6c2d4a
+Revises: 72a4c674dcda
+Create Date: 2026-10-18 16:40:12.381905
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3b9e1f6c2d4a'
+down_revision: Union[str, Sequence[str], None] = '72a4c674dcda'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+NUTRIENT_COLUMNS = ('calories', 'protein', 'fat', 'carbohydrate', 'fiber', 'sugars', 'saturated_fat', 'sodium')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('meal_entries',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('dish_name', sa.String(), nullable=False),
+    sa.Column('description', sa.String(), nullable=True),
+    sa.Column('fdc_id', sa.Integer(), nullable=True),
+    sa.Column('servings', sa.Integer(), nullable=False),
+    *[sa.Column(name, sa.Float(), nullable=False) for name in NUTRIENT_COLUMNS],
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_meal_entries_id'), 'meal_entries', ['id'], unique=False)
+    op.create_index('ix_meal_entries_user_id_day', 'meal_entries', ['user_id', 'day'], unique=False)
+    op.create_table('daily_rollups',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('entries', sa.Integer(), nullable=False),
+    *[sa.Column(name, sa.Float(), nullable=False) for name in NUTRIENT_COLUMNS],
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('user_id', 'day')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('daily_rollups')
+    op.drop_index('ix_meal_entries_user_id_day', table_name='meal_entries')
+    op.drop_index(op.f('ix_meal_entries_id'), table_name='meal_entries')
+    op.drop_table('meal_entries')
@@ -0,0 +1,28 @@
+"""user token version
+
+Revision ID: 8d41c0a7e2f3
+Revises: 3b9e1f6c2d4a
+Create Date: 2026-10-19 10:12:44.205517
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8d41c0a7e2f3'
+down_revision: Union[str, Sequence[str], None] = '3b9e1f6c2d4a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('users', sa.Column('token_version', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('users', 'token_version')
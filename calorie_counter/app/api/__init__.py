@@ -1,3 +1,3 @@
 from .user import user_router
 from .calorie import calorie_router
-
+from .meal import meal_router
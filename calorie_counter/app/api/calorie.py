@@ -1,45 +1,215 @@
-from fastapi import APIRouter
-from app.schemas.calorie import CalorieCounterRequest, CalorieCounterResponse
+import asyncio
+import hashlib
+import json
+from typing import Optional
+from fastapi import APIRouter, Header, HTTPException, Query, Response
+from app.schemas.calorie import (
+    CalorieCounterRequest, CalorieCounterResponse, BatchCalorieRequest, BatchCalorieResponse,
+    BatchCalorieItem, BatchCalorieError
+)
 from app.models.user import User
 from app.utils.user import get_current_active_user
 from fastapi import Depends
-from app.utils.calorie import USDAFoodService, CalorieCounter, RedisCache
+from app.utils.calorie import (
+    USDAFoodService, RedisCache, CacheEntry, build_cache_value, normalize_dish_name, make_cache_key
+)
+from app.utils.single_flight import dish_lookups
+from app.utils.local_cache import publish_invalidation
+from app.utils.nutrients import nutrient_engine
+from app.utils.usda_quota import usda_quota, LIVE, BACKGROUND
+from app.utils.suggest import suggestion_index
+from app.core.config import settings
 
 
 calorie_router = APIRouter(prefix="", tags=["calorie"])
 
 
+async def lookup_dish(dish_name: str, cache_key: str, cache: RedisCache, priority: int = LIVE):
+    # Getting the best matched food from the USDA FoodData Central
+    service = USDAFoodService(dish_name=dish_name, priority=priority)
+    best_matched_food = await service.get_best_match()
+
+    # Calculating the calories and macros per serving
+    cache_value = build_cache_value(best_matched_food)
+    await cache.set_cache(cache_key, cache_value)
+    return cache_value
+
+
+async def refresh_dish(dish_name: str, cache_key: str):
+    # Runs under the cross-worker refresh lock. Other workers serve the stale
+    # entry from their L1 until told otherwise, so one may take the lock right
+    # after another's refresh: re-read Redis first, and publish the new value.
+    cache = RedisCache()
+    cache_entry = await cache.get_entry(cache_key, skip_local=True)
+    if cache_entry is not None and not cache_entry.is_stale:
+        return cache_entry.value
+    cache_value = await lookup_dish(dish_name, cache_key, cache, priority=BACKGROUND)
+    await publish_invalidation(cache_key)
+    return cache_value
+
+
+# Upstream failures for which an expired cached value beats an error
+UPSTREAM_UNAVAILABLE = {429, 502, 503, 504}
+
+
+async def resolve_dish(dish_name: str, cache: RedisCache, cache_entry: Optional[CacheEntry]):
+    cache_key = make_cache_key(dish_name)
+    if cache_entry is None or cache_entry.is_expired:
+        # Concurrent misses for the same dish share a single USDA lookup
+        try:
+            return await dish_lookups.run(
+                cache_key,
+                lambda: lookup_dish(dish_name, cache_key, cache),
+                wait_for_fill=lambda: cache.get_cache(cache_key)
+            )
+        except HTTPException as e:
+            if cache_entry is None or e.status_code not in UPSTREAM_UNAVAILABLE:
+                raise
+            # USDA is down or rejecting us: serve the last known good value
+            return {**cache_entry.value, "stale": True}
+
+    if cache_entry.is_stale:
+        # Serve the stale value now and revalidate it in the background
+        dish_lookups.refresh_in_background(cache_key, lambda: refresh_dish(dish_name, cache_key))
+    return cache_entry.value
+
+
+def build_response(cached_value: dict, servings: int):
+    calories_per_serving = float(cached_value["calories_per_serving"])
+    total_calories = round(calories_per_serving * servings, 2)
+    return CalorieCounterResponse(
+        dish_name=cached_value["description"],
+        servings=servings,
+        calories_per_serving=calories_per_serving,
+        total_calories=total_calories,
+        nutrients_per_serving=cached_value.get("nutrients"),
+        serving_grams=cached_value.get("serving_grams"),
+        serving_description=cached_value.get("serving_description"),
+        stale=cached_value.get("stale", False)
+    )
+
+
+def calorie_etag(cached_value: dict, servings: int) -> str:
+    # Strong validator: a response is fully determined by the matched food,
+    # the cache version (bumped whenever matching or nutrient math changes)
+    # and the servings. Foods without an fdcId are identified by their values.
+    food = cached_value.get("fdc_id")
+    if food is None:
+        food = hashlib.sha1(json.dumps(cached_value, sort_keys=True).encode()).hexdigest()[:16]
+    return f'"v{settings.cache_version}-{food}-{servings}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    # If-None-Match uses the weak comparison, so W/"x" matches "x"
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or any(tag.removeprefix("W/") == etag for tag in tags)
+
+
+def calorie_cache_control() -> str:
+    scope = "public" if settings.calorie_cache_public else "private"
+    return (f"{scope}, max-age={settings.calorie_max_age}, "
+            f"stale-while-revalidate={settings.calorie_stale_while_revalidate}")
+
+
+@calorie_router.get("/cache/stats")
+async def get_cache_stats(user: User = Depends(get_current_active_user)):
+    return {**RedisCache.get_stats(), "single_flight": dict(dish_lookups.stats), "usda_quota": dict(usda_quota.stats)}
+
+
 @calorie_router.post("/get-calories")
 async def get_calories(request: CalorieCounterRequest, user: User = Depends(get_current_active_user)):
     # Checking if the dish name is in the cache
     cache = RedisCache()
-    cached_value = cache.get_cache(request.dish_name)
-    if cached_value:
-        description = cached_value["description"]
-        calories_per_serving = cached_value["calories_per_serving"]
-        calories_per_serving = float(calories_per_serving)
-        total_calories = round(calories_per_serving * request.servings, 2)
-        return CalorieCounterResponse(
-            dish_name=description,
-            servings=request.servings,
-            calories_per_serving=calories_per_serving,
-            total_calories=total_calories
-        )
+    dish_name = normalize_dish_name(request.dish_name)
+    cache_entry = await cache.get_entry(make_cache_key(dish_name))
+    cached_value = await resolve_dish(dish_name, cache, cache_entry)
+    suggestion_index.record_hit(dish_name)
+    return build_response(cached_value, request.servings)
 
-    # Getting the best matched food from the USDA FoodData Central
-    service = USDAFoodService(dish_name=request.dish_name)
-    best_matched_food = await service.get_best_match()
 
-    # Calculating the calories per serving
-    calorie_counter = CalorieCounter(best_matched_food)
-    calories_per_serving = calorie_counter.get_calories_per_serving()
-    cache_value = {"description": best_matched_food["description"], "calories_per_serving": calories_per_serving}
-    cache.set_cache(request.dish_name, cache_value)
+@calorie_router.get("/calories/{dish_name}", response_model=CalorieCounterResponse)
+async def get_dish_calories(response: Response, dish_name: str,
+                            servings: int = Query(default=1, ge=1, le=1000),
+                            if_none_match: Optional[str] = Header(default=None),
+                            user: User = Depends(get_current_active_user)):
+    # Cacheable counterpart of POST /get-calories for browsers, CDNs and proxies
+    dish_name = normalize_dish_name(dish_name)
+    if not dish_name:
+        raise HTTPException(status_code=422, detail="Dish name should not be empty")
+    cache = RedisCache()
+    cache_entry = await cache.get_entry(make_cache_key(dish_name))
+    cached_value = await resolve_dish(dish_name, cache, cache_entry)
+    suggestion_index.record_hit(dish_name)
 
-    total_calories = round(calories_per_serving * request.servings, 2)
-    return CalorieCounterResponse(
-        dish_name=best_matched_food["description"],
-        servings=request.servings,
-        calories_per_serving=calories_per_serving,
-        total_calories=total_calories
-    )
\ No newline at end of file
+    if cached_value.get("stale"):
+        # A fallback served during a USDA outage must not outlive it downstream
+        response.headers["Cache-Control"] = "no-store"
+        return build_response(cached_value, servings)
+
+    etag = calorie_etag(cached_value, servings)
+    headers = {"ETag": etag, "Cache-Control": calorie_cache_control()}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return build_response(cached_value, servings)
+
+
+@calorie_router.get("/foods/suggest")
+async def suggest_foods(q: str = Query(..., min_length=1, max_length=100),
+                        limit: int = Query(default=None, ge=1),
+                        user: User = Depends(get_current_active_user)):
+    limit = min(limit or settings.suggest_max_results, settings.suggest_max_results)
+    suggestions = suggestion_index.suggest(q, limit)
+    return {"query": q, "suggestions": [
+        {"dish_name": name, "popularity": popularity} for name, popularity in suggestions
+    ]}
+
+
+@calorie_router.post("/get-calories/batch")
+async def get_calories_batch(request: BatchCalorieRequest, user: User = Depends(get_current_active_user)):
+    cache = RedisCache()
+    dish_names = list(dict.fromkeys(normalize_dish_name(item.dish_name) for item in request.items))
+    cache_entries = await cache.get_entries([make_cache_key(dish_name) for dish_name in dish_names])
+
+    # Cache hits return immediately; misses fan out to USDA a few at a time
+    semaphore = asyncio.Semaphore(settings.batch_usda_concurrency)
+
+    async def resolve(dish_name: str, cache_entry: Optional[CacheEntry]):
+        if cache_entry is not None and not cache_entry.is_expired:
+            return await resolve_dish(dish_name, cache, cache_entry)
+        async with semaphore:
+            return await resolve_dish(dish_name, cache, cache_entry)
+
+    results = await asyncio.gather(
+        *[resolve(dish_name, cache_entry) for dish_name, cache_entry in zip(dish_names, cache_entries)],
+        return_exceptions=True
+    )
+    resolved = dict(zip(dish_names, results))
+
+    items = []
+    for item in request.items:
+        result = resolved[normalize_dish_name(item.dish_name)]
+        if isinstance(result, HTTPException):
+            error = BatchCalorieError(code=result.status_code, message=str(result.detail))
+            items.append(BatchCalorieItem(dish_name=item.dish_name, servings=item.servings, error=error))
+        elif isinstance(result, BaseException):
+            raise result
+        else:
+            items.append(BatchCalorieItem(
+                dish_name=item.dish_name, servings=item.servings, result=build_response(result, item.servings)
+            ))
+
+    resolved_items = [item for item in items if item.result is not None]
+    profiled_items = [item for item in resolved_items if item.result.nutrients_per_serving]
+    return BatchCalorieResponse(
+        items=items,
+        total_calories=round(sum(item.result.total_calories for item in resolved_items), 2),
+        total_nutrients=nutrient_engine.totals(
+            [item.result.nutrients_per_serving for item in profiled_items],
+            [item.servings for item in profiled_items]
+        ),
+        resolved_items=len(resolved_items),
+        failed_items=len(items) - len(resolved_items)
+    )
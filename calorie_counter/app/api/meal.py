@@ -0,0 +1,95 @@
+from datetime import date, datetime, timedelta, timezone
+from fastapi import APIRouter, Depends, Query, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.api.calorie import resolve_dish
+from app.core.config import settings
+from app.core.database import get_async_db
+from app.crud.meal import MealCrud
+from app.models.meal import NUTRIENT_COLUMNS
+from app.models.user import User
+from app.schemas.meal import MealEntryRequest, MealEntryResponse, DailyTotals, MealHistoryResponse
+from app.utils.calorie import RedisCache, normalize_dish_name, make_cache_key
+from app.utils.meal_log import meal_log_writer
+from app.utils.user import get_current_active_user
+
+
+meal_router = APIRouter(prefix="/meals", tags=["meals"])
+
+
+def today() -> date:
+    return datetime.now(timezone.utc).date()
+
+
+async def get_daily_totals(db: AsyncSession, user_id: int, start: date, end: date):
+    # Committed rollups plus this worker's not yet flushed entries
+    days = {
+        rollup.day: {name: getattr(rollup, name) for name in ("entries", *NUTRIENT_COLUMNS)}
+        for rollup in await MealCrud(db).get_rollups(user_id, start, end)
+    }
+    for day, delta in meal_log_writer.pending_totals(user_id, start, end).items():
+        totals = days.setdefault(day, {name: 0 for name in delta})
+        for name, value in delta.items():
+            totals[name] += value
+    return [
+        DailyTotals(
+            day=day,
+            entries=totals["entries"],
+            calories=round(totals["calories"], 2),
+            nutrients={name: round(totals[name], 2) for name in NUTRIENT_COLUMNS if name != "calories"}
+        )
+        for day, totals in sorted(days.items())
+    ]
+
+
+@meal_router.post("", status_code=status.HTTP_202_ACCEPTED)
+async def log_meal(request: MealEntryRequest, user: User = Depends(get_current_active_user)):
+    cache = RedisCache()
+    dish_name = normalize_dish_name(request.dish_name)
+    cache_entry = await cache.get_entry(make_cache_key(dish_name))
+    cached_value = await resolve_dish(dish_name, cache, cache_entry)
+
+    per_serving = cached_value.get("nutrients") or {}
+    row = {
+        "user_id": user.id,
+        "day": request.day or today(),
+        "dish_name": dish_name,
+        "description": cached_value["description"],
+        "fdc_id": cached_value.get("fdc_id"),
+        "servings": request.servings,
+        "calories": round(float(cached_value["calories_per_serving"]) * request.servings, 2),
+        **{name: round(per_serving.get(name, 0.0) * request.servings, 2)
+           for name in NUTRIENT_COLUMNS if name != "calories"}
+    }
+    meal_log_writer.enqueue(row)
+    return MealEntryResponse(
+        dish_name=dish_name,
+        description=row["description"],
+        servings=row["servings"],
+        day=row["day"],
+        calories=row["calories"],
+        nutrients={name: row[name] for name in NUTRIENT_COLUMNS if name != "calories"}
+    )
+
+
+# Totals come from the primary: the writer flushes there, and a lagging replica
+# would drop entries that have just left the pending queue.
+@meal_router.get("/today")
+async def get_today(user: User = Depends(get_current_active_user), db: AsyncSession = Depends(get_async_db)):
+    day = today()
+    days = await get_daily_totals(db, user.id, day, day)
+    return days[0] if days else DailyTotals(
+        day=day, entries=0, calories=0.0, nutrients={name: 0.0 for name in NUTRIENT_COLUMNS if name != "calories"}
+    )
+
+
+@meal_router.get("/history")
+async def get_history(days: int = Query(default=30, ge=1),
+                      user: User = Depends(get_current_active_user),
+                      db: AsyncSession = Depends(get_async_db)):
+    end = today()
+    start = end - timedelta(days=min(days, settings.meal_history_max_days) - 1)
+    daily_totals = await get_daily_totals(db, user.id, start, end)
+    return MealHistoryResponse(
+        days=daily_totals,
+        total_calories=round(sum(totals.calories for totals in daily_totals), 2)
+    )
@@ -5,7 +5,7 @@ from sqlalchemy.exc import IntegrityError
 from app.schemas.user import SignUpRequest, LoginRequest
 from app.crud.user import UserCrud
 from app.models.user import User
-from app.utils.user import UserService
+from app.utils.user import UserService, get_current_active_user
 from fastapi.responses import JSONResponse
 
 
@@ -23,11 +23,13 @@ async def user_registration(request: SignUpRequest, db: AsyncSession = Depends(g
     try:
         user = await user_crud.create_user(User(
             email=request.email,
-            password=user_service.hash_password(request.password),
+            password=await user_service.hash_password(request.password),
             first_name=request.first_name,
             last_name=request.last_name
         ))
-        access_token = user_service.create_access_token(data={"sub": user.email, "user_id": user.id})
+        access_token = user_service.create_access_token(data={
+            "sub": user.email, "user_id": user.id, "ver": user.token_version or 0
+        })
         return JSONResponse(
             status_code=status.HTTP_201_CREATED,
             content={"message": "User created successfully", "access_token": access_token})
@@ -47,10 +49,25 @@ async def user_login(request: LoginRequest, db: AsyncSession = Depends(get_async
     if not user:
         raise HTTPException(status_code=400, detail="Invalid Credentials")
 
-    if not user_service.verify_password(request.password, user.password):
+    verified, new_hash = await user_service.verify_password(request.password, user.password)
+    if not verified:
         raise HTTPException(status_code=400, detail="Invalid Credentials")
 
-    access_token = user_service.create_access_token(data={"sub": user.email, "user_id": user.id})
+    if new_hash:
+        # Stored hash uses an outdated cost factor; upgrade it transparently
+        await user_crud.update_password(user, new_hash)
+
+    access_token = user_service.create_access_token(data={
+        "sub": user.email, "user_id": user.id, "ver": user.token_version or 0
+    })
     return JSONResponse(
         status_code=status.HTTP_200_OK, 
-        content={"message": "Login successful", "access_token": access_token})
\ No newline at end of file
+        content={"message": "Login successful", "access_token": access_token})
+
+
+@user_router.post("/revoke-tokens")
+async def revoke_tokens(user: User = Depends(get_current_active_user), db: AsyncSession = Depends(get_async_db)):
+    await UserService().revoke_tokens(db, user.id)
+    return JSONResponse(
+        status_code=status.HTTP_200_OK,
+        content={"message": "All access tokens revoked"})
\ No newline at end of file
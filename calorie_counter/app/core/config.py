@@ -1,5 +1,6 @@
 import os
 from pathlib import Path
+from typing import Literal, Optional
 from pydantic_settings import BaseSettings
 from pydantic import Field
 
@@ -10,22 +11,125 @@ class Settings(BaseSettings):
     db_host: str = Field(..., env="DB_HOST")
     db_port: int = Field(..., env="DB_PORT")
     db_name: str = Field(..., env="DB_NAME")
+    db_pool_size: int = Field(default=10, env="DB_POOL_SIZE")
+    db_max_overflow: int = Field(default=10, env="DB_MAX_OVERFLOW")
+    db_pool_timeout: float = Field(default=5.0, env="DB_POOL_TIMEOUT")
+    db_pool_recycle: int = Field(default=300, env="DB_POOL_RECYCLE")
+    db_pool_pre_ping: bool = Field(default=False, env="DB_POOL_PRE_PING")
+    db_statement_cache_size: int = Field(default=100, env="DB_STATEMENT_CACHE_SIZE")
+    db_replica_host: Optional[str] = Field(default=None, env="DB_REPLICA_HOST")
+    db_replica_port: Optional[int] = Field(default=None, env="DB_REPLICA_PORT")
+    db_replica_name: Optional[str] = Field(default=None, env="DB_REPLICA_NAME")
     debug: bool = Field(..., env="DEBUG")
 
     jwt_secret_key: str = Field(..., env="JWT_SECRET_KEY")
     jwt_algorithm: str = Field(default="HS256", env="JWT_ALGORITHM")
     jwt_access_token_expire_minutes: int = Field(default=30, env="JWT_ACCESS_TOKEN_EXPIRE_MINUTES")
+    auth_mode: Literal["strict", "trusted"] = Field(default="trusted", env="AUTH_MODE")
+    principal_cache_ttl: int = Field(default=300, env="PRINCIPAL_CACHE_TTL")
+    principal_local_ttl: float = Field(default=5.0, env="PRINCIPAL_LOCAL_TTL")
+    principal_cache_max_size: int = Field(default=10000, env="PRINCIPAL_CACHE_MAX_SIZE")
+
+    bcrypt_rounds: int = Field(default=12, env="BCRYPT_ROUNDS")
+    password_hash_workers: int = Field(default=2, env="PASSWORD_HASH_WORKERS")
+    password_hash_max_waiting: int = Field(default=32, env="PASSWORD_HASH_MAX_WAITING")
 
     usda_api_url: str = Field(..., env="USDA_API_URL")
     usda_api_key: str = Field(..., env="USDA_API_KEY")
-    usda_page_size: int = Field(default=5, env="USDA_PAGE_SIZE")
+    usda_page_size: int = Field(default=50, env="USDA_PAGE_SIZE")
+    usda_foods_url: str = Field(default="https://api.nal.usda.gov/fdc/v1/foods", env="USDA_FOODS_URL")
+    usda_details_batch_size: int = Field(default=20, env="USDA_DETAILS_BATCH_SIZE")
+    usda_details_batch_window: float = Field(default=0.005, env="USDA_DETAILS_BATCH_WINDOW")
+    usda_details_ttl: int = Field(default=2592000, env="USDA_DETAILS_TTL")
+    usda_http2: bool = Field(default=False, env="USDA_HTTP2")
+    usda_max_connections: int = Field(default=20, env="USDA_MAX_CONNECTIONS")
+    usda_max_keepalive_connections: int = Field(default=10, env="USDA_MAX_KEEPALIVE_CONNECTIONS")
+    usda_keepalive_expiry: float = Field(default=30.0, env="USDA_KEEPALIVE_EXPIRY")
+    usda_connect_timeout: float = Field(default=3.0, env="USDA_CONNECT_TIMEOUT")
+    usda_read_timeout: float = Field(default=10.0, env="USDA_READ_TIMEOUT")
+    usda_pool_timeout: float = Field(default=5.0, env="USDA_POOL_TIMEOUT")
+    usda_attempt_timeout: float = Field(default=3.0, env="USDA_ATTEMPT_TIMEOUT")
+    usda_deadline: float = Field(default=8.0, env="USDA_DEADLINE")
+    usda_retry_attempts: int = Field(default=2, env="USDA_RETRY_ATTEMPTS")
+    usda_retry_base_delay: float = Field(default=0.2, env="USDA_RETRY_BASE_DELAY")
+    usda_retry_max_delay: float = Field(default=2.0, env="USDA_RETRY_MAX_DELAY")
+    usda_breaker_threshold: int = Field(default=5, env="USDA_BREAKER_THRESHOLD")
+    usda_breaker_window: float = Field(default=30.0, env="USDA_BREAKER_WINDOW")
+    usda_breaker_open_seconds: float = Field(default=30.0, env="USDA_BREAKER_OPEN_SECONDS")
+    usda_quota_limit: int = Field(default=1000, env="USDA_QUOTA_LIMIT")
+    usda_quota_window: float = Field(default=3600.0, env="USDA_QUOTA_WINDOW")
+    usda_quota_background_reserve: float = Field(default=0.2, env="USDA_QUOTA_BACKGROUND_RESERVE")
+    usda_quota_live_max_wait: float = Field(default=2.0, env="USDA_QUOTA_LIVE_MAX_WAIT")
+    usda_quota_background_max_wait: float = Field(default=60.0, env="USDA_QUOTA_BACKGROUND_MAX_WAIT")
+    usda_quota_max_waiting: int = Field(default=1000, env="USDA_QUOTA_MAX_WAITING")
+    usda_quota_max_poll_interval: float = Field(default=1.0, env="USDA_QUOTA_MAX_POLL_INTERVAL")
+
+    food_index_path: str = Field(default="", env="FOOD_INDEX_PATH")
+    food_index_candidates: int = Field(default=20, env="FOOD_INDEX_CANDIDATES")
+    food_index_min_score: float = Field(default=1.0, env="FOOD_INDEX_MIN_SCORE")
 
     redis_host: str = Field(..., env="REDIS_HOST")
     redis_port: int = Field(..., env="REDIS_PORT")
     redis_db: int = Field(..., env="REDIS_DB")
+    redis_max_connections: int = Field(default=50, env="REDIS_MAX_CONNECTIONS")
+    redis_pool_timeout: float = Field(default=2.0, env="REDIS_POOL_TIMEOUT")
+    redis_socket_timeout: float = Field(default=1.0, env="REDIS_SOCKET_TIMEOUT")
+
+    cache_namespace: str = Field(default="calories", env="CACHE_NAMESPACE")
+    cache_version: int = Field(default=4, env="CACHE_VERSION")
+    cache_soft_ttl: int = Field(default=86400, env="CACHE_SOFT_TTL")
+    cache_hard_ttl: int = Field(default=604800, env="CACHE_HARD_TTL")
+    cache_stale_ttl: int = Field(default=2592000, env="CACHE_STALE_TTL")
+    l1_cache_max_size: int = Field(default=1000, env="L1_CACHE_MAX_SIZE")
+    l1_cache_ttl: float = Field(default=60.0, env="L1_CACHE_TTL")
+    cache_invalidation_channel: str = Field(default="cache:invalidate", env="CACHE_INVALIDATION_CHANNEL")
+    cache_codec: str = Field(default="json", env="CACHE_CODEC")
+    cache_compress_min_bytes: int = Field(default=0, env="CACHE_COMPRESS_MIN_BYTES")
+    cache_hash_buckets: int = Field(default=0, env="CACHE_HASH_BUCKETS")
+    cache_hash_field_ttl: bool = Field(default=False, env="CACHE_HASH_FIELD_TTL")
+    cache_legacy_reads: bool = Field(default=True, env="CACHE_LEGACY_READS")
+    cache_sweep_interval: float = Field(default=3600.0, env="CACHE_SWEEP_INTERVAL")
+    cache_sweep_batch: int = Field(default=500, env="CACHE_SWEEP_BATCH")
+
+    single_flight_lock_ttl: float = Field(default=10.0, env="SINGLE_FLIGHT_LOCK_TTL")
+    single_flight_wait_timeout: float = Field(default=5.0, env="SINGLE_FLIGHT_WAIT_TIMEOUT")
+    single_flight_poll_interval: float = Field(default=0.05, env="SINGLE_FLIGHT_POLL_INTERVAL")
+
+    batch_max_items: int = Field(default=50, env="BATCH_MAX_ITEMS")
+    batch_usda_concurrency: int = Field(default=4, env="BATCH_USDA_CONCURRENCY")
+    batch_rate_limit_cost: int = Field(default=1, env="BATCH_RATE_LIMIT_COST")
+
+    calorie_max_age: int = Field(default=3600, env="CALORIE_MAX_AGE")
+    calorie_stale_while_revalidate: int = Field(default=86400, env="CALORIE_STALE_WHILE_REVALIDATE")
+    calorie_cache_public: bool = Field(default=False, env="CALORIE_CACHE_PUBLIC")
+
+    suggest_max_entries: int = Field(default=200000, env="SUGGEST_MAX_ENTRIES")
+    suggest_scan_limit: int = Field(default=1000, env="SUGGEST_SCAN_LIMIT")
+    suggest_max_results: int = Field(default=10, env="SUGGEST_MAX_RESULTS")
+    suggest_sync_interval: float = Field(default=30.0, env="SUGGEST_SYNC_INTERVAL")
+    suggest_sync_size: int = Field(default=5000, env="SUGGEST_SYNC_SIZE")
+    suggest_redis_key: str = Field(default="suggest:popularity", env="SUGGEST_REDIS_KEY")
+    suggest_rate_limit_cost: int = Field(default=0, env="SUGGEST_RATE_LIMIT_COST")
 
     rate_limit_time: int = Field(default=5, env="RATE_LIMIT_TIME")
     rate_limit: int = Field(default=1, env="RATE_LIMIT")
+    rate_limit_algorithm: Literal["fixed_window", "sliding_window", "token_bucket"] = Field(
+        default="fixed_window", env="RATE_LIMIT_ALGORITHM")
+    rate_limit_local_max_keys: int = Field(default=10000, env="RATE_LIMIT_LOCAL_MAX_KEYS")
+    rate_limit_redis_retry_interval: float = Field(default=5.0, env="RATE_LIMIT_REDIS_RETRY_INTERVAL")
+
+    prometheus_multiproc_dir: str = Field(default="", env="PROMETHEUS_MULTIPROC_DIR")
+
+    profile_sample_rate: float = Field(default=0.0, env="PROFILE_SAMPLE_RATE")
+    profile_token: str = Field(default="", env="PROFILE_TOKEN")
+    profile_dir: str = Field(default="/tmp/calorie-counter-profiles", env="PROFILE_DIR")
+    profile_max_files: int = Field(default=200, env="PROFILE_MAX_FILES")
+    profile_min_duration_ms: float = Field(default=0.0, env="PROFILE_MIN_DURATION_MS")
+
+    meal_log_batch_size: int = Field(default=500, env="MEAL_LOG_BATCH_SIZE")
+    meal_log_flush_interval: float = Field(default=1.0, env="MEAL_LOG_FLUSH_INTERVAL")
+    meal_log_max_pending: int = Field(default=10000, env="MEAL_LOG_MAX_PENDING")
+    meal_history_max_days: int = Field(default=90, env="MEAL_HISTORY_MAX_DAYS")
 
     class Config:
         env_file = Path(__file__).parent.parent.parent.parent / ".env"
@@ -35,6 +139,15 @@ class Settings(BaseSettings):
     def database_url(self):
         return f"postgresql+asyncpg://{self.db_user}:{self.db_password}@{self.db_host}:{self.db_port}/{self.db_name}"
     
+    @property
+    def database_replica_url(self):
+        # Same credentials as the primary; unset parts default to the primary's
+        if not self.db_replica_host and not self.db_replica_name:
+            return None
+        host = self.db_replica_host or self.db_host
+        port = self.db_replica_port or self.db_port
+        return f"postgresql+asyncpg://{self.db_user}:{self.db_password}@{host}:{port}/{self.db_replica_name or self.db_name}"
+
     @property
     def database_url_sync(self):
         return f"postgresql+psycopg2://{self.db_user}:{self.db_password}@{self.db_host}:{self.db_port}/{self.db_name}"
@@ -0,0 +1,49 @@
+import httpx
+from app.core.config import settings
+
+
+http_client = None
+
+
+def init_http_client(transport: httpx.AsyncBaseTransport = None):
+    # Process-wide client so USDA lookups reuse keep-alive connections instead
+    # of paying DNS, TCP and TLS setup on every cache miss.
+    global http_client
+    if http_client is None:
+        http_client = httpx.AsyncClient(
+            http2=settings.usda_http2,
+            transport=transport,
+            limits=httpx.Limits(
+                max_connections=settings.usda_max_connections,
+                max_keepalive_connections=settings.usda_max_keepalive_connections,
+                keepalive_expiry=settings.usda_keepalive_expiry
+            ),
+            timeout=httpx.Timeout(
+                settings.usda_read_timeout,
+                connect=settings.usda_connect_timeout,
+                pool=settings.usda_pool_timeout
+            )
+        )
+    return http_client
+
+
+def usda_attempt_timeout() -> httpx.Timeout:
+    # Per-attempt timeouts for USDA calls: reads and writes are also capped by
+    # USDA_ATTEMPT_TIMEOUT, while connecting and waiting for a pooled
+    # connection keep their own limits
+    return httpx.Timeout(
+        min(settings.usda_read_timeout, settings.usda_attempt_timeout),
+        connect=settings.usda_connect_timeout,
+        pool=settings.usda_pool_timeout
+    )
+
+
+def get_http_client():
+    return http_client if http_client is not None else init_http_client()
+
+
+async def close_http_client():
+    global http_client
+    if http_client is not None:
+        await http_client.aclose()
+        http_client = None
@@ -0,0 +1,90 @@
+import os
+import time
+from app.core.config import settings
+
+# prometheus_client picks its storage when first imported: per-process mmap
+# files under PROMETHEUS_MULTIPROC_DIR when set, so every uvicorn worker's
+# samples are aggregated by whichever worker serves /metrics.
+# An empty value (as in .env.example) counts as unset: prometheus_client only
+# checks for presence and would write its files to the working directory.
+if settings.prometheus_multiproc_dir:
+    os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", settings.prometheus_multiproc_dir)
+if not os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+    os.environ.pop("PROMETHEUS_MULTIPROC_DIR", None)
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess
+)
+
+
+STAGE_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+STAGES = ("rate_limit", "jwt_decode", "user_lookup", "redis_get", "redis_set", "usda_quota", "usda_call", "usda_details",
+          "matcher", "nutrients")
+
+request_latency = Histogram(
+    "http_request_duration_seconds", "Request latency by route template and status",
+    ["method", "route", "status"]
+)
+stage_latency = Histogram(
+    "stage_duration_seconds", "Latency of individual request stages", ["stage"], buckets=STAGE_BUCKETS
+)
+cache_requests = Counter("cache_requests_total", "Dish cache lookups by tier and result", ["tier", "result"])
+usda_errors = Counter("usda_errors_total", "Failed USDA API calls by kind", ["kind"])
+db_pool_checkout = Histogram(
+    "db_pool_checkout_seconds", "Time spent waiting for a database connection from the pool", ["pool"],
+    buckets=STAGE_BUCKETS
+)
+# Pool saturation is db_pool_in_use / db_pool_capacity; both are summed over
+# live workers
+db_pool_in_use = Gauge(
+    "db_pool_in_use", "Database connections checked out of the pool", ["pool"], multiprocess_mode="livesum"
+)
+db_pool_capacity = Gauge(
+    "db_pool_capacity", "Database connections the pool may open (size plus overflow)", ["pool"],
+    multiprocess_mode="livesum"
+)
+db_pool_timeouts = Counter("db_pool_timeouts_total", "Checkouts that gave up waiting for a connection", ["pool"])
+
+# Label lookups are done once here rather than on every observation
+stage_timers = {stage: stage_latency.labels(stage) for stage in STAGES}
+cache_results = {
+    (tier, result): cache_requests.labels(tier, result) for tier in ("l1", "redis") for result in ("hit", "miss")
+}
+
+
+class StageTimer:
+    # `with time_stage("redis_get"):` observes the block's wall time
+
+    __slots__ = ("histogram", "started")
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.started)
+
+
+def time_stage(stage: str) -> StageTimer:
+    return StageTimer(stage_timers[stage])
+
+
+def count_cache(tier: str, hit: bool):
+    cache_results[(tier, "hit" if hit else "miss")].inc()
+
+
+def render_metrics():
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+
+
+def mark_worker_dead():
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        multiprocess.mark_process_dead(os.getpid())
@@ -0,0 +1,50 @@
+from collections import defaultdict
+from datetime import date
+from typing import Any, Dict, List
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import insert, select
+from sqlalchemy.dialects import postgresql, sqlite
+from app.models.meal import MealEntry, DailyRollup, NUTRIENT_COLUMNS
+
+
+def rollup_deltas(rows: List[Dict[str, Any]]) -> Dict[tuple, Dict[str, float]]:
+    # Sum a batch of meal entries per (user_id, day)
+    deltas = defaultdict(lambda: {"entries": 0, **{name: 0.0 for name in NUTRIENT_COLUMNS}})
+    for row in rows:
+        delta = deltas[(row["user_id"], row["day"])]
+        delta["entries"] += 1
+        for name in NUTRIENT_COLUMNS:
+            delta[name] += row[name]
+    return deltas
+
+
+class MealCrud:
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def add_entries(self, rows: List[Dict[str, Any]]):
+        # One executemany for the entries plus one upsert per touched
+        # (user, day), in a single transaction
+        await self.db.execute(insert(MealEntry), rows)
+        dialect = postgresql if self.db.bind.dialect.name == "postgresql" else sqlite
+        deltas = rollup_deltas(rows)
+        statement = dialect.insert(DailyRollup)
+        statement = statement.on_conflict_do_update(
+            index_elements=[DailyRollup.user_id, DailyRollup.day],
+            set_={
+                name: getattr(DailyRollup, name) + getattr(statement.excluded, name)
+                for name in ("entries", *NUTRIENT_COLUMNS)
+            }
+        )
+        await self.db.execute(statement, [
+            {"user_id": user_id, "day": day, **delta} for (user_id, day), delta in deltas.items()
+        ])
+        await self.db.commit()
+
+    async def get_rollups(self, user_id: int, start: date, end: date) -> List[DailyRollup]:
+        result = await self.db.execute(
+            select(DailyRollup)
+            .where(DailyRollup.user_id == user_id, DailyRollup.day >= start, DailyRollup.day <= end)
+            .order_by(DailyRollup.day)
+        )
+        return list(result.scalars().all())
@@ -1,5 +1,5 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, update
 from app.models.user import User
 
 
@@ -16,3 +16,19 @@ class UserCrud:
         await self.db.commit()
         await self.db.refresh(user)
         return user
+
+    async def update_password(self, user: User, password: str):
+        user.password = password
+        await self.db.commit()
+        await self.db.refresh(user)
+        return user
+
+    async def bump_token_version(self, user_id: int) -> int:
+        result = await self.db.execute(
+            update(User).where(User.id == user_id)
+            .values(token_version=User.token_version + 1)
+            .returning(User.token_version)
+        )
+        token_version = result.scalar_one()
+        await self.db.commit()
+        return token_version
@@ -0,0 +1,45 @@
+from app.core.database import Base
+from sqlalchemy import Column, Date, DateTime, Float, ForeignKey, Index, Integer, String, func
+
+
+NUTRIENT_COLUMNS = ("calories", "protein", "fat", "carbohydrate", "fiber", "sugars", "saturated_fat", "sodium")
+
+
+class MealEntry(Base):
+    __tablename__ = "meal_entries"
+    __table_args__ = (Index("ix_meal_entries_user_id_day", "user_id", "day"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    day = Column(Date, nullable=False)
+    dish_name = Column(String, nullable=False)
+    description = Column(String)
+    fdc_id = Column(Integer)
+    servings = Column(Integer, nullable=False)
+    calories = Column(Float, nullable=False, default=0.0)
+    protein = Column(Float, nullable=False, default=0.0)
+    fat = Column(Float, nullable=False, default=0.0)
+    carbohydrate = Column(Float, nullable=False, default=0.0)
+    fiber = Column(Float, nullable=False, default=0.0)
+    sugars = Column(Float, nullable=False, default=0.0)
+    saturated_fat = Column(Float, nullable=False, default=0.0)
+    sodium = Column(Float, nullable=False, default=0.0)
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+
+
+class DailyRollup(Base):
+    # One row per user per day, bumped by every flushed batch of meal entries
+    # so totals and history never scan meal_entries
+    __tablename__ = "daily_rollups"
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    entries = Column(Integer, nullable=False, default=0)
+    calories = Column(Float, nullable=False, default=0.0)
+    protein = Column(Float, nullable=False, default=0.0)
+    fat = Column(Float, nullable=False, default=0.0)
+    carbohydrate = Column(Float, nullable=False, default=0.0)
+    fiber = Column(Float, nullable=False, default=0.0)
+    sugars = Column(Float, nullable=False, default=0.0)
+    saturated_fat = Column(Float, nullable=False, default=0.0)
+    sodium = Column(Float, nullable=False, default=0.0)
@@ -9,4 +9,6 @@ class User(Base):
     first_name = Column(String)
     last_name = Column(String)
     email = Column(String, unique=True, index=True)
-    password = Column(String)
\ No newline at end of file
+    password = Column(String)
+    # Bumped to revoke every token issued before; tokens carry it as "ver"
+    token_version = Column(Integer, nullable=False, default=0, server_default="0")
\ No newline at end of file
@@ -1,4 +1,6 @@
+from typing import Dict, List, Optional
 from pydantic import BaseModel, field_validator
+from app.core.config import settings
 
 
 class CalorieCounterBase(BaseModel):
@@ -7,7 +9,7 @@ class CalorieCounterBase(BaseModel):
 
     @field_validator("dish_name")
     def validate_dish_name(cls, value):
-        if not value:
+        if not value.strip():
             raise ValueError("Dish name should not be empty")
         return value
 
@@ -25,4 +27,40 @@ class CalorieCounterRequest(CalorieCounterBase):
 class CalorieCounterResponse(CalorieCounterBase):
     calories_per_serving: float
     total_calories: float
-    source: str = "USDA FoodData Central" 
\ No newline at end of file
+    nutrients_per_serving: Optional[Dict[str, float]] = None
+    serving_grams: Optional[float] = None
+    serving_description: Optional[str] = None
+    stale: bool = False
+    source: str = "USDA FoodData Central"
+
+
+class BatchCalorieRequest(BaseModel):
+    items: List[CalorieCounterRequest]
+
+    @field_validator("items")
+    def validate_items(cls, value):
+        if not value:
+            raise ValueError("At least one item is required")
+        if len(value) > settings.batch_max_items:
+            raise ValueError(f"At most {settings.batch_max_items} items are allowed")
+        return value
+
+
+class BatchCalorieError(BaseModel):
+    code: int
+    message: str
+
+
+class BatchCalorieItem(BaseModel):
+    dish_name: str
+    servings: int
+    result: Optional[CalorieCounterResponse] = None
+    error: Optional[BatchCalorieError] = None
+
+
+class BatchCalorieResponse(BaseModel):
+    items: List[BatchCalorieItem]
+    total_calories: float
+    total_nutrients: Dict[str, float]
+    resolved_items: int
+    failed_items: int
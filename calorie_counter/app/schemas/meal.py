@@ -0,0 +1,29 @@
+from datetime import date
+from typing import Dict, List, Optional
+from app.schemas.calorie import CalorieCounterBase
+from pydantic import BaseModel
+
+
+class MealEntryRequest(CalorieCounterBase):
+    day: Optional[date] = None
+
+
+class MealEntryResponse(BaseModel):
+    dish_name: str
+    description: str
+    servings: int
+    day: date
+    calories: float
+    nutrients: Dict[str, float]
+
+
+class DailyTotals(BaseModel):
+    day: date
+    entries: int
+    calories: float
+    nutrients: Dict[str, float]
+
+
+class MealHistoryResponse(BaseModel):
+    days: List[DailyTotals]
+    total_calories: float
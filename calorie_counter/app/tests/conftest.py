@@ -3,9 +3,11 @@ import pytest_asyncio
 from httpx import AsyncClient
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.pool import StaticPool
-from app.core.database import Base, get_async_db
+from app.core.database import Base, get_async_db, get_async_read_db
 from main import app
-from unittest.mock import patch, MagicMock
+from app.utils.local_cache import l1_cache, principal_cache
+from app.utils.circuit_breaker import usda_breaker
+from unittest.mock import patch, MagicMock, AsyncMock
 import tempfile
 
 
@@ -29,6 +31,7 @@ async def override_get_async_db():
         yield db
 
 app.dependency_overrides[get_async_db] = override_get_async_db
+app.dependency_overrides[get_async_read_db] = override_get_async_db
 
 
 @pytest_asyncio.fixture(scope="function")
@@ -53,16 +56,20 @@ async def client(setup_database):
 
 @pytest.fixture(autouse=True)
 def mock_redis():
-    with patch("app.utils.calorie.RedisCache") as mock_redis_class1, \
-         patch("main.RedisCache") as mock_redis_class2:
+    l1_cache.clear()
+    principal_cache.clear()
+    usda_breaker.reset()
+    mock_redis_client = AsyncMock()
+    # Principal cache and token version both miss
+    mock_redis_client.mget.return_value = [None, None]
+    mock_redis_client.get.return_value = None
+    # Rate limiter scripts answer {allowed, remaining, reset_ms, retry_ms}
+    mock_redis_client.evalsha.return_value = [1, 14, 60000, 0]
+    with patch("app.utils.calorie.RedisCache") as mock_redis_class, \
+         patch("app.core.database.redis_client", mock_redis_client):
         mock_redis_instance = MagicMock()
-        mock_redis_instance.get_cache.return_value = None
-        mock_redis_instance.set_cache.return_value = True
-        mock_redis_client = MagicMock()
-        mock_redis_client.incr.return_value = 1
-        mock_redis_client.expire.return_value = True
-        mock_redis_client.ttl.return_value = 60
+        mock_redis_instance.get_cache = AsyncMock(return_value=None)
+        mock_redis_instance.set_cache = AsyncMock(return_value=True)
         mock_redis_instance.redis_client = mock_redis_client
-        mock_redis_class1.return_value = mock_redis_instance
-        mock_redis_class2.return_value = mock_redis_instance
+        mock_redis_class.return_value = mock_redis_instance
         yield mock_redis_instance
@@ -0,0 +1,86 @@
+import math
+import time
+import pytest
+from unittest.mock import patch, MagicMock, AsyncMock
+from app.utils.cache_codec import StructCodec, JsonCodec, STRUCT_MAGIC, decode_entry
+from app.core.config import settings
+from app.utils.calorie import RedisCache, BucketSweeper
+
+
+PIZZA = {
+    "description": "Pizza, cheese, regular crust",
+    "fdc_id": 2345678,
+    "calories_per_serving": 266.0,
+    "nutrients": {"energy": 266.0, "protein": 11.39, "fat": 10.45, "carbohydrate": 33.33, "fiber": 2.3,
+                  "sugars": 3.59, "saturated_fat": 4.78, "sodium": 598.0}
+}
+
+
+class TestCacheCodec:
+
+    def test_struct_round_trip_is_lossless_and_compact(self):
+        payload = StructCodec().encode(PIZZA, 1700000000.5, 1700600000.5)
+
+        assert payload[0] == STRUCT_MAGIC
+        assert len(payload) < len(JsonCodec().encode(PIZZA, 1700000000.5, 1700600000.5)) / 3
+        assert decode_entry(payload) == (PIZZA, 1700000000.0, 1700600000.0)
+
+    def test_serving_round_trips_after_the_macros(self):
+        codec = StructCodec()
+        for text in ("1 slice", None):
+            value = {**PIZZA, "serving_grams": 107.5, "serving_description": text}
+            payload = codec.encode(value, 0, math.inf)
+            assert payload[0] == STRUCT_MAGIC
+            assert decode_entry(payload) == (value, 0, math.inf)
+
+    def test_values_outside_the_layout_fall_back_to_json(self):
+        codec = StructCodec(compress_min_bytes=1)
+        unrounded = {**PIZZA, "calories_per_serving": 266.666}
+        legacy = {"description": "Pizza", "calories_per_serving": 266.0}
+
+        for value in (unrounded, legacy):
+            payload = codec.encode(value, 0, math.inf)
+            assert payload.startswith(b"{")
+            assert decode_entry(payload) == (value, 0, math.inf)
+
+
+class TestBucketedCache:
+
+    @pytest.mark.asyncio
+    async def test_reads_buckets_then_legacy_keys(self):
+        pipe = MagicMock()
+        pipe.__aenter__.return_value = pipe
+        pipe.execute = AsyncMock(return_value=[None, StructCodec().encode(PIZZA, 0, math.inf)])
+        redis_client = AsyncMock()
+        redis_client.pipeline = MagicMock(return_value=pipe)
+        redis_client.mget.return_value = [JsonCodec().encode({"description": "Pasta"}, 0, math.inf)]
+
+        with patch("app.utils.calorie.get_redis_client", return_value=redis_client), \
+             patch("app.utils.calorie.settings.cache_hash_buckets", 16):
+            entries = await RedisCache().get_entries(["calories:v4:pasta", "calories:v4:pizza"])
+
+        bucket, field = pipe.hget.call_args_list[1].args
+        assert bucket.startswith("calories:buckets:v4:") and field == "pizza"
+        redis_client.mget.assert_awaited_once_with(["calories:v4:pasta"])
+        assert [entry.value["description"] for entry in entries] == ["Pasta", PIZZA["description"]]
+
+    @pytest.mark.asyncio
+    async def test_sweep_deletes_fields_past_their_stale_window(self):
+        now = time.time()
+        fields = {
+            b"pizza": JsonCodec().encode(PIZZA, now, now - settings.cache_stale_ttl - 1),
+            b"pasta": JsonCodec().encode({"description": "Pasta"}, now, now - 1),
+        }
+
+        async def hscan_iter(bucket, count):
+            for field, cache in (fields if bucket.endswith(":0") else {}).items():
+                yield field, cache
+
+        redis_client = AsyncMock()
+        redis_client.hscan_iter = hscan_iter
+        redis_client.hdel.return_value = 1
+        with patch("app.utils.calorie.get_redis_client", return_value=redis_client), \
+             patch("app.utils.calorie.settings.cache_hash_buckets", 2):
+            assert await BucketSweeper("sweep_lock").sweep() == 1
+
+        redis_client.hdel.assert_awaited_once_with("calories:buckets:v4:0", b"pizza")
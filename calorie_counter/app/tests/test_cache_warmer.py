@@ -0,0 +1,49 @@
+import asyncio
+import pytest
+from unittest.mock import patch, MagicMock, AsyncMock
+from fastapi import HTTPException
+from app.utils.cache_warmer import CacheWarmer
+from app.utils.calorie import make_cache_key
+
+
+class TestCacheWarmer:
+
+    @pytest.mark.asyncio
+    async def test_warms_in_batches_and_resumes_from_state(self, tmp_path):
+        state = tmp_path / "dishes.warmed"
+        state.write_text("apple\n")
+
+        async def get_best_match(dish_name):
+            if dish_name == "nope":
+                raise HTTPException(status_code=404, detail="Dish Not Found")
+            return {"description": dish_name.title(), "foodNutrients": [{"nutrientId": 1008, "value": 89.0}]}
+
+        warmer = CacheWarmer(str(state), concurrency=2, batch_size=10, force=True, progress_interval=60)
+        warmer.cache.set_many = AsyncMock()
+        with patch("app.utils.cache_warmer.USDAFoodService") as mock_usda:
+            mock_usda.side_effect = lambda dish_name, **kwargs: MagicMock(get_best_match=lambda: get_best_match(dish_name))
+            stats = await warmer.run(["Apple", "Banana", "nope", " banana "])
+
+        assert stats == {"total": 3, "skipped": 1, "warmed": 1, "not_found": 1, "failed": 0}
+        [(key, value)] = warmer.cache.set_many.await_args.args[0]
+        assert key == make_cache_key("banana") and value["calories_per_serving"] == 89.0
+        # A finished run starts the next one afresh
+        assert not state.exists()
+
+    @pytest.mark.asyncio
+    async def test_interrupted_run_keeps_its_state(self, tmp_path):
+        state = tmp_path / "dishes.warmed"
+
+        async def get_best_match(dish_name):
+            if dish_name == "cherry":
+                raise asyncio.CancelledError()  # e.g. Ctrl-C
+            return {"description": dish_name.title(), "foodNutrients": [{"nutrientId": 1008, "value": 89.0}]}
+
+        warmer = CacheWarmer(str(state), concurrency=1, batch_size=10, force=True, progress_interval=60)
+        warmer.cache.set_many = AsyncMock()
+        with patch("app.utils.cache_warmer.USDAFoodService") as mock_usda:
+            mock_usda.side_effect = lambda dish_name, **kwargs: MagicMock(get_best_match=lambda: get_best_match(dish_name))
+            with pytest.raises(asyncio.CancelledError):
+                await warmer.run(["apple", "banana", "cherry"])
+
+        assert state.read_text().split() == ["apple", "banana"]
@@ -1,7 +1,15 @@
 import pytest
 import pytest_asyncio
+import httpx
+import asyncio
 from unittest.mock import patch, MagicMock, AsyncMock
 from fastapi import HTTPException
+from app.utils.calorie import RedisCache, USDAFoodService, CacheEntry, FoodMatcher, make_cache_key
+from app.utils.single_flight import SingleFlight, dish_lookups
+from app.utils.local_cache import LocalCache
+from app.utils.nutrients import nutrient_engine
+from app.utils.usda_quota import BACKGROUND
+from app.api import calorie as calorie_api
 
 
 class TestCalorieCounter:
@@ -33,7 +41,9 @@ class TestCalorieCounter:
     @patch('app.api.calorie.USDAFoodService')
     async def test_handles_unknown_food_items(self, mock_usda, mock_cache, client, logged_in_user):
         cache_mock = MagicMock()
-        cache_mock.get_cache.return_value = None
+        cache_mock.get_entry = AsyncMock(return_value=None)
+        cache_mock.get_cache = AsyncMock(return_value=None)
+        cache_mock.set_cache = AsyncMock(return_value=True)
         mock_cache.return_value = cache_mock
         
         usda_mock = AsyncMock()
@@ -48,6 +58,150 @@ class TestCalorieCounter:
         response = await client.post("/get-calories", json=weird_food, headers=logged_in_user)
         assert response.status_code == 400
 
+    @pytest.mark.asyncio
+    @patch('app.api.calorie.RedisCache')
+    @patch('app.api.calorie.USDAFoodService')
+    async def test_serves_stale_value_and_refreshes_in_background(self, mock_usda, mock_cache, client, logged_in_user,
+                                                                  mock_redis):
+        cache_mock = MagicMock()
+        stale_entry = CacheEntry({"description": "Pizza, cheese", "calories_per_serving": 266.0}, soft_expires_at=0)
+        cache_mock.get_entry = AsyncMock(return_value=stale_entry)
+        cache_mock.set_cache = AsyncMock(return_value=True)
+        mock_cache.return_value = cache_mock
+
+        usda_mock = AsyncMock()
+        usda_mock.get_best_match.return_value = {"description": "Pizza, cheese", "foodNutrients": [
+            {"nutrientId": 1008, "value": 270.0}
+        ]}
+        mock_usda.return_value = usda_mock
+
+        response = await client.post("/get-calories", json={"dish_name": " PIZZA ", "servings": 2}, headers=logged_in_user)
+        assert response.status_code == 200
+        assert response.json()["total_calories"] == 532.0
+
+        await asyncio.gather(*dish_lookups.refreshing.values())
+        mock_usda.assert_called_once_with(dish_name="pizza", priority=BACKGROUND)
+        cache_mock.set_cache.assert_awaited_once()
+        # Other workers drop the stale copy from their L1
+        mock_redis.redis_client.publish.assert_awaited_once_with("cache:invalidate", make_cache_key("pizza"))
+
+    @pytest.mark.asyncio
+    @patch('app.api.calorie.RedisCache')
+    @patch('app.api.calorie.USDAFoodService')
+    async def test_skips_refresh_another_worker_already_did(self, mock_usda, mock_cache, client, logged_in_user):
+        cache_mock = MagicMock()
+        stale_entry = CacheEntry({"description": "Pizza, cheese", "calories_per_serving": 266.0}, soft_expires_at=0)
+        fresh_entry = CacheEntry({"description": "Pizza, cheese", "calories_per_serving": 270.0},
+                                 soft_expires_at=10 ** 12)
+        # This worker's L1 still has the stale copy; Redis has the refreshed one
+        cache_mock.get_entry = AsyncMock(side_effect=lambda key, skip_local=False: fresh_entry if skip_local else stale_entry)
+        mock_cache.return_value = cache_mock
+
+        response = await client.post("/get-calories", json={"dish_name": "pizza", "servings": 1}, headers=logged_in_user)
+        assert response.json()["calories_per_serving"] == 266.0
+
+        await asyncio.gather(*dish_lookups.refreshing.values())
+        mock_usda.assert_not_called()
+
+    @pytest.mark.asyncio
+    @patch('app.api.calorie.RedisCache')
+    @patch('app.api.calorie.USDAFoodService')
+    async def test_batch_dedupes_dishes_and_reports_item_errors(self, mock_usda, mock_cache, client, logged_in_user):
+        cache_mock = MagicMock()
+        cached_rice = CacheEntry({"description": "Rice, white", "calories_per_serving": 130.0}, soft_expires_at=10 ** 12)
+        cache_mock.get_entries = AsyncMock(return_value=[cached_rice, None, None])
+        cache_mock.get_cache = AsyncMock(return_value=None)
+        cache_mock.set_cache = AsyncMock(return_value=True)
+        mock_cache.return_value = cache_mock
+
+        async def get_best_match(dish_name):
+            if dish_name == "test12345":
+                raise HTTPException(status_code=404, detail="Dish Not Found")
+            return {"description": "Apple, raw", "foodNutrients": [{"nutrientId": 1008, "value": 52.0}]}
+
+        mock_usda.side_effect = lambda dish_name, **kwargs: MagicMock(get_best_match=lambda: get_best_match(dish_name))
+
+        meal = {"items": [
+            {"dish_name": "rice", "servings": 2},
+            {"dish_name": "Apple", "servings": 1},
+            {"dish_name": "apple ", "servings": 3},
+            {"dish_name": "test12345", "servings": 1}
+        ]}
+        response = await client.post("/get-calories/batch", json=meal, headers=logged_in_user)
+        assert response.status_code == 200
+        result = response.json()
+
+        assert mock_usda.call_count == 2
+        cache_mock.get_entries.assert_awaited_once()
+        assert result["total_calories"] == 468.0
+        assert result["resolved_items"] == 3
+        assert result["items"][3]["error"] == {"code": 404, "message": "Dish Not Found"}
+        assert result["total_nutrients"]["energy"] == 208.0
+
+    @pytest.mark.asyncio
+    @patch('app.api.calorie.RedisCache')
+    @patch('app.api.calorie.USDAFoodService')
+    async def test_batch_hits_do_not_queue_behind_usda_misses(self, mock_usda, mock_cache, client, logged_in_user):
+        cache_mock = MagicMock()
+        cached_rice = CacheEntry({"description": "Rice, white", "calories_per_serving": 130.0}, soft_expires_at=10 ** 12)
+        cache_mock.get_entries = AsyncMock(return_value=[None, cached_rice])
+        cache_mock.get_cache = AsyncMock(return_value=None)
+        cache_mock.set_cache = AsyncMock(return_value=True)
+        mock_cache.return_value = cache_mock
+        resolved = []
+        resolve_dish = calorie_api.resolve_dish
+
+        async def record(dish_name, *args):
+            result = await resolve_dish(dish_name, *args)
+            resolved.append(dish_name)
+            return result
+
+        async def get_best_match():
+            # Holds the only USDA slot until the cached dish has been served
+            while "rice" not in resolved:
+                await asyncio.sleep(0.001)
+            return {"description": "Apple, raw", "foodNutrients": [{"nutrientId": 1008, "value": 52.0}]}
+
+        mock_usda.return_value.get_best_match = get_best_match
+        meal = {"items": [{"dish_name": "apple", "servings": 1}, {"dish_name": "rice", "servings": 1}]}
+        with patch("app.api.calorie.settings.batch_usda_concurrency", 1), \
+             patch("app.api.calorie.resolve_dish", side_effect=record):
+            response = await asyncio.wait_for(
+                client.post("/get-calories/batch", json=meal, headers=logged_in_user), timeout=2
+            )
+
+        assert response.json()["total_calories"] == 182.0
+
+    @pytest.mark.asyncio
+    @patch('app.api.calorie.RedisCache')
+    async def test_get_resource_is_cacheable_and_revalidates(self, mock_cache, client, logged_in_user):
+        cache_mock = MagicMock()
+        cached_pizza = CacheEntry({"description": "Pizza, cheese", "fdc_id": 2345678, "calories_per_serving": 266.0,
+                                   "serving_grams": 107.0, "serving_description": "1 slice"}, soft_expires_at=10 ** 12)
+        cache_mock.get_entry = AsyncMock(return_value=cached_pizza)
+        mock_cache.return_value = cache_mock
+
+        response = await client.get("/calories/Pizza?servings=2", headers=logged_in_user)
+        assert response.status_code == 200
+        assert response.json()["total_calories"] == 532.0
+        assert response.json()["serving_description"] == "1 slice"
+        assert response.headers["etag"] == '"v4-2345678-2"'
+        assert response.headers["cache-control"] == "private, max-age=3600, stale-while-revalidate=86400"
+        assert "ratelimit-remaining" not in response.headers
+
+        revalidate = {**logged_in_user, "If-None-Match": 'W/"v4-2345678-1", "v4-2345678-2"'}
+        response = await client.get("/calories/pizza?servings=2", headers=revalidate)
+        assert response.status_code == 304
+        assert response.content == b""
+        assert response.headers["etag"] == '"v4-2345678-2"'
+
+        response = await client.get("/calories/pizza?servings=3", headers=revalidate)
+        assert response.status_code == 200
+
+    def test_cache_keys_are_normalized_and_versioned(self):
+        assert make_cache_key("Pizza") == make_cache_key("  pizza ") == make_cache_key("PIZZA")
+        assert make_cache_key("pizza").startswith("calories:v4:")
+
     @pytest.mark.asyncio
     async def test_dish_name_cannot_be_empty(self, client, logged_in_user):
         bad_request = {
@@ -77,3 +231,160 @@ class TestCalorieCounter:
         
         response = await client.post("/get-calories", json=crazy_request, headers=logged_in_user)
         assert response.status_code == 422
+
+
+class TestRedisCache:
+
+    @pytest.mark.asyncio
+    async def test_cache_round_trip_is_awaited(self):
+        redis_client = AsyncMock()
+        redis_client.get.return_value = b'{"value": {"description": "Pizza", "calories_per_serving": 266.0}, "soft_expires_at": 0}'
+        with patch("app.utils.calorie.get_redis_client", return_value=redis_client):
+            cache = RedisCache()
+            await cache.set_cache("pizza", {"description": "Pizza", "calories_per_serving": 266.0})
+            cache.local_cache.clear()
+            cached_value = await cache.get_cache("pizza")
+
+        redis_client.set.assert_awaited_once()
+        assert cached_value["calories_per_serving"] == 266.0
+
+    @pytest.mark.asyncio
+    async def test_l1_serves_repeat_hits_without_redis(self):
+        redis_client = AsyncMock()
+        redis_client.get.return_value = b'{"value": {"description": "Pizza", "calories_per_serving": 266.0}, "soft_expires_at": 0}'
+        with patch("app.utils.calorie.get_redis_client", return_value=redis_client):
+            cache = RedisCache()
+            first = await cache.get_cache("pizza")
+            second = await cache.get_cache("pizza")
+
+        assert first == second
+        assert redis_client.get.await_count == 1
+
+    def test_l1_evicts_least_recently_used_and_expired_entries(self):
+        cache = LocalCache(max_size=2, ttl=60)
+        cache.set("pizza", 1)
+        cache.set("pasta", 2)
+        cache.get("pizza")
+        cache.set("salad", 3)
+        assert cache.get("pasta") is None
+        assert cache.get("pizza") == 1
+
+        with patch("app.utils.local_cache.time.monotonic", return_value=10 ** 9):
+            assert cache.get("salad") is None
+        assert cache.get_stats()["evictions"] == 1
+
+
+class TestUSDAFoodService:
+
+    @pytest.mark.asyncio
+    async def test_uses_injected_client(self, mock_redis):
+        mock_redis.redis_client.evalsha.return_value = [1, 0, 0]  # breaker closed
+        def usda_stub(request):
+            assert request.url.params["query"] == "apple raw"
+            return httpx.Response(200, json={"foods": [
+                {"description": "Pineapple juice", "foodNutrients": []},
+                {"description": "Apple raw", "foodNutrients": []}
+            ]})
+
+        async with httpx.AsyncClient(transport=httpx.MockTransport(usda_stub)) as client:
+            service = USDAFoodService(dish_name="apple raw", client=client)
+            best_match = await service.get_best_match()
+
+        assert best_match["description"] == "Apple raw"
+
+
+class TestSingleFlight:
+
+    @pytest.mark.asyncio
+    async def test_concurrent_misses_share_one_lookup(self):
+        calls = []
+
+        async def lookup():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return {"description": "Pizza", "calories_per_serving": 266.0}
+
+        flight = SingleFlight("test")
+        results = await asyncio.gather(*[flight.run("pizza", lookup) for _ in range(5)])
+
+        assert len(calls) == 1
+        assert all(result["description"] == "Pizza" for result in results)
+        assert flight.stats["local_coalesced"] == 4
+
+    @pytest.mark.asyncio
+    async def test_waits_for_other_worker_to_fill_cache(self, mock_redis):
+        mock_redis.redis_client.set.return_value = None  # lock held elsewhere
+        mock_redis.redis_client.exists.return_value = 1
+        lookup = AsyncMock()
+        wait_for_fill = AsyncMock(side_effect=[None, {"description": "Pizza", "calories_per_serving": 266.0}])
+
+        flight = SingleFlight("test")
+        with patch("app.utils.single_flight.settings.single_flight_poll_interval", 0):
+            result = await flight.run("pizza", lookup, wait_for_fill=wait_for_fill)
+
+        lookup.assert_not_awaited()
+        assert result["description"] == "Pizza"
+        assert flight.stats["remote_coalesced"] == 1
+
+    @pytest.mark.asyncio
+    async def test_live_miss_does_not_await_a_background_refresh(self, mock_redis):
+        async def failing_refresh():
+            await asyncio.sleep(0.01)
+            raise HTTPException(status_code=503, detail="USDA API temporarily unavailable")
+
+        async def lookup():
+            return {"description": "Pizza", "calories_per_serving": 266.0}
+
+        flight = SingleFlight("test")
+        flight.refresh_in_background("pizza", failing_refresh)
+        result = await flight.run("pizza", lookup)
+        await asyncio.gather(*flight.refreshing.values())
+
+        assert result["description"] == "Pizza"
+        assert flight.stats["local_coalesced"] == 0
+
+
+class TestFoodMatcher:
+
+    def test_matches_whole_words_only(self):
+        foods = [{"description": "Eggplant, raw"}, {"description": "Eggs, scrambled"}]
+        assert FoodMatcher().find_best_match("egg", foods)["description"] == "Eggs, scrambled"
+        assert FoodMatcher().calculate_word_score("egg", "Eggplant, raw") == 0.0
+
+    def test_prefers_full_coverage_then_bm25(self):
+        foods = [
+            {"description": "Chicken, broilers or fryers, breast, meat only, cooked, roasted, with added salt"},
+            {"description": "Chicken breast"},
+            {"description": "Chicken, thigh"}
+        ]
+        assert FoodMatcher().find_best_match("chicken breast", foods)["description"] == "Chicken breast"
+
+    def test_ties_keep_usda_order(self):
+        foods = [{"description": "Pizza, cheese"}, {"description": "Pizza, pepperoni"}, {"description": "Salad"}]
+        assert FoodMatcher().find_best_match("pizza", foods)["description"] == "Pizza, cheese"
+
+
+class TestNutrientEngine:
+
+    def test_computes_many_foods_in_one_matrix(self):
+        foods = [
+            {"foodNutrients": [{"nutrientId": 1008, "value": 250.0}, {"nutrientId": 1003, "value": 10.0}]},
+            {"servingSize": 30, "servingSizeUnit": "GRM", "foodNutrients": [{"nutrientId": 1008, "value": 500.0}]},
+            {"servingSize": 0.5, "servingSizeUnit": "kg", "foodNutrients": [{"nutrientId": 1005, "value": 20.0}]}
+        ]
+        per_serving = nutrient_engine.per_serving(foods)
+        assert per_serving.shape == (3, len(nutrient_engine.names))
+        assert per_serving[:, nutrient_engine.energy].tolist() == [250.0, 150.0, 400.0]
+
+    def test_falls_back_to_atwater_energy(self):
+        food = {"foodNutrients": [
+            {"nutrientId": 1003, "value": 10.0}, {"nutrientId": 1004, "value": 5.0}, {"nutrientId": 1005, "value": 20.0}
+        ]}
+        profile = nutrient_engine.profiles([food])[0]
+        assert profile["energy"] == 165.0
+        assert profile["fat"] == 5.0
+
+    def test_meal_totals_weight_by_servings(self):
+        totals = nutrient_engine.totals([{"energy": 100.0, "protein": 2.0}, {"energy": 50.0}], [2, 3])
+        assert totals["energy"] == 350.0
+        assert totals["protein"] == 4.0
@@ -0,0 +1,132 @@
+import asyncio
+import httpx
+import pytest
+import pytest_asyncio
+from unittest.mock import patch, MagicMock, AsyncMock
+from fastapi import HTTPException
+from redis.exceptions import ConnectionError as RedisConnectionError
+from app.utils.calorie import USDAFoodService, CacheEntry
+from app.utils.circuit_breaker import CircuitBreaker
+
+
+class TestCircuitBreaker:
+
+    @pytest.mark.asyncio
+    async def test_open_breaker_fails_fast_without_redis(self, mock_redis):
+        mock_redis.redis_client.evalsha.return_value = [0, 0, 5000]
+        breaker = CircuitBreaker("test", threshold=2, window=30, open_seconds=5)
+
+        first, second = await breaker.allow(), await breaker.allow()
+        assert not first.allowed and not second.allowed
+        assert 4 < second.retry_after <= 5
+        assert mock_redis.redis_client.evalsha.await_count == 1
+
+    @pytest.mark.asyncio
+    async def test_local_fallback_opens_then_probes_once(self, mock_redis):
+        mock_redis.redis_client.evalsha.side_effect = RedisConnectionError("down")
+        breaker = CircuitBreaker("test", threshold=2, window=30, open_seconds=5)
+
+        with patch("app.utils.circuit_breaker.time.monotonic", return_value=100.0):
+            await breaker.record_failure()
+            await breaker.record_failure()
+            assert not (await breaker.allow()).allowed
+
+        with patch("app.utils.circuit_breaker.time.monotonic", return_value=106.0):
+            probe = await breaker.allow()
+            assert probe.allowed and probe.probe
+            assert not (await breaker.allow()).allowed
+            await breaker.record_success(probe)
+            assert (await breaker.allow()).allowed
+
+
+class TestUSDAResilience:
+
+    @pytest.fixture(autouse=True)
+    def closed_breaker(self, mock_redis):
+        mock_redis.redis_client.evalsha.return_value = [1, 0, 0]
+        with patch("app.utils.calorie.settings.usda_retry_base_delay", 0):
+            yield
+
+    @pytest.mark.asyncio
+    async def test_retries_server_errors(self):
+        responses = [httpx.Response(503), httpx.Response(200, json={"foods": [
+            {"description": "Egg, whole", "foodNutrients": []}
+        ]})]
+        async with httpx.AsyncClient(transport=httpx.MockTransport(lambda request: responses.pop(0))) as client:
+            best_match = await USDAFoodService(dish_name="egg", client=client).get_best_match()
+
+        assert best_match["description"] == "Egg, whole"
+        assert responses == []
+
+    @pytest.mark.asyncio
+    async def test_attempt_timeout_keeps_connect_and_pool_limits(self):
+        timeouts = []
+
+        def usda_stub(request):
+            timeouts.append(request.extensions["timeout"])
+            return httpx.Response(200, json={"foods": [{"description": "Egg, whole", "foodNutrients": []}]})
+
+        async with httpx.AsyncClient(transport=httpx.MockTransport(usda_stub)) as client:
+            with patch("app.core.http_client.settings.usda_attempt_timeout", 2.5):
+                await USDAFoodService(dish_name="egg", client=client).search_usda_api()
+
+        assert timeouts == [{"connect": 3.0, "read": 2.5, "write": 2.5, "pool": 5.0}]
+
+    @pytest.mark.asyncio
+    async def test_upstream_rate_limit_is_not_retried_or_masked(self):
+        calls = []
+
+        def usda_stub(request):
+            calls.append(request)
+            return httpx.Response(429, headers={"Retry-After": "120"})
+
+        async with httpx.AsyncClient(transport=httpx.MockTransport(usda_stub)) as client:
+            with pytest.raises(HTTPException) as error:
+                await USDAFoodService(dish_name="egg", client=client).search_usda_api()
+
+        assert error.value.status_code == 429
+        assert error.value.headers["Retry-After"] == "120"
+        assert len(calls) == 1
+
+    @pytest.mark.asyncio
+    async def test_deadline_bounds_hung_calls(self):
+        async def hang(request):
+            await asyncio.sleep(5)
+
+        async with httpx.AsyncClient(transport=httpx.MockTransport(hang)) as client:
+            with patch("app.utils.calorie.settings.usda_deadline", 0.05), pytest.raises(HTTPException) as error:
+                await USDAFoodService(dish_name="egg", client=client).search_usda_api()
+
+        assert error.value.status_code == 504
+
+
+class TestStaleFallback:
+
+    @pytest_asyncio.fixture
+    async def logged_in_user(self, client):
+        response = await client.post("/auth/register", json={
+            "email": "outage@test.com", "password": "password123", "first_name": "Out", "last_name": "Age"
+        })
+        return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    @pytest.mark.asyncio
+    @patch("app.api.calorie.RedisCache")
+    @patch("app.api.calorie.USDAFoodService")
+    async def test_serves_expired_value_flagged_stale_while_usda_is_down(self, mock_usda, mock_cache, client,
+                                                                        logged_in_user):
+        expired = CacheEntry({"description": "Pizza, cheese", "calories_per_serving": 266.0},
+                             soft_expires_at=0, hard_expires_at=0)
+        cache_mock = MagicMock()
+        cache_mock.get_entry = AsyncMock(return_value=expired)
+        cache_mock.get_cache = AsyncMock(return_value=None)
+        mock_cache.return_value = cache_mock
+        mock_usda.return_value.get_best_match = AsyncMock(
+            side_effect=HTTPException(status_code=503, detail="USDA API temporarily unavailable")
+        )
+
+        response = await client.post("/get-calories", json={"dish_name": "pizza", "servings": 1},
+                                     headers=logged_in_user)
+
+        assert response.status_code == 200
+        assert response.json()["stale"] is True
+        assert response.json()["total_calories"] == 266.0
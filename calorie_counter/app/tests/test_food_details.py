@@ -0,0 +1,85 @@
+import asyncio
+import json
+import httpx
+import pytest
+from unittest.mock import MagicMock, AsyncMock, patch
+from app.utils.calorie import USDAFoodService, CalorieCounter, FoodDetailLoader, build_cache_value
+from app.utils.food_details import portion_from_record, detail_key
+
+
+def record(fdc_id: int, grams: float = 125.0):
+    return {"fdcId": fdc_id, "foodPortions": [
+        {"sequenceNumber": 2, "amount": 1.0, "measureUnit": {"name": "undetermined"}, "modifier": "slice", "gramWeight": 20.0},
+        {"sequenceNumber": 1, "amount": 1.0, "measureUnit": {"name": "cup"}, "modifier": "chopped", "gramWeight": grams}
+    ]}
+
+
+@pytest.fixture
+def redis_pipeline(mock_redis):
+    redis_client = mock_redis.redis_client
+    redis_client.mget.side_effect = lambda keys: [None] * len(keys)
+    pipe = MagicMock()
+    pipe.__aenter__.return_value = pipe
+    pipe.execute = AsyncMock()
+    redis_client.pipeline = MagicMock(return_value=pipe)
+    return pipe
+
+
+class TestFoodDetails:
+
+    def test_first_household_portion_is_the_serving(self):
+        assert portion_from_record(record(1)) == {"grams": 125.0, "text": "1 cup chopped"}
+        assert portion_from_record({"fdcId": 2, "foodPortions": []}) is None
+
+    @pytest.mark.asyncio
+    async def test_concurrent_loads_are_fetched_in_batches_of_twenty(self, redis_pipeline):
+        calls = []
+
+        async def fetch_records(fdc_ids, priority):
+            calls.append(fdc_ids)
+            return [record(fdc_id) for fdc_id in fdc_ids if fdc_id != 7]
+
+        loader = FoodDetailLoader(fetch_records, batch_size=20, window=0.01)
+        portions = await asyncio.gather(*[loader.load(fdc_id % 25) for fdc_id in range(50)])
+
+        assert sorted(len(fdc_ids) for fdc_ids in calls) == [5, 20]
+        assert loader.in_flight == {}
+        assert portions[7] is None and portions[32] is None
+        assert portions[8]["grams"] == 125.0 and portions[33] == portions[8]
+        # Foods without portions are cached too, so they aren't fetched again
+        cached = {call.args[0]: json.loads(call.args[1]) for call in redis_pipeline.set.call_args_list}
+        assert len(cached) == 25 and cached[detail_key(7)] is None
+
+    @pytest.mark.asyncio
+    async def test_cached_details_skip_usda(self, mock_redis):
+        mock_redis.redis_client.mget.side_effect = lambda keys: [json.dumps({"grams": 240.0, "text": "1 cup"})]
+        loader = FoodDetailLoader(AsyncMock(side_effect=AssertionError("USDA should not be called")))
+
+        assert (await loader.load(11))["grams"] == 240.0
+        assert loader.stats["cache_hits"] == 1
+
+
+class TestPortionResolution:
+
+    @pytest.mark.asyncio
+    async def test_search_matches_get_their_portion_from_the_full_record(self, mock_redis, redis_pipeline):
+        mock_redis.redis_client.evalsha.return_value = [1, 0, 0]  # breaker closed, quota available
+
+        def usda_stub(request):
+            if request.url.path.endswith("/search"):
+                return httpx.Response(200, json={"foods": [{"fdcId": 9, "description": "Broccoli, raw", "foodNutrients": [
+                    {"nutrientId": 1008, "value": 34.0}
+                ]}]})
+            assert request.url.params["fdcIds"] == "9"
+            return httpx.Response(200, json=[record(9, grams=91.0)])
+
+        loader = FoodDetailLoader(lambda fdc_ids, priority: USDAFoodService(client=client).get_food_details(fdc_ids))
+        async with httpx.AsyncClient(transport=httpx.MockTransport(usda_stub)) as client:
+            with patch("app.utils.calorie.food_details", loader):
+                food = await USDAFoodService(dish_name="broccoli", client=client).get_best_match()
+
+        assert food["householdServingFullText"] == "1 cup chopped"
+        assert CalorieCounter(food).get_calories_per_serving() == 30.94
+        # The cached value names the serving its numbers are for
+        value = build_cache_value(food)
+        assert (value["serving_grams"], value["serving_description"]) == (91.0, "1 cup chopped")
@@ -0,0 +1,62 @@
+import json
+import httpx
+import pytest
+from app.utils.calorie import USDAFoodService
+from app.utils.food_index import FoodIndex, FoodIndexBuilder
+
+
+FOUNDATION_FOODS = {"FoundationFoods": [
+    {"fdcId": 1, "description": "Eggplant, raw", "dataType": "Foundation", "foodNutrients": [
+        {"nutrient": {"id": 1008}, "amount": 25.0},
+        {"nutrient": {"id": 1003}, "amount": 1.0}
+    ]},
+    {"fdcId": 2, "description": "Egg, whole, raw", "dataType": "Foundation", "foodNutrients": [
+        {"nutrient": {"id": 1008}, "amount": 143.0},
+        {"nutrient": {"id": 1051}, "amount": 75.8}
+    ]}
+]}
+
+
+@pytest.fixture
+def food_index(tmp_path):
+    source = tmp_path / "foundation.json"
+    source.write_text(json.dumps(FOUNDATION_FOODS))
+    path = str(tmp_path / "foods.sqlite3")
+    assert FoodIndexBuilder(path).build(str(source)) == 2
+    index = FoodIndex(path)
+    yield index
+    index.close()
+
+
+class TestFoodIndex:
+
+    def test_search_matches_whole_tokens(self, food_index):
+        foods = food_index.search("Egg", limit=5)
+        assert [food["fdcId"] for food in foods] == [2]
+        assert foods[0]["foodNutrients"] == [{"nutrientId": 1008, "value": 143.0}]
+
+    def test_builds_from_csv_directory(self, tmp_path):
+        (tmp_path / "food.csv").write_text(
+            'fdc_id,data_type,description\n"10","sr_legacy_food","Apples, raw"\n"11","sr_legacy_food","Water"\n'
+        )
+        (tmp_path / "food_nutrient.csv").write_text(
+            'id,fdc_id,nutrient_id,amount\n1,10,1008,52\n2,10,1005,13.8\n3,11,1051,99.9\n'
+        )
+        path = str(tmp_path / "foods.sqlite3")
+        assert FoodIndexBuilder(path).build(str(tmp_path)) == 1
+        assert FoodIndex(path).search("apples", limit=5)[0]["description"] == "Apples, raw"
+
+    @pytest.mark.asyncio
+    async def test_service_resolves_offline_before_calling_usda(self, food_index, mock_redis):
+        # The food's portion is already cached by fdcId
+        mock_redis.redis_client.mget.side_effect = lambda keys: [json.dumps({"grams": 82.0, "text": "1 cup, cubes"})]
+
+        def usda_stub(request):
+            raise AssertionError("USDA should not be called")
+
+        async with httpx.AsyncClient(transport=httpx.MockTransport(usda_stub)) as client:
+            service = USDAFoodService(dish_name="eggplant", client=client, food_index=food_index)
+            best_match = await service.get_best_match()
+
+        assert best_match["fdcId"] == 1
+        assert (best_match["servingSize"], best_match["householdServingFullText"]) == (82.0, "1 cup, cubes")
@@ -0,0 +1,119 @@
+import pytest
+import pytest_asyncio
+from unittest.mock import patch, MagicMock, AsyncMock
+from sqlalchemy import func, select
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from app.core.database import Base, get_async_read_db
+from app.models.meal import MealEntry, DailyRollup
+from app.tests.conftest import AsyncTestingSessionLocal
+from main import app
+from app.utils.calorie import CacheEntry
+from app.utils.meal_log import MealLogWriter
+
+
+RICE = CacheEntry({
+    "description": "Rice, white", "fdc_id": 7, "calories_per_serving": 130.0,
+    "nutrients": {"energy": 130.0, "protein": 2.7, "fat": 0.3, "carbohydrate": 28.2}
+}, soft_expires_at=10 ** 12)
+
+
+class TestMealLog:
+
+    @pytest_asyncio.fixture
+    async def logged_in_user(self, client):
+        response = await client.post("/auth/register", json={
+            "email": "logger@test.com", "password": "password123", "first_name": "Meal", "last_name": "Logger"
+        })
+        return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    @pytest.fixture
+    def writer(self):
+        writer = MealLogWriter(AsyncTestingSessionLocal, batch_size=100, flush_interval=60, max_pending=3)
+        cache_mock = MagicMock()
+        cache_mock.get_entry = AsyncMock(return_value=RICE)
+        with patch("app.api.meal.meal_log_writer", writer), \
+             patch("app.api.meal.RedisCache", return_value=cache_mock):
+            yield writer
+
+    @pytest.mark.asyncio
+    async def test_rollups_include_pending_and_flushed_entries(self, client, logged_in_user, writer):
+        for servings in (1, 2):
+            response = await client.post("/meals", json={"dish_name": "Rice", "servings": servings},
+                                         headers=logged_in_user)
+            assert response.status_code == 202
+        assert response.json()["calories"] == 260.0
+
+        # Not yet flushed, but already counted
+        today = (await client.get("/meals/today", headers=logged_in_user)).json()
+        assert today["entries"] == 2 and today["calories"] == 390.0
+
+        assert await writer.flush() == 2
+        await client.post("/meals", json={"dish_name": "rice", "servings": 1}, headers=logged_in_user)
+        assert await writer.flush() == 1
+
+        history = (await client.get("/meals/history", params={"days": 30}, headers=logged_in_user)).json()
+        assert len(history["days"]) == 1
+        assert history["days"][0]["entries"] == 3
+        assert history["days"][0]["nutrients"]["protein"] == 10.8
+        assert history["total_calories"] == 520.0
+
+        async with AsyncTestingSessionLocal() as db:
+            assert await db.scalar(select(func.count()).select_from(MealEntry)) == 3
+
+    @pytest.mark.asyncio
+    async def test_queue_is_bounded(self, client, logged_in_user, writer):
+        for _ in range(3):
+            await client.post("/meals", json={"dish_name": "rice", "servings": 1}, headers=logged_in_user)
+        response = await client.post("/meals", json={"dish_name": "rice", "servings": 1}, headers=logged_in_user)
+        assert response.status_code == 503
+
+    @pytest.mark.asyncio
+    async def test_failed_flush_keeps_entries_queued(self, writer):
+        writer.enqueue({"user_id": 1, "day": None})
+        with patch("app.utils.meal_log.MealCrud") as mock_crud:
+            mock_crud.return_value.add_entries = AsyncMock(side_effect=OperationalError("INSERT", {}, Exception()))
+            assert await writer.flush() == 0
+
+        assert writer.queue == [{"user_id": 1, "day": None}]
+        assert writer.flushing == []
+        assert writer.stats["failed_flushes"] == 1
+
+    @pytest.mark.asyncio
+    async def test_rejected_rows_are_set_aside(self, client, logged_in_user, writer):
+        for servings in (1, 2, 3):
+            await client.post("/meals", json={"dish_name": "rice", "servings": servings}, headers=logged_in_user)
+        writer.queue[1]["dish_name"] = None  # violates NOT NULL
+
+        assert await writer.flush() == 2
+        assert [row["servings"] for row in writer.dead_letters] == [2]
+        assert writer.queue == [] and writer.stats["failed_flushes"] == 0
+
+        # The queue keeps moving
+        await client.post("/meals", json={"dish_name": "rice", "servings": 1}, headers=logged_in_user)
+        assert await writer.flush() == 1
+        async with AsyncTestingSessionLocal() as db:
+            assert await db.scalar(select(func.count()).select_from(MealEntry)) == 3
+            assert await db.scalar(select(DailyRollup.entries)) == 3
+
+    @pytest.mark.asyncio
+    async def test_totals_ignore_the_replica(self, client, logged_in_user, writer, tmp_path):
+        replica = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'replica.db'}")
+        async with replica.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        ReplicaSessionLocal = async_sessionmaker(bind=replica)
+
+        async def get_replica_db():
+            async with ReplicaSessionLocal() as db:
+                yield db
+
+        await client.post("/meals", json={"dish_name": "rice", "servings": 1}, headers=logged_in_user)
+        assert await writer.flush() == 1
+        # Flushed to the primary but not yet replicated
+        with patch.dict(app.dependency_overrides, {get_async_read_db: get_replica_db}):
+            response = await client.get("/meals/today", headers=logged_in_user)
+        await replica.dispose()
+
+        # The new user is only on the primary, so authentication falls back to it
+        assert response.status_code == 200
+        assert response.json()["entries"] == 1 and response.json()["calories"] == 130.0
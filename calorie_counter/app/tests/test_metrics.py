@@ -0,0 +1,50 @@
+import pytest
+from prometheus_client import REGISTRY
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+from app.core.database import TimedQueuePool
+from app.utils.calorie import RedisCache
+
+
+def sample(name: str, labels: dict) -> float:
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+class TestMetrics:
+
+    @pytest.mark.asyncio
+    async def test_requests_are_labelled_by_route_template(self, client):
+        await client.post("/auth/register", json={
+            "email": "metered@test.com", "password": "password123", "first_name": "Me", "last_name": "Tered"
+        })
+        response = await client.get("/metrics")
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain")
+        assert 'http_request_duration_seconds_count{method="POST",route="/auth/register",status="201"}' in response.text
+        assert 'stage_duration_seconds_count{stage="rate_limit"}' in response.text
+
+    @pytest.mark.asyncio
+    async def test_cache_lookups_count_each_tier(self):
+        labels = {"tier": "redis", "result": "miss"}
+        misses, l1_misses = sample("cache_requests_total", labels), sample("cache_requests_total", {**labels, "tier": "l1"})
+        redis_gets = sample("stage_duration_seconds_count", {"stage": "redis_get"})
+
+        assert await RedisCache().get_entry("calories:v4:unknown dish") is None
+
+        assert sample("cache_requests_total", labels) == misses + 1
+        assert sample("cache_requests_total", {**labels, "tier": "l1"}) == l1_misses + 1
+        assert sample("stage_duration_seconds_count", {"stage": "redis_get"}) == redis_gets + 1
+
+    @pytest.mark.asyncio
+    async def test_pool_reports_connections_in_use(self, tmp_path):
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'pool.db'}", poolclass=TimedQueuePool,
+                                     pool_logging_name="test_pool")
+        labels = {"pool": "test_pool"}
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+            assert sample("db_pool_in_use", labels) == 1
+        await engine.dispose()
+
+        assert sample("db_pool_in_use", labels) == 0
+        assert sample("db_pool_checkout_seconds_count", labels) == 1
@@ -0,0 +1,56 @@
+import cProfile
+import os
+import pytest
+from fastapi import FastAPI
+from httpx import ASGITransport, AsyncClient
+from app.utils.profiling import RequestProfiler
+
+
+@pytest.fixture
+def profiler(tmp_path):
+    return RequestProfiler(str(tmp_path), sample_rate=0.0, token="s3cret", max_files=2, min_duration_ms=0)
+
+
+@pytest.fixture
+def profiled_app(profiler):
+    app = FastAPI()
+
+    @app.get("/dishes/{name}")
+    async def dish(name: str):
+        return {"name": name}
+
+    app.middleware("http")(profiler.middleware)
+    return app
+
+
+class TestRequestProfiler:
+
+    def test_disabled_without_sampling_or_token(self, tmp_path):
+        assert not RequestProfiler(str(tmp_path), 0.0, "", 10, 0).enabled
+
+    @pytest.mark.asyncio
+    async def test_profiles_only_requests_with_the_token(self, profiler, profiled_app):
+        async with AsyncClient(transport=ASGITransport(app=profiled_app), base_url="http://test") as client:
+            plain = await client.get("/dishes/egg")
+            wrong = await client.get("/dishes/egg", headers={"X-Profile-Token": "guess"})
+            profiled = await client.get("/dishes/egg", headers={"X-Profile-Token": "s3cret"})
+
+        assert "X-Profile-Id" not in plain.headers and "X-Profile-Id" not in wrong.headers
+        name = profiled.headers["X-Profile-Id"]
+        assert "_dishes_name_" in name
+        assert os.listdir(profiler.directory) == [name]
+
+    @pytest.mark.asyncio
+    async def test_non_ascii_token_is_rejected(self, profiler, profiled_app):
+        async with AsyncClient(transport=ASGITransport(app=profiled_app), base_url="http://test") as client:
+            response = await client.get("/dishes/egg", headers={"X-Profile-Token": "s3crét".encode()})
+
+        assert response.status_code == 200
+        assert "X-Profile-Id" not in response.headers
+
+    def test_keeps_the_slowest_profiles(self, profiler):
+        for duration_ms in (250, 40, 1200):
+            profiler.save(cProfile.Profile(), "/get-calories", duration_ms)
+
+        kept = sorted(os.listdir(profiler.directory))
+        assert [name.split("ms_")[0] for name in kept] == ["00000250", "00001200"]
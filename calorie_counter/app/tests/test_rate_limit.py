@@ -0,0 +1,59 @@
+import pytest
+from unittest.mock import patch
+from redis.exceptions import ConnectionError as RedisConnectionError
+from app.utils.rate_limit import LocalRateLimiter, RateLimiter
+
+
+class TestLocalRateLimiter:
+
+    def test_fixed_window_blocks_after_limit(self):
+        limiter = LocalRateLimiter("fixed_window", max_keys=10)
+        results = [limiter.hit("client", limit=2, window=60) for _ in range(3)]
+        assert [result.allowed for result in results] == [True, True, False]
+        assert results[2].headers()["Retry-After"] == "60"
+
+    def test_token_bucket_refills_over_time(self):
+        limiter = LocalRateLimiter("token_bucket", max_keys=10)
+        with patch("app.utils.rate_limit.time.monotonic", side_effect=[0.0, 0.0, 30.0]):
+            assert limiter.hit("client", limit=2, window=60, cost=2).allowed
+            assert not limiter.hit("client", limit=2, window=60).allowed
+            assert limiter.hit("client", limit=2, window=60).allowed
+
+    def test_sliding_window_weights_previous_window(self):
+        limiter = LocalRateLimiter("sliding_window", max_keys=10)
+        with patch("app.utils.rate_limit.time.monotonic", side_effect=[0.0, 0.0, 90.0]):
+            assert limiter.hit("client", limit=2, window=60).allowed
+            assert limiter.hit("client", limit=2, window=60).allowed
+            # Half of the previous window's two hits still count
+            result = limiter.hit("client", limit=2, window=60)
+        assert result.allowed
+        assert result.remaining == 0
+
+    def test_evicts_least_recently_used_keys(self):
+        limiter = LocalRateLimiter("fixed_window", max_keys=2)
+        for client in ("a", "b", "c"):
+            limiter.hit(client, limit=1, window=60)
+        assert list(limiter.buckets) == ["b", "c"]
+
+
+class TestRateLimiter:
+
+    @pytest.mark.asyncio
+    async def test_falls_back_to_local_limits_when_redis_is_down(self, mock_redis):
+        mock_redis.redis_client.evalsha.side_effect = RedisConnectionError("down")
+        limiter = RateLimiter(algorithm="fixed_window", limit=1, window=60)
+
+        assert (await limiter.hit("client")).allowed
+        assert not (await limiter.hit("client")).allowed
+        # The outage is remembered, so Redis isn't retried on every request
+        assert mock_redis.redis_client.evalsha.await_count == 1
+
+    @pytest.mark.asyncio
+    async def test_rejected_request_carries_rate_limit_headers(self, client, mock_redis):
+        mock_redis.redis_client.evalsha.return_value = [0, 0, 4200, 4200]
+
+        response = await client.post("/auth/login", json={"email": "a@b.com", "password": "password123"})
+        assert response.status_code == 429
+        assert response.headers["Retry-After"] == "5"
+        assert response.headers["RateLimit-Remaining"] == "0"
+        assert response.headers["RateLimit-Reset"] == "5"
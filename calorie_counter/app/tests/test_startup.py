@@ -0,0 +1,31 @@
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+
+class TestStartup:
+
+    def test_worker_start_does_not_load_numpy_or_database_drivers(self):
+        # A fresh interpreter, since the test session itself has loaded both
+        snippet = (
+            "import json, sys, main\n"
+            "print(json.dumps([name for name in ('numpy', 'asyncpg') "
+            "if type(sys.modules.get(name)).__name__ == 'module']))"
+        )
+        output = subprocess.run([sys.executable, "-c", snippet], cwd=Path(__file__).parents[2],
+                                capture_output=True, text=True, check=True)
+
+        assert json.loads(output.stdout.splitlines()[-1]) == []
+
+    def test_empty_multiprocess_dir_keeps_metrics_in_process(self, tmp_path):
+        snippet = (
+            "import main\n"
+            "from app.core.metrics import render_metrics\n"
+            "render_metrics()"
+        )
+        env = {**os.environ, "PROMETHEUS_MULTIPROC_DIR": "", "PYTHONPATH": str(Path(__file__).parents[2])}
+        subprocess.run([sys.executable, "-c", snippet], cwd=tmp_path, env=env, capture_output=True, check=True)
+
+        assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,73 @@
+import pytest
+from unittest.mock import patch
+from app.utils.suggest import SuggestionIndex, build_keys
+
+
+class TestSuggestionIndex:
+
+    def test_matches_prefix_of_any_leading_word(self):
+        index = SuggestionIndex(max_entries=100, scan_limit=100)
+        for name in ("Chicken, breast, roasted", "Chickpeas, canned", "Pizza"):
+            index.add(name)
+
+        assert {name for name, _ in index.suggest("chick", 10)} == {"Chicken, breast, roasted", "Chickpeas, canned"}
+        assert [name for name, _ in index.suggest("breast ro", 10)] == ["Chicken, breast, roasted"]
+        assert index.suggest("  ", 10) == []
+
+    def test_ranks_by_popularity(self):
+        index = SuggestionIndex(max_entries=100, scan_limit=100)
+        index.add("pizza margherita")
+        for _ in range(3):
+            index.record_hit("pizza pepperoni")
+        index.record_hit("pizza")
+
+        assert [name for name, _ in index.suggest("piz", 2)] == ["pizza pepperoni", "pizza"]
+        assert index.pending["pizza pepperoni"] == 3
+
+    def test_bulk_load_merges_with_existing_entries(self):
+        index = SuggestionIndex(max_entries=100, scan_limit=100)
+        index.record_hit("apple pie")
+        names = ["Apples, raw", "Applesauce"]
+        index.extend(names, build_keys(names))
+
+        assert index.keys == sorted(index.keys)
+        assert [name for name, _ in index.suggest("apple", 3)][0] == "apple pie"
+
+    def test_short_prefixes_rank_every_match(self):
+        index = SuggestionIndex(max_entries=5000, scan_limit=100, top_k=3)
+        names = [f"Cabbage, variety {number:04d}" for number in range(2000)] + ["chicken breast", "chili", "celery"]
+        index.extend(names, build_keys(names))
+        index.merge_popularity([("chicken breast", 50.0), ("chili", 3.0), ("celery", 3.0)])
+
+        assert [name for name, _ in index.suggest("c", 3)] == ["chicken breast", "celery", "chili"]
+        assert [name for name, _ in index.suggest("chi", 3)] == ["chicken breast", "chili"]
+        # Fewer popular matches than asked for are filled by name
+        assert [name for name, _ in index.suggest("cab", 2)] == ["Cabbage, variety 0000", "Cabbage, variety 0001"]
+
+        index.merge_popularity([("chicken breast", 1.0)])
+        assert [name for name, _ in index.suggest("c", 3)] == ["celery", "chili", "chicken breast"]
+
+    def test_merges_cluster_popularity_with_unflushed_hits(self):
+        index = SuggestionIndex(max_entries=100, scan_limit=100)
+        index.record_hit("ramen")
+        index.merge_popularity([("ramen", 10.0), ("udon", 4.0)])
+
+        assert index.popularity == {"ramen": 11.0, "udon": 4.0}
+
+
+class TestSuggestEndpoint:
+
+    @pytest.mark.asyncio
+    async def test_suggest_returns_top_k(self, client):
+        response = await client.post("/auth/register", json={
+            "email": "typist@test.com", "password": "password123", "first_name": "Fast", "last_name": "Typist"
+        })
+        headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+        index = SuggestionIndex(max_entries=100, scan_limit=100)
+        index.record_hit("pad thai")
+        with patch("app.api.calorie.suggestion_index", index):
+            response = await client.get("/foods/suggest", params={"q": "Pad"}, headers=headers)
+
+        assert response.status_code == 200
+        assert response.json()["suggestions"] == [{"dish_name": "pad thai", "popularity": 1.0}]
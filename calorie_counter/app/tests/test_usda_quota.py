@@ -0,0 +1,56 @@
+import asyncio
+import pytest
+from fastapi import HTTPException
+from app.utils.usda_quota import QuotaScheduler, LIVE, BACKGROUND
+
+
+class TestQuotaScheduler:
+
+    @pytest.mark.asyncio
+    async def test_live_calls_overtake_queued_background_work(self, mock_redis):
+        evalsha = mock_redis.redis_client.evalsha
+        evalsha.side_effect = [[0, 0, 20], [0, 0, 20], [1, 0, 0], [1, 0, 0]]
+        scheduler = QuotaScheduler("test_quota", limit=100, window=3600, reserve=0.2, max_waiting=10)
+        order = []
+
+        async def call(name, priority):
+            await scheduler.acquire(priority, max_wait=1)
+            order.append(name)
+
+        background = asyncio.create_task(call("background", BACKGROUND))
+        await asyncio.sleep(0.005)
+        await asyncio.gather(background, call("live", LIVE))
+
+        assert order == ["live", "background"]
+        # Background work may not spend the last 20% of the bucket
+        assert evalsha.await_args_list[0].args[-1] == 20
+        assert evalsha.await_args_list[2].args[-1] == 0
+
+    @pytest.mark.asyncio
+    async def test_live_calls_do_not_wait_for_the_background_poll(self, mock_redis):
+        # Background work is held back by the reserve while live tokens remain
+        mock_redis.redis_client.evalsha.side_effect = lambda *args: [0, 10, 30000] if args[-1] else [1, 10, 0]
+        scheduler = QuotaScheduler("test_quota", limit=100, window=3600, reserve=0.2, max_waiting=10)
+
+        background = asyncio.create_task(scheduler.acquire(BACKGROUND, max_wait=5))
+        await asyncio.sleep(0.005)
+        await asyncio.wait_for(scheduler.acquire(LIVE, max_wait=5), timeout=0.1)
+
+        background.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await background
+        # A waiter cancelled from outside leaves the queue, so no token goes to it
+        assert scheduler.waiters[0][2].cancelled()
+        scheduler.dispatcher.cancel()
+
+    @pytest.mark.asyncio
+    async def test_waits_are_bounded(self, mock_redis):
+        mock_redis.redis_client.evalsha.return_value = [0, 0, 60000]
+        scheduler = QuotaScheduler("test_quota", limit=100, window=3600, reserve=0.2, max_waiting=10)
+
+        with pytest.raises(HTTPException) as error:
+            await scheduler.acquire(LIVE, max_wait=0.01)
+        scheduler.dispatcher.cancel()
+
+        assert error.value.status_code == 429
+        assert scheduler.stats["rejected"] == 1
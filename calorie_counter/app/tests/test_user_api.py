@@ -1,6 +1,13 @@
 import pytest
 import pytest_asyncio
 from httpx import AsyncClient
+import json
+from unittest.mock import patch, AsyncMock
+from fastapi import HTTPException
+from passlib.context import CryptContext
+from redis.exceptions import RedisError
+from app.crud.user import UserCrud
+from app.utils.user import PasswordHasher, password_hasher
 
 
 class TestUserRegistration:
@@ -100,3 +107,99 @@ class TestUserLogin:
         error = response.json()
         assert "Invalid Credentials" in error["message"]
 
+    @pytest.mark.asyncio
+    async def test_login_rehashes_password_when_cost_changes(self, client, existing_user):
+        login_info = {"email": existing_user["email"], "password": existing_user["password"]}
+        cheaper_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=5)
+
+        with patch.object(password_hasher, "pwd_context", cheaper_context), \
+             patch.object(UserCrud, "update_password", autospec=True, side_effect=UserCrud.update_password) as update:
+            response = await client.post("/auth/login", json=login_info)
+            assert response.status_code == 200
+            assert update.call_args.args[2].startswith("$2b$05$")
+
+            # Already on the new cost, so no further rehash
+            response = await client.post("/auth/login", json=login_info)
+            assert response.status_code == 200
+            assert update.call_count == 1
+
+
+class TestTrustedAuthentication:
+
+    @pytest_asyncio.fixture
+    async def auth_headers(self, client):
+        response = await client.post("/auth/register", json={
+            "email": "bob@example.com", "password": "bobpassword123", "first_name": "Bob", "last_name": "Builder"
+        })
+        return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    def cached_principal(self, token_version: bytes):
+        principal = {"id": 1, "email": "bob@example.com", "first_name": "Bob", "last_name": "Builder"}
+        return [json.dumps(principal).encode(), token_version]
+
+    @pytest.mark.asyncio
+    async def test_cached_principal_needs_no_database(self, client, auth_headers, mock_redis):
+        mock_redis.redis_client.mget.return_value = self.cached_principal(b"0")
+        with patch.object(UserCrud, "get_by_email", AsyncMock(side_effect=AssertionError("no SQL expected"))):
+            response = await client.get("/cache/stats", headers=auth_headers)
+            assert response.status_code == 200
+            # Served from the in-process tier now, without touching Redis either
+            response = await client.get("/cache/stats", headers=auth_headers)
+            assert response.status_code == 200
+        assert mock_redis.redis_client.mget.await_count == 1
+
+    @pytest.mark.asyncio
+    async def test_revoked_token_is_rejected(self, client, auth_headers, mock_redis):
+        mock_redis.redis_client.mget.return_value = self.cached_principal(b"1")
+        response = await client.get("/cache/stats", headers=auth_headers)
+        assert response.status_code == 401
+
+    @pytest.mark.asyncio
+    async def test_strict_mode_always_loads_user(self, client, auth_headers, mock_redis):
+        with patch("app.utils.user.settings.auth_mode", "strict"), \
+             patch.object(UserCrud, "get_by_email", autospec=True, side_effect=UserCrud.get_by_email) as get_by_email:
+            response = await client.get("/cache/stats", headers=auth_headers)
+        assert response.status_code == 200
+        get_by_email.assert_called_once()
+        mock_redis.redis_client.mget.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_revoked_token_is_rejected_in_strict_mode(self, client, auth_headers, mock_redis):
+        response = await client.post("/auth/revoke-tokens", headers=auth_headers)
+        assert response.status_code == 200
+        mock_redis.redis_client.set.assert_any_await("token_version:1", 1)
+
+        with patch("app.utils.user.settings.auth_mode", "strict"):
+            response = await client.get("/cache/stats", headers=auth_headers)
+            assert response.status_code == 401
+            response = await client.post("/auth/login", json={"email": "bob@example.com", "password": "bobpassword123"})
+            new_headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+            response = await client.get("/cache/stats", headers=new_headers)
+            assert response.status_code == 200
+
+    @pytest.mark.asyncio
+    async def test_revoked_token_is_rejected_while_redis_is_down(self, client, auth_headers, mock_redis):
+        response = await client.post("/auth/revoke-tokens", headers=auth_headers)
+        assert response.status_code == 200
+
+        mock_redis.redis_client.mget.side_effect = RedisError("connection refused")
+        response = await client.get("/cache/stats", headers=auth_headers)
+        assert response.status_code == 401
+
+
+class TestPasswordHasher:
+
+    @pytest.mark.asyncio
+    async def test_rejects_work_beyond_pool_and_queue(self):
+        hasher = PasswordHasher(rounds=4, workers=1, max_waiting=0)
+        hasher.in_use = 1
+        with pytest.raises(HTTPException) as error:
+            await hasher.hash("password123")
+        assert error.value.status_code == 503
+
+    @pytest.mark.asyncio
+    async def test_hashes_in_worker_thread(self):
+        hasher = PasswordHasher(rounds=4, workers=1, max_waiting=0)
+        hashed = await hasher.hash("password123")
+        assert await hasher.verify_and_update("password123", hashed) == (True, None)
+        assert hasher.in_use == 0
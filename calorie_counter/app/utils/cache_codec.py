@@ -0,0 +1,176 @@
+import json
+import math
+import struct
+import zlib
+from typing import Any, Dict, Optional, Tuple
+from app.utils.nutrients import MACRO_NUTRIENTS
+
+
+NUTRIENT_NAMES = tuple(MACRO_NUTRIENTS)
+VALUE_FIELDS = {"description", "fdc_id", "calories_per_serving", "nutrients"}
+SERVING_FIELDS = {"serving_grams", "serving_description"}
+
+# Binary payloads start with this byte; JSON payloads always start with "{",
+# so entries written by either codec (or before codecs existed) stay readable
+STRUCT_MAGIC = 0xC1
+
+FLAG_COMPRESSED = 1
+FLAG_NO_NUTRIENTS = 2
+FLAG_NO_FDC_ID = 4
+FLAG_SERVING = 8
+
+# magic, flags, soft and hard expiry (unix seconds; NO_EXPIRY for none)
+HEADER = struct.Struct("<BBII")
+# fdc_id, calories per serving and every macro, amounts in hundredths; the
+# UTF-8 description follows
+BODY = struct.Struct(f"<i{1 + len(NUTRIENT_NAMES)}i")
+# With FLAG_SERVING, between the body and the description: serving grams in
+# hundredths and the length of the UTF-8 serving description that follows
+# (NO_TEXT for none)
+SERVING = struct.Struct("<iH")
+NO_TEXT = 0xFFFF
+NO_EXPIRY = 0xFFFFFFFF
+INT32_MAX = 2 ** 31 - 1
+
+Decoded = Tuple[Dict[str, Any], float, float]
+
+
+class JsonCodec:
+    # The original format: {"value": ..., "soft_expires_at": ..., "hard_expires_at": ...}
+    name = "json"
+
+    def encode(self, value: Dict[str, Any], soft_expires_at: float, hard_expires_at: float) -> bytes:
+        return json.dumps({
+            "value": value, "soft_expires_at": soft_expires_at, "hard_expires_at": hard_expires_at
+        }).encode()
+
+    def decode(self, payload: bytes) -> Decoded:
+        data = json.loads(payload)
+        # Entries written before hard_expires_at existed were stored with the
+        # hard TTL as their Redis expiry, so if present they are still valid
+        return data["value"], data["soft_expires_at"], data.get("hard_expires_at", math.inf)
+
+
+class StructCodec:
+    # Fixed layout for the dish values the calorie service caches: 2-decimal
+    # amounts as int32 hundredths (lossless) and expiries as whole seconds,
+    # under a quarter of the JSON size. Anything that doesn't fit the layout
+    # (other fields, unrounded amounts) is written as JSON instead. With
+    # `compress_min_bytes` set, longer payloads are zlib-compressed when that
+    # makes them smaller.
+    name = "struct"
+
+    def __init__(self, compress_min_bytes: int = 0):
+        self.compress_min_bytes = compress_min_bytes
+        self.fallback = JsonCodec()
+
+    def encode(self, value: Dict[str, Any], soft_expires_at: float, hard_expires_at: float) -> bytes:
+        packed = self._pack_value(value)
+        if packed is None:
+            return self.fallback.encode(value, soft_expires_at, hard_expires_at)
+        flags, body = packed
+        if self.compress_min_bytes and len(body) >= self.compress_min_bytes:
+            compressed = zlib.compress(body, 6)
+            if len(compressed) < len(body):
+                flags |= FLAG_COMPRESSED
+                body = compressed
+        return HEADER.pack(STRUCT_MAGIC, flags, self._pack_time(soft_expires_at), self._pack_time(hard_expires_at)) + body
+
+    def decode(self, payload: bytes) -> Decoded:
+        _, flags, soft_expires_at, hard_expires_at = HEADER.unpack_from(payload)
+        body = payload[HEADER.size:]
+        if flags & FLAG_COMPRESSED:
+            body = zlib.decompress(body)
+        fdc_id, calories, *nutrients = BODY.unpack_from(body)
+        serving = {}
+        offset = BODY.size
+        if flags & FLAG_SERVING:
+            grams, length = SERVING.unpack_from(body, offset)
+            offset += SERVING.size
+            serving = {"serving_grams": grams / 100, "serving_description": None}
+            if length != NO_TEXT:
+                serving["serving_description"] = body[offset:offset + length].decode()
+                offset += length
+        value = {
+            "description": body[offset:].decode(),
+            "fdc_id": None if flags & FLAG_NO_FDC_ID else fdc_id,
+            "calories_per_serving": calories / 100,
+            "nutrients": None if flags & FLAG_NO_NUTRIENTS else {
+                name: amount / 100 for name, amount in zip(NUTRIENT_NAMES, nutrients)
+            },
+            **serving
+        }
+        return value, self._unpack_time(soft_expires_at), self._unpack_time(hard_expires_at)
+
+    def _pack_value(self, value: Dict[str, Any]) -> Optional[Tuple[int, bytes]]:
+        if not isinstance(value, dict) or set(value) not in (VALUE_FIELDS, VALUE_FIELDS | SERVING_FIELDS) \
+                or not isinstance(value["description"], str):
+            return None
+        flags = 0
+        serving = b""
+        if "serving_grams" in value:
+            grams = self._pack_amount(value["serving_grams"])
+            text = value["serving_description"]
+            if grams is None or not (text is None or isinstance(text, str)):
+                return None
+            text = b"" if text is None else text.encode()
+            if len(text) >= NO_TEXT:
+                return None
+            flags |= FLAG_SERVING
+            serving = SERVING.pack(grams, NO_TEXT if value["serving_description"] is None else len(text)) + text
+        fdc_id = value["fdc_id"]
+        if fdc_id is None:
+            flags |= FLAG_NO_FDC_ID
+            fdc_id = 0
+        elif not isinstance(fdc_id, int) or not -INT32_MAX <= fdc_id <= INT32_MAX:
+            return None
+        nutrients = value["nutrients"]
+        if nutrients is None:
+            flags |= FLAG_NO_NUTRIENTS
+            amounts = [0.0] * len(NUTRIENT_NAMES)
+        elif isinstance(nutrients, dict) and set(nutrients) == set(NUTRIENT_NAMES):
+            amounts = [nutrients[name] for name in NUTRIENT_NAMES]
+        else:
+            return None
+        hundredths = [self._pack_amount(amount) for amount in [value["calories_per_serving"], *amounts]]
+        if None in hundredths:
+            return None
+        return flags, BODY.pack(fdc_id, *hundredths) + serving + value["description"].encode()
+
+    @staticmethod
+    def _pack_amount(amount: Any) -> Optional[int]:
+        if isinstance(amount, bool) or not isinstance(amount, (int, float)) or not math.isfinite(amount):
+            return None
+        hundredths = round(amount * 100)
+        if abs(hundredths) > INT32_MAX or hundredths / 100 != amount:
+            return None
+        return hundredths
+
+    @staticmethod
+    def _pack_time(timestamp: float) -> int:
+        return NO_EXPIRY if timestamp == math.inf else min(int(timestamp), NO_EXPIRY - 1)
+
+    @staticmethod
+    def _unpack_time(timestamp: int) -> float:
+        return math.inf if timestamp == NO_EXPIRY else float(timestamp)
+
+
+CODECS = {"json": JsonCodec, "struct": StructCodec}
+
+
+def get_codec(name: str, compress_min_bytes: int = 0):
+    if name not in CODECS:
+        raise ValueError(f"Unknown cache codec {name!r}; expected one of {', '.join(CODECS)}")
+    return StructCodec(compress_min_bytes) if name == "struct" else CODECS[name]()
+
+
+_json_codec = JsonCodec()
+_struct_codec = StructCodec()
+
+
+def decode_entry(payload: bytes) -> Decoded:
+    # Readers accept every format regardless of the configured codec, so the
+    # codec can be switched on a live cache
+    if payload[0] == STRUCT_MAGIC:
+        return _struct_codec.decode(payload)
+    return _json_codec.decode(payload)
@@ -0,0 +1,142 @@
+import asyncio
+import os
+import time
+from typing import Iterable, List, Optional, Set, Tuple
+from fastapi import HTTPException
+from app.core.config import settings
+from app.core.database import get_redis_client
+from app.utils.calorie import USDAFoodService, RedisCache, build_cache_value, normalize_dish_name, make_cache_key
+from app.utils.usda_quota import BACKGROUND
+
+
+async def popular_dishes(limit: int) -> List[str]:
+    # The cluster's most looked-up dishes, as tracked for /foods/suggest
+    names = await get_redis_client().zrevrange(settings.suggest_redis_key, 0, limit - 1)
+    return [name.decode() for name in names]
+
+
+class CacheWarmer:
+    # Resolves dish names through USDAFoodService at background priority (so
+    # within the shared USDA quota, behind live traffic) and writes them to
+    # Redis in pipelined batches. Every dish that is written or known not to
+    # exist is appended to `state_path` after its batch lands, so an
+    # interrupted run picks up where it stopped. A run that finishes removes
+    # the file, so the next run (e.g. after a Redis flush) starts over.
+
+    def __init__(self, state_path: Optional[str], concurrency: int = 8, batch_size: int = 100,
+                 force: bool = False, progress_interval: float = 5.0, max_retries: int = 3):
+        self.state_path = state_path
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.force = force
+        self.progress_interval = progress_interval
+        self.max_retries = max_retries
+        self.cache = RedisCache()
+        self.pending: List[Tuple[str, str, dict]] = []
+        self.flush_lock = asyncio.Lock()
+        self.stats = {"total": 0, "skipped": 0, "warmed": 0, "not_found": 0, "failed": 0}
+
+    def load_state(self) -> Set[str]:
+        if not self.state_path or not os.path.exists(self.state_path):
+            return set()
+        with open(self.state_path) as f:
+            return {line.rstrip("\n") for line in f if line.strip()}
+
+    def save_state(self, names: Iterable[str]):
+        if self.state_path:
+            with open(self.state_path, "a") as f:
+                f.writelines(f"{name}\n" for name in names)
+
+    def clear_state(self):
+        if self.state_path and os.path.exists(self.state_path):
+            os.remove(self.state_path)
+
+    async def run(self, dish_names: Iterable[str]):
+        names = list(dict.fromkeys(normalize_dish_name(name) for name in dish_names if name.strip()))
+        done = self.load_state()
+        todo = [name for name in names if name not in done]
+        self.stats["total"] = len(names)
+        self.stats["skipped"] = len(names) - len(todo)
+        if not self.force:
+            todo = await self.drop_cached(todo)
+
+        queue: asyncio.Queue = asyncio.Queue()
+        for name in todo:
+            queue.put_nowait(name)
+        progress = asyncio.create_task(self.report_progress())
+        started = time.monotonic()
+        try:
+            await asyncio.gather(*[self.worker(queue) for _ in range(self.concurrency)])
+        finally:
+            # Also on Ctrl-C, so finished lookups are not lost
+            await self.flush()
+            progress.cancel()
+            self.print_progress(started)
+        # Only reached when every dish was tried
+        self.clear_state()
+        return self.stats
+
+    async def drop_cached(self, names: List[str]) -> List[str]:
+        # Entries already in Redis and within their hard TTL need no lookup
+        todo = []
+        for start in range(0, len(names), self.batch_size):
+            chunk = names[start:start + self.batch_size]
+            entries = await self.cache.get_entries([make_cache_key(name) for name in chunk])
+            for name, entry in zip(chunk, entries):
+                if entry is None or entry.is_expired:
+                    todo.append(name)
+                else:
+                    self.stats["skipped"] += 1
+        return todo
+
+    async def worker(self, queue: asyncio.Queue):
+        while not queue.empty():
+            name = queue.get_nowait()
+            value = await self.resolve(name)
+            if value is not None:
+                self.pending.append((name, make_cache_key(name), value))
+                if len(self.pending) >= self.batch_size:
+                    await self.flush()
+
+    async def resolve(self, name: str) -> Optional[dict]:
+        for attempt in range(self.max_retries + 1):
+            try:
+                food = await USDAFoodService(dish_name=name, priority=BACKGROUND).get_best_match()
+                return build_cache_value(food)
+            except HTTPException as e:
+                if e.status_code == 404:
+                    self.stats["not_found"] += 1
+                    self.save_state([name])
+                    return None
+                retry_after = (e.headers or {}).get("Retry-After")
+                if retry_after is None or attempt == self.max_retries:
+                    print(f"Could not warm {name!r}: {e.status_code} {e.detail}")
+                    self.stats["failed"] += 1
+                    return None
+                # Quota exhausted or breaker open: wait it out rather than fail
+                await asyncio.sleep(float(retry_after))
+
+    async def flush(self):
+        async with self.flush_lock:
+            if not self.pending:
+                return
+            batch, self.pending = self.pending, []
+            await self.cache.set_many([(key, value) for _, key, value in batch])
+            self.save_state(name for name, _, _ in batch)
+            self.stats["warmed"] += len(batch)
+
+    async def report_progress(self):
+        started = time.monotonic()
+        while True:
+            await asyncio.sleep(self.progress_interval)
+            self.print_progress(started)
+
+    def print_progress(self, started: float):
+        finished = sum(self.stats[key] for key in ("skipped", "warmed", "not_found", "failed")) + len(self.pending)
+        elapsed = time.monotonic() - started
+        rate = (finished - self.stats["skipped"]) / elapsed if elapsed else 0.0
+        remaining = self.stats["total"] - finished
+        eta = f"{remaining / rate:.0f}s" if rate else "-"
+        print(f"{finished}/{self.stats['total']} done, {self.stats['warmed']} warmed, "
+              f"{self.stats['skipped']} skipped, {self.stats['not_found']} not found, "
+              f"{self.stats['failed']} failed, {rate:.1f}/s, eta {eta}")
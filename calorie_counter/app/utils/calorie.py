@@ -1,117 +1,435 @@
-import json
+import asyncio
+import math
+import random
+import time
+import unicodedata
+import zlib
 import httpx
-import numpy as np
-from typing import List, Dict, Any
+from redis.exceptions import RedisError
+from dataclasses import dataclass
+from typing import List, Dict, Any, Optional, Tuple
 from fastapi import HTTPException
 from app.core.config import settings
-from app.core.database import redis_client
+from app.core.database import get_redis_client
+from app.core.http_client import get_http_client, usda_attempt_timeout
+from app.core.metrics import time_stage, count_cache, usda_errors
+from app.utils.cache_codec import get_codec, decode_entry
+from app.utils.local_cache import l1_cache, publish_invalidation
+from app.utils.food_index import FoodIndex, get_food_index
+from app.utils.ranking import ranking_engine
+from app.utils.nutrients import nutrient_engine
+from app.utils.circuit_breaker import usda_breaker
+from app.utils.usda_quota import usda_quota, LIVE
+from app.utils.food_details import FoodDetailLoader, USDA_MAX_IDS_PER_CALL, apply_portion, portion_from_measures
+
+
+RETRYABLE_STATUSES = {500, 502, 503, 504}
+
+
+def normalize_dish_name(dish_name: str) -> str:
+    # "Pizza", "pizza " and "PIZZA" are the same dish
+    return " ".join(unicodedata.normalize("NFKC", dish_name).casefold().split())
+
+
+def make_cache_key(dish_name: str) -> str:
+    # Bumping CACHE_VERSION (e.g. after a matcher change) orphans every old
+    # entry at once; they age out through the hard TTL.
+    return f"{settings.cache_namespace}:v{settings.cache_version}:{normalize_dish_name(dish_name)}"
+
+
+def make_bucket_key(number: int) -> str:
+    return f"{settings.cache_namespace}:buckets:v{settings.cache_version}:{number}"
 
 
 class USDAFoodService:
     
-    def __init__(self, dish_name: str):
+    def __init__(self, dish_name: str = None, client: httpx.AsyncClient = None, food_index: Optional[FoodIndex] = None,
+                 priority: int = LIVE):
         self.dish_name = dish_name
+        self.priority = priority
         self.matcher = FoodMatcher()
+        self.client = client or get_http_client()
+        self.food_index = food_index or get_food_index()
+
+    def search_food_index(self):
+        # Only trust the offline index when every word of the dish matched;
+        # otherwise the live API usually has a better candidate.
+        if self.food_index is None:
+            return None
+        foods = self.food_index.search(self.dish_name, settings.food_index_candidates)
+        if not foods:
+            return None
+        best_match = self.matcher.find_best_match(self.dish_name, foods)
+        if self.matcher.calculate_word_score(self.dish_name, best_match["description"]) < settings.food_index_min_score:
+            return None
+        return best_match
     
     async def search_usda_api(self):
+        query_params = {
+            "query": self.dish_name,
+            "pageSize": settings.usda_page_size # Candidates for the ranking engine to choose from
+        }
+        payload = await self.call_api(settings.usda_api_url, query_params)
+        try:
+            return payload["foods"]
+        except (TypeError, KeyError):
+            raise HTTPException(status_code=502, detail="USDA API Error")
+
+    async def get_food_details(self, fdc_ids: List[int]) -> List[Dict[str, Any]]:
+        # Full records for up to USDA_MAX_IDS_PER_CALL foods in one call
+        records = await self.call_api(settings.usda_foods_url, {"fdcIds": ",".join(map(str, fdc_ids)), "format": "full"})
+        if not isinstance(records, list):
+            raise HTTPException(status_code=502, detail="USDA API Error")
+        return records
+
+    async def call_api(self, url: str, query_params: Dict[str, Any]) -> Any:
+        # Fails fast while the breaker is open; upstream failures are mapped
+        # to 429/502/503/504 so callers can tell them apart from our own bugs.
+        permit = await usda_breaker.allow()
+        if not permit.allowed:
+            usda_errors.labels("breaker_open").inc()
+            raise HTTPException(status_code=503, detail="USDA API temporarily unavailable",
+                                headers={"Retry-After": str(max(math.ceil(permit.retry_after), 1))})
+
+        query_params = {**query_params, "api_key": settings.usda_api_key}
         try:
-            query_params = {
-                "query": self.dish_name,
-                "api_key": settings.usda_api_key,
-                "pageSize": settings.usda_page_size # Limiting only 5 best results from USDA API
-            }
-            
-            async with httpx.AsyncClient() as client:
-                response = await client.get(settings.usda_api_url, params=query_params)
-                
-                if response.status_code == 429:
-                    raise HTTPException(status_code=429, detail="Rate Limit Exceeded")
-                
-                response.raise_for_status()
-                result = response.json()
-                return result["foods"]
-                
-        except Exception as e:
+            response = await asyncio.wait_for(self.fetch(url, query_params), timeout=settings.usda_deadline)
+        except asyncio.TimeoutError:
+            usda_errors.labels("timeout").inc()
+            await usda_breaker.record_failure()
+            raise HTTPException(status_code=504, detail="USDA API timed out")
+        except httpx.TransportError as e:
+            usda_errors.labels("transport_error").inc()
             print(f"Error calling USDA API: {str(e)}")
-            raise HTTPException(status_code=500, detail="USDA API Error")
-    
+            await usda_breaker.record_failure()
+            raise HTTPException(status_code=502, detail="USDA API Error")
+
+        if response.status_code == 429:
+            usda_errors.labels("rate_limited").inc()
+            await usda_breaker.record_failure()
+            raise HTTPException(status_code=429, detail="USDA API rate limit exceeded",
+                                headers={"Retry-After": response.headers.get("Retry-After", "60")})
+
+        if response.is_error:
+            usda_errors.labels("http_error").inc()
+            print(f"Error calling USDA API: HTTP {response.status_code}")
+            if response.status_code >= 500:
+                await usda_breaker.record_failure()
+            else:
+                await usda_breaker.record_success(permit)
+            raise HTTPException(status_code=502, detail="USDA API Error")
+
+        await usda_breaker.record_success(permit)
+        try:
+            return response.json()
+        except ValueError:
+            raise HTTPException(status_code=502, detail="USDA API Error")
+
+    async def fetch(self, url: str, query_params: Dict[str, Any]) -> httpx.Response:
+        # GET is idempotent, so connection errors, timeouts and 5xx are
+        # retried with full-jitter exponential backoff. 429 is not: retrying
+        # only burns more of the quota.
+        for attempt in range(settings.usda_retry_attempts + 1):
+            last_attempt = attempt == settings.usda_retry_attempts
+            # Every attempt spends quota; waits here are bounded and surface
+            # as a 429 when the shared budget stays empty
+            with time_stage("usda_quota"):
+                await usda_quota.acquire(self.priority)
+            try:
+                with time_stage("usda_call"):
+                    response = await self.client.get(url, params=query_params, timeout=usda_attempt_timeout())
+                if response.status_code not in RETRYABLE_STATUSES or last_attempt:
+                    return response
+            except httpx.TransportError:
+                if last_attempt:
+                    raise
+            await asyncio.sleep(random.uniform(0, min(settings.usda_retry_max_delay,
+                                                      settings.usda_retry_base_delay * 2 ** attempt)))
+
+    async def resolve_portion(self, food: Dict[str, Any]) -> Dict[str, Any]:
+        # Search results only carry a serving size for branded foods (and
+        # household measures for survey foods); other foods get the portion
+        # from their full record, fetched in bulk and cached by fdcId.
+        if food.get("servingSize") or food.get("fdcId") is None:
+            return food
+        portion = portion_from_measures(food)
+        if portion is None:
+            with time_stage("usda_details"):
+                portion = await food_details.load(food["fdcId"], self.priority)
+        return apply_portion(food, portion)
+
     async def get_best_match(self):
+        # Index rows hold per-100 g amounts and no serving, like search
+        # results, so both get their portion the same way
+        best_match = self.search_food_index()
+        if best_match is not None:
+            return await self.resolve_portion(best_match)
+
         foods = await self.search_usda_api()
         if not foods:
             raise HTTPException(status_code=404, detail="Dish Not Found")
 
         best_match = self.matcher.find_best_match(self.dish_name, foods)
-        return best_match
+        return await self.resolve_portion(best_match)
+
+
+food_details = FoodDetailLoader(
+    lambda fdc_ids, priority: USDAFoodService(priority=priority).get_food_details(fdc_ids),
+    min(settings.usda_details_batch_size, USDA_MAX_IDS_PER_CALL),
+    settings.usda_details_batch_window
+)
 
 
 class FoodMatcher:
-    
+
+    def __init__(self):
+        self.engine = ranking_engine
+
     def calculate_word_score(self, dish_name: str, description: str) -> float:
-        dish_name_words = dish_name.lower().split()
-        description_lower = description.lower()        
-        matches = sum(1 for word in dish_name_words if word in description_lower)
-        return matches / len(dish_name_words)
-    
+        coverage, _ = self.engine.score(dish_name, [description])
+        return float(coverage[0])
+
     def find_best_match(self, dish_name: str, foods: List[Any]):
-        scores = np.array([
-            self.calculate_word_score(dish_name, item["description"]) 
-            for item in foods
-        ])        
-        best_score = np.max(scores)
-        best_score_index = np.where(scores == best_score)[0]
-        best_item = foods[best_score_index[0]]
-        return best_item
+        with time_stage("matcher"):
+            best_index = self.engine.best_index(dish_name, [item["description"] for item in foods])
+        return foods[best_index]
 
 
 class CalorieCounter:
-    
+    # Single-food view over the nutrient engine; batches should call
+    # nutrient_engine directly to compute many foods in one pass.
+
     def __init__(self, food_item: Dict[str, Any]):
         self.food_item = food_item
-        self.serving_size = 100
-        self.serving_size_unit = "g"
-        self.nutrient_id_dict = {1008: "Energy", 1003: "Protein", 1004: "Fat", 1005: "Carbohydrate"}
-        self.calories_per_serving = self.get_calories_per_serving()
-    
+        with time_stage("nutrients"):
+            self.nutrients_per_serving = nutrient_engine.profiles([food_item])[0]
+        self.calories_per_serving = self.nutrients_per_serving["energy"]
+
     def get_calories_per_serving(self) -> float:
-        food_serving_size = self.get_food_serving_size() # we get the serving size in grams
-        multiplication_factor = round(100 / food_serving_size, 2)
-        food_nutrients = self.get_food_nutrients()
-        calories = food_nutrients.get("Energy", 0.0)
-        # If kcal data is found in the food_nutrients, then using it
-        if calories:
-            return round(calories * multiplication_factor, 2)
-        
-        protein = food_nutrients.get("Protein", 0.0) * 4
-        carbohydrate = food_nutrients.get("Carbohydrate", 0.0) * 4
-        fat = food_nutrients.get("Fat", 0.0) * 9
-        
-        total_calories = protein + carbohydrate + fat
-        return round(total_calories * multiplication_factor, 2)        
+        return self.calories_per_serving
 
     def get_food_serving_size(self) -> float:
-        seriving_size = self.food_item.get('servingSize', 100)
-        serving_unit = self.food_item.get('servingSizeUnit', 'g')
-        if serving_unit == "g":
-            return seriving_size
-        elif serving_unit == "kg":
-            return seriving_size * 1000
-        return seriving_size # default to grams
-
-    def get_food_nutrients(self) -> Dict[str, Any]:
-        food_nutrients = {}
-        for nutrient in self.food_item.get('foodNutrients', []):
-            if nutrient.get("nutrientId") in self.nutrient_id_dict:
-                food_nutrients[self.nutrient_id_dict[nutrient.get("nutrientId")]] = nutrient.get("value", 0.0)
-        return food_nutrients
+        return float(nutrient_engine.serving_grams([self.food_item])[0])
+
+
+def build_cache_value(food: Dict[str, Any]) -> Dict[str, Any]:
+    # What the cache keeps for a dish: the matched food, the serving its
+    # macros are for and the macros
+    calorie_counter = CalorieCounter(food)
+    return {
+        "description": food["description"],
+        "fdc_id": food.get("fdcId"),
+        "calories_per_serving": calorie_counter.calories_per_serving,
+        "nutrients": calorie_counter.nutrients_per_serving,
+        "serving_grams": round(calorie_counter.get_food_serving_size(), 2),
+        "serving_description": food.get("householdServingFullText")
+    }
+
+
+@dataclass
+class CacheEntry:
+    value: Dict[str, Any]
+    soft_expires_at: float
+    hard_expires_at: float = math.inf
+
+    @property
+    def is_stale(self) -> bool:
+        return time.time() >= self.soft_expires_at
+
+    @property
+    def is_expired(self) -> bool:
+        # Past the hard TTL: only good as a fallback while USDA is down
+        return time.time() >= self.hard_expires_at
 
 
 class RedisCache:
+    # Redis tier counters are shared by every instance in the worker
+    stats = {"hits": 0, "misses": 0}
+    codec = get_codec(settings.cache_codec, settings.cache_compress_min_bytes)
+
     def __init__(self):
-        self.redis_client = redis_client
+        self.redis_client = get_redis_client()
+        self.local_cache = l1_cache
+
+    @staticmethod
+    def bucket_location(key: str) -> Tuple[str, str]:
+        # With CACHE_HASH_BUCKETS set, entries are fields spread over that many
+        # hashes, which Redis stores far more compactly than a key per dish.
+        # Bucket names can't collide with dish keys ("{namespace}:v{version}:...").
+        prefix = f"{settings.cache_namespace}:v{settings.cache_version}:"
+        field = key[len(prefix):] if key.startswith(prefix) else key
+        return make_bucket_key(zlib.crc32(key.encode()) % settings.cache_hash_buckets), field
+
+    async def get_entry(self, key: str, skip_local: bool = False) -> Optional[CacheEntry]:
+        # skip_local reads Redis even when L1 has the key (and refreshes L1)
+        if not skip_local:
+            entry = self.local_cache.get(key)
+            count_cache("l1", entry is not None)
+            if entry is not None:
+                return entry
+
+        with time_stage("redis_get"):
+            if settings.cache_hash_buckets:
+                [cache] = await self._read_buckets([key])
+            else:
+                cache = await self.redis_client.get(key)
+        return self._load_entry(key, cache)
+
+    async def get_entries(self, keys: List[str]) -> List[Optional[CacheEntry]]:
+        # L1 first, then a single MGET (or HGET pipeline) for everything L1
+        # didn't have
+        entries = [self.local_cache.get(key) for key in keys]
+        missing = [index for index, entry in enumerate(entries) if entry is None]
+        for entry in entries:
+            count_cache("l1", entry is not None)
+        if missing:
+            missing_keys = [keys[index] for index in missing]
+            with time_stage("redis_get"):
+                if settings.cache_hash_buckets:
+                    caches = await self._read_buckets(missing_keys)
+                else:
+                    caches = await self.redis_client.mget(missing_keys)
+            for index, cache in zip(missing, caches):
+                entries[index] = self._load_entry(keys[index], cache)
+        return entries
+
+    async def _read_buckets(self, keys: List[str]) -> List[Optional[bytes]]:
+        async with self.redis_client.pipeline(transaction=False) as pipe:
+            for key in keys:
+                pipe.hget(*self.bucket_location(key))
+            caches = await pipe.execute()
+        legacy = [index for index, cache in enumerate(caches) if cache is None]
+        if legacy and settings.cache_legacy_reads:
+            # Entries written as plain keys before buckets were turned on; they
+            # age out through their own TTL
+            for index, cache in zip(legacy, await self.redis_client.mget([keys[index] for index in legacy])):
+                caches[index] = cache
+        return caches
+
+    def _load_entry(self, key: str, cache: Optional[bytes]) -> Optional[CacheEntry]:
+        entry = CacheEntry(*decode_entry(cache)) if cache else None
+        # Hash fields outlive their entry unless Redis expires them itself
+        # (CACHE_HASH_FIELD_TTL), so anything past the stale window is a miss
+        if entry is not None and time.time() >= entry.hard_expires_at + settings.cache_stale_ttl:
+            entry = None
+        count_cache("redis", entry is not None)
+        if entry is None:
+            RedisCache.stats["misses"] += 1
+            return None
+        RedisCache.stats["hits"] += 1
+        self.local_cache.set(key, entry)
+        return entry
+
+    async def get_cache(self, key: str):
+        entry = await self.get_entry(key)
+        return None if entry is None or entry.is_expired else entry.value
+
+    @staticmethod
+    def new_entry(value: Any) -> CacheEntry:
+        # Entries are served as-is until the soft TTL and served stale while a
+        # background refresh runs until the hard TTL. Redis keeps them for
+        # CACHE_STALE_TTL longer as a last known good value for USDA outages.
+        now = time.time()
+        return CacheEntry(value, now + settings.cache_soft_ttl, now + settings.cache_hard_ttl)
+
+    @staticmethod
+    def redis_ttl() -> int:
+        return settings.cache_hard_ttl + settings.cache_stale_ttl
+
+    @classmethod
+    def encode_entry(cls, entry: CacheEntry) -> bytes:
+        return cls.codec.encode(entry.value, entry.soft_expires_at, entry.hard_expires_at)
+
+    def _write(self, pipe, key: str, entry: CacheEntry):
+        if not settings.cache_hash_buckets:
+            pipe.set(key, self.encode_entry(entry), ex=self.redis_ttl())
+            return
+        bucket, field = self.bucket_location(key)
+        pipe.hset(bucket, field, self.encode_entry(entry))
+        # A bucket lives as long as its newest entry
+        pipe.expire(bucket, self.redis_ttl())
+        if settings.cache_hash_field_ttl:
+            pipe.hexpire(bucket, self.redis_ttl(), field)
+
+    async def set_cache(self, key: str, value: Any):
+        entry = self.new_entry(value)
+        with time_stage("redis_set"):
+            if settings.cache_hash_buckets:
+                async with self.redis_client.pipeline(transaction=False) as pipe:
+                    self._write(pipe, key, entry)
+                    await pipe.execute()
+            else:
+                await self.redis_client.set(key, self.encode_entry(entry), ex=self.redis_ttl())
+        self.local_cache.set(key, entry)
+
+    async def set_many(self, items: List[Tuple[str, Any]]):
+        # Bulk writes (e.g. cache warm-up) in one pipelined round trip
+        entries = [(key, self.new_entry(value)) for key, value in items]
+        with time_stage("redis_set"):
+            async with self.redis_client.pipeline(transaction=False) as pipe:
+                for key, entry in entries:
+                    self._write(pipe, key, entry)
+                await pipe.execute()
+        for key, entry in entries:
+            self.local_cache.set(key, entry)
+
+    async def invalidate(self, key: str):
+        if settings.cache_hash_buckets:
+            await self.redis_client.hdel(*self.bucket_location(key))
+        await self.redis_client.delete(key)
+        self.local_cache.delete(key)
+        await publish_invalidation(key)
+
+    @classmethod
+    def get_stats(cls):
+        return {"l1": l1_cache.get_stats(), "redis": dict(cls.stats)}
+
+
+class BucketSweeper:
+    # Without CACHE_HASH_FIELD_TTL a bucket only expires with its newest entry,
+    # so fields for dishes nobody looks up again would stay forever. This
+    # periodically scans every bucket and deletes the fields that are past
+    # their stale window. A Redis lock lets one worker sweep per interval.
+
+    def __init__(self, lock_key: str):
+        self.lock_key = lock_key
+        self.task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if settings.cache_hash_buckets and not settings.cache_hash_field_ttl and settings.cache_sweep_interval \
+                and self.task is None:
+            self.task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(settings.cache_sweep_interval)
+            try:
+                lock_ttl = max(1, int(settings.cache_sweep_interval))
+                if await get_redis_client().set(self.lock_key, 1, nx=True, ex=lock_ttl):
+                    print(f"Swept {await self.sweep()} expired cache fields")
+            except (RedisError, OSError) as e:
+                print(f"Cache sweep failed: {str(e)}")
+
+    async def sweep(self) -> int:
+        redis_client = get_redis_client()
+        cutoff = time.time() - settings.cache_stale_ttl
+        swept = 0
+        for number in range(settings.cache_hash_buckets):
+            bucket = make_bucket_key(number)
+            dead = [field async for field, cache in redis_client.hscan_iter(bucket, count=settings.cache_sweep_batch)
+                    if decode_entry(cache)[2] <= cutoff]
+            for start in range(0, len(dead), settings.cache_sweep_batch):
+                swept += await redis_client.hdel(bucket, *dead[start:start + settings.cache_sweep_batch])
+        return swept
 
-    def get_cache(self, key: str):
-        cache = self.redis_client.get(key)
-        return None if not cache else json.loads(cache)
 
-    def set_cache(self, key: str, value: Any):
-        self.redis_client.set(key, json.dumps(value))
\ No newline at end of file
+bucket_sweeper = BucketSweeper(f"{settings.cache_namespace}:buckets:sweep_lock")
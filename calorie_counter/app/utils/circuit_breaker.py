@@ -0,0 +1,144 @@
+import time
+from collections import deque
+from dataclasses import dataclass
+from redis.exceptions import RedisError
+from app.core.config import settings
+from app.core.database import get_redis_client
+from app.utils.redis_script import RedisScript
+
+
+# KEYS = open, half-open, probe, failures. Opening sets `open` for the open
+# period and `half-open` until a probe succeeds; once `open` expires, a single
+# caller at a time (the one holding `probe`) is let through to test upstream.
+
+ALLOW_SCRIPT = RedisScript("""
+local open_ttl = redis.call('PTTL', KEYS[1])
+if open_ttl > 0 then
+    return {0, 0, open_ttl}
+end
+if redis.call('EXISTS', KEYS[2]) == 1 then
+    if redis.call('SET', KEYS[3], '1', 'NX', 'PX', ARGV[1]) then
+        return {1, 1, 0}
+    end
+    return {0, 0, math.max(redis.call('PTTL', KEYS[3]), 1)}
+end
+return {1, 0, 0}
+""")
+
+# ARGV = threshold, window (ms), open period (ms)
+FAILURE_SCRIPT = RedisScript("""
+local failures = redis.call('INCR', KEYS[4])
+if failures == 1 then
+    redis.call('PEXPIRE', KEYS[4], ARGV[2])
+end
+if failures >= tonumber(ARGV[1]) or redis.call('EXISTS', KEYS[2]) == 1 then
+    redis.call('SET', KEYS[1], '1', 'PX', ARGV[3])
+    redis.call('SET', KEYS[2], '1', 'PX', tonumber(ARGV[3]) * 10)
+    redis.call('DEL', KEYS[3], KEYS[4])
+    return 1
+end
+return 0
+""")
+
+
+@dataclass
+class BreakerPermit:
+    allowed: bool
+    probe: bool = False
+    retry_after: float = 0.0
+
+
+class CircuitBreaker:
+    # Cluster-wide breaker: opens for `open_seconds` after `threshold`
+    # failures within `window` seconds across all workers, then lets a single
+    # probe call through and closes again once a probe succeeds. While open,
+    # each worker also remembers the reopening time, so failing fast costs
+    # no Redis round trip. Falls back to per-worker state while Redis is down.
+
+    def __init__(self, name: str, threshold: int, window: float, open_seconds: float):
+        self.name = name
+        self.threshold = threshold
+        self.window = window
+        self.open_seconds = open_seconds
+        self.keys = [f"breaker:{name}:{part}" for part in ("open", "half_open", "probe", "failures")]
+        self.open_until = 0.0
+        self.redis_down_until = 0.0
+        self.local_failures: deque = deque()
+        self.local_half_open = False
+        self.local_probing = False
+
+    def reset(self):
+        # Forget this worker's view of the breaker; shared state is untouched
+        self.open_until = self.redis_down_until = 0.0
+        self.local_failures.clear()
+        self.local_half_open = self.local_probing = False
+
+    async def allow(self) -> BreakerPermit:
+        now = time.monotonic()
+        if now < self.open_until:
+            return BreakerPermit(False, retry_after=self.open_until - now)
+        if now >= self.redis_down_until:
+            try:
+                allowed, probe, retry_ms = await ALLOW_SCRIPT(
+                    get_redis_client(), self.keys, [int(self.open_seconds * 1000)]
+                )
+                if not allowed:
+                    self.open_until = now + int(retry_ms) / 1000
+                return BreakerPermit(bool(allowed), bool(probe), int(retry_ms) / 1000)
+            except (RedisError, OSError) as e:
+                self._redis_failed(e)
+        return self._local_allow()
+
+    async def record_success(self, permit: BreakerPermit):
+        # Only a successful probe changes shared state
+        if not permit.probe:
+            return
+        self.local_half_open = self.local_probing = False
+        if time.monotonic() >= self.redis_down_until:
+            try:
+                await get_redis_client().delete(*self.keys[1:])
+            except (RedisError, OSError) as e:
+                self._redis_failed(e)
+
+    async def record_failure(self):
+        now = time.monotonic()
+        if now >= self.redis_down_until:
+            try:
+                opened = await FAILURE_SCRIPT(
+                    get_redis_client(), self.keys,
+                    [self.threshold, int(self.window * 1000), int(self.open_seconds * 1000)]
+                )
+                if opened:
+                    self.open_until = now + self.open_seconds
+                    print(f"Circuit breaker {self.name} opened for {self.open_seconds}s")
+                return
+            except (RedisError, OSError) as e:
+                self._redis_failed(e)
+        self._local_failure(now)
+
+    def _redis_failed(self, error: Exception):
+        print(f"Circuit breaker {self.name} falling back to in-process state: {str(error)}")
+        self.redis_down_until = time.monotonic() + settings.rate_limit_redis_retry_interval
+
+    def _local_allow(self) -> BreakerPermit:
+        if not self.local_half_open:
+            return BreakerPermit(True)
+        if self.local_probing:
+            return BreakerPermit(False, retry_after=self.open_seconds)
+        self.local_probing = True
+        return BreakerPermit(True, probe=True)
+
+    def _local_failure(self, now: float):
+        self.local_failures.append(now)
+        while self.local_failures and self.local_failures[0] <= now - self.window:
+            self.local_failures.popleft()
+        if len(self.local_failures) >= self.threshold or self.local_half_open:
+            self.open_until = now + self.open_seconds
+            self.local_half_open = True
+            self.local_probing = False
+            self.local_failures.clear()
+
+
+usda_breaker = CircuitBreaker(
+    "usda", settings.usda_breaker_threshold, settings.usda_breaker_window, settings.usda_breaker_open_seconds
+)
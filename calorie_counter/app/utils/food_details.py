@@ -0,0 +1,154 @@
+import asyncio
+import json
+import math
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from app.core.config import settings
+from app.core.database import get_redis_client
+from app.utils.nutrients import SERVING_UNITS
+from app.utils.usda_quota import LIVE, BACKGROUND
+
+
+# FoodData Central's multi-ID endpoint takes at most this many fdcIds
+USDA_MAX_IDS_PER_CALL = 20
+
+# {"grams": weight of one serving, "text": e.g. "1 cup, chopped"}
+Portion = Dict[str, Any]
+
+
+def detail_key(fdc_id: int) -> str:
+    # Per food rather than per dish, so every spelling that matches the same
+    # food shares one record
+    return f"{settings.cache_namespace}:food:{fdc_id}"
+
+
+def portion_from_measures(food: Dict[str, Any]) -> Optional[Portion]:
+    # Survey (FNDDS) search results carry their household measures
+    measures = [measure for measure in food.get("foodMeasures") or [] if (measure.get("gramWeight") or 0) > 0]
+    if not measures:
+        return None
+    measure = min(measures, key=lambda measure: measure.get("rank") or math.inf)
+    return {"grams": float(measure["gramWeight"]), "text": measure.get("disseminationText")}
+
+
+def portion_from_record(record: Dict[str, Any]) -> Optional[Portion]:
+    # Branded records state their serving; the others list household
+    # portions, of which the first is the common one
+    if record.get("servingSize"):
+        unit = str(record.get("servingSizeUnit", "g")).lower()
+        return {"grams": float(record["servingSize"]) * SERVING_UNITS.get(unit, 1.0),
+                "text": record.get("householdServingFullText")}
+    portions = [portion for portion in record.get("foodPortions") or [] if (portion.get("gramWeight") or 0) > 0]
+    if not portions:
+        return None
+    portion = min(portions, key=lambda portion: portion.get("sequenceNumber") or math.inf)
+    text = portion.get("portionDescription")
+    if not text:
+        unit = (portion.get("measureUnit") or {}).get("name")
+        parts = [f"{portion['amount']:g}" if portion.get("amount") else None,
+                 unit if unit != "undetermined" else None, portion.get("modifier")]
+        text = " ".join(part for part in parts if part) or None
+    return {"grams": float(portion["gramWeight"]), "text": text}
+
+
+def apply_portion(food: Dict[str, Any], portion: Optional[Portion]) -> Dict[str, Any]:
+    # Foods with no known portion keep the per-100 g default
+    if portion is None:
+        return food
+    return {**food, "servingSize": portion["grams"], "servingSizeUnit": "g", "householdServingFullText": portion["text"]}
+
+
+class FoodDetailLoader:
+    # Coalesces portion lookups. fdcIds asked for within `window` seconds
+    # (or until `batch_size` are waiting) are answered from Redis with one
+    # MGET, and the rest come from FoodData Central's multi-ID endpoint in one
+    # call per `batch_size` ids. Callers asking for an id that is already
+    # waiting or being fetched share its result. Results, including foods
+    # without portions, are cached by fdcId for USDA_DETAILS_TTL.
+
+    def __init__(self, fetch_records: Callable[[List[int], int], Awaitable[List[Dict[str, Any]]]],
+                 batch_size: int = USDA_MAX_IDS_PER_CALL, window: float = 0.005):
+        self.fetch_records = fetch_records
+        self.batch_size = batch_size
+        self.window = window
+        self.waiting: Dict[int, asyncio.Future] = {}
+        self.in_flight: Dict[int, asyncio.Future] = {}
+        self.priority = BACKGROUND
+        self.timer: Optional[asyncio.TimerHandle] = None
+        self.tasks = set()
+        self.stats = {"requested": 0, "cache_hits": 0, "fetched": 0, "api_calls": 0}
+
+    async def load(self, fdc_id: int, priority: int = LIVE) -> Optional[Portion]:
+        future = self.in_flight.get(fdc_id)
+        if future is not None:
+            return await asyncio.shield(future)
+        future = self.waiting.get(fdc_id)
+        if future is None:
+            future = asyncio.get_running_loop().create_future()
+            self.waiting[fdc_id] = future
+            self.stats["requested"] += 1
+        # A batch is fetched at the most urgent priority of its callers
+        self.priority = min(self.priority, priority)
+        if len(self.waiting) >= self.batch_size:
+            self.dispatch()
+        elif self.timer is None:
+            self.timer = asyncio.get_running_loop().call_later(self.window, self.dispatch)
+        return await asyncio.shield(future)
+
+    def dispatch(self):
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        batch, self.waiting = self.waiting, {}
+        priority, self.priority = self.priority, BACKGROUND
+        if batch:
+            self.in_flight.update(batch)
+            task = asyncio.create_task(self.resolve(batch, priority))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+
+    async def resolve(self, batch: Dict[int, asyncio.Future], priority: int):
+        try:
+            portions = await self.get_portions(list(batch), priority)
+        except Exception as e:
+            self.forget(batch)
+            # e.g. USDA rate limited or down: every caller sees the error
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(e)
+            return
+        self.forget(batch)
+        for fdc_id, future in batch.items():
+            if not future.done():
+                future.set_result(portions.get(fdc_id))
+
+    def forget(self, batch: Dict[int, asyncio.Future]):
+        for fdc_id in batch:
+            if self.in_flight.get(fdc_id) is batch[fdc_id]:
+                del self.in_flight[fdc_id]
+
+    async def get_portions(self, fdc_ids: List[int], priority: int) -> Dict[int, Optional[Portion]]:
+        redis_client = get_redis_client()
+        portions = {}
+        missing = []
+        for fdc_id, cached in zip(fdc_ids, await redis_client.mget([detail_key(fdc_id) for fdc_id in fdc_ids])):
+            if cached is None:
+                missing.append(fdc_id)
+            else:
+                portions[fdc_id] = json.loads(cached)
+        self.stats["cache_hits"] += len(portions)
+        if not missing:
+            return portions
+
+        chunks = [missing[start:start + self.batch_size] for start in range(0, len(missing), self.batch_size)]
+        self.stats["api_calls"] += len(chunks)
+        fetched = {fdc_id: None for fdc_id in missing}
+        for records in await asyncio.gather(*[self.fetch_records(chunk, priority) for chunk in chunks]):
+            for record in records:
+                if record.get("fdcId") in fetched:
+                    fetched[record["fdcId"]] = portion_from_record(record)
+        async with redis_client.pipeline(transaction=False) as pipe:
+            for fdc_id, portion in fetched.items():
+                pipe.set(detail_key(fdc_id), json.dumps(portion), ex=settings.usda_details_ttl)
+            await pipe.execute()
+        self.stats["fetched"] += len(fetched)
+        return {**portions, **fetched}
@@ -0,0 +1,171 @@
+import csv
+import json
+import os
+import re
+import sqlite3
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from app.core.config import settings
+from app.utils.nutrients import MACRO_NUTRIENTS
+
+
+# One column per nutrient the nutrient engine profiles; bulk values are per 100 g
+NUTRIENT_IDS = tuple(MACRO_NUTRIENTS.values())
+NUTRIENT_COLUMNS = ", ".join(MACRO_NUTRIENTS)
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS foods (
+    fdc_id INTEGER PRIMARY KEY,
+    description TEXT NOT NULL,
+    data_type TEXT,
+    {", ".join(f"{name} REAL" for name in MACRO_NUTRIENTS)}
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS foods_fts USING fts5(
+    description, content='foods', content_rowid='fdc_id', tokenize='unicode61'
+);
+"""
+
+# (fdc_id, description, data_type, *nutrient amounts in NUTRIENT_IDS order)
+FoodRow = Tuple[Any, ...]
+
+
+def tokenize(text: str) -> List[str]:
+    return re.findall(r"\w+", text.casefold())
+
+
+class FoodIndex:
+    # Local, read-only copy of the FoodData Central bulk dataset in SQLite
+    # with an FTS5 index over descriptions. Lookups are sub-millisecond and
+    # return foods in the same shape as the search API.
+
+    def __init__(self, path: str):
+        self.path = path
+        self.connection = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+
+    def search(self, dish_name: str, limit: int) -> List[Dict[str, Any]]:
+        tokens = tokenize(dish_name)
+        if not tokens:
+            return []
+        query = " OR ".join(f'"{token}"' for token in tokens)
+        rows = self.connection.execute(
+            f"SELECT f.fdc_id, f.description, f.data_type, {NUTRIENT_COLUMNS} "
+            "FROM foods_fts JOIN foods f ON f.fdc_id = foods_fts.rowid "
+            "WHERE foods_fts MATCH ? ORDER BY bm25(foods_fts) LIMIT ?",
+            (query, limit)
+        ).fetchall()
+        return [self.to_food(row) for row in rows]
+
+    def descriptions(self, limit: int) -> List[str]:
+        rows = self.connection.execute("SELECT DISTINCT description FROM foods LIMIT ?", (limit,))
+        return [row[0] for row in rows]
+
+    @staticmethod
+    def to_food(row: FoodRow) -> Dict[str, Any]:
+        fdc_id, description, data_type = row[:3]
+        return {
+            "fdcId": fdc_id,
+            "description": description,
+            "dataType": data_type,
+            "foodNutrients": [
+                {"nutrientId": nutrient_id, "value": value}
+                for nutrient_id, value in zip(NUTRIENT_IDS, row[3:]) if value is not None
+            ]
+        }
+
+    def close(self):
+        self.connection.close()
+
+
+class FoodIndexBuilder:
+    # Loads a FoodData Central bulk download (CSV directory or JSON file)
+    # into a fresh index file. The file is written next to the target and
+    # renamed into place, so running workers never see a half-built index.
+
+    def __init__(self, path: str):
+        self.path = path
+        self.tmp_path = f"{path}.building"
+
+    def build(self, source: str, batch_size: int = 10000) -> int:
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+        connection = sqlite3.connect(self.tmp_path)
+        try:
+            connection.executescript(SCHEMA)
+            source_path = Path(source)
+            rows = self.read_csv(source_path) if source_path.is_dir() else self.read_json(source_path)
+            count = 0
+            batch = []
+            for row in rows:
+                batch.append(row)
+                if len(batch) >= batch_size:
+                    count += self._insert(connection, batch)
+                    batch = []
+            count += self._insert(connection, batch)
+            connection.execute("INSERT INTO foods_fts(foods_fts) VALUES ('rebuild')")
+            connection.execute("INSERT INTO foods_fts(foods_fts) VALUES ('optimize')")
+            connection.commit()
+        finally:
+            connection.close()
+        os.replace(self.tmp_path, self.path)
+        return count
+
+    def _insert(self, connection: sqlite3.Connection, batch: List[FoodRow]) -> int:
+        placeholders = ", ".join("?" * (3 + len(NUTRIENT_IDS)))
+        connection.executemany(f"INSERT OR REPLACE INTO foods VALUES ({placeholders})", batch)
+        return len(batch)
+
+    def read_csv(self, directory: Path) -> Iterator[FoodRow]:
+        # food.csv holds descriptions, food_nutrient.csv one row per nutrient
+        nutrients: Dict[int, List[Optional[float]]] = {}
+        with open(directory / "food_nutrient.csv", newline="", encoding="utf-8") as f:
+            for record in csv.DictReader(f):
+                nutrient_id = int(record["nutrient_id"])
+                if nutrient_id not in NUTRIENT_IDS:
+                    continue
+                values = nutrients.setdefault(int(record["fdc_id"]), [None] * len(NUTRIENT_IDS))
+                values[NUTRIENT_IDS.index(nutrient_id)] = float(record["amount"] or 0.0)
+
+        with open(directory / "food.csv", newline="", encoding="utf-8") as f:
+            for record in csv.DictReader(f):
+                fdc_id = int(record["fdc_id"])
+                values = nutrients.get(fdc_id)
+                if values is None:
+                    continue
+                yield (fdc_id, record["description"], record.get("data_type"), *values)
+
+    def read_json(self, path: Path) -> Iterator[FoodRow]:
+        with open(path, encoding="utf-8") as f:
+            payload = json.load(f)
+        # Bulk files wrap the list, e.g. {"FoundationFoods": [...]}
+        foods: Iterable[Dict[str, Any]] = payload
+        if isinstance(payload, dict):
+            foods = next((value for value in payload.values() if isinstance(value, list)), [])
+
+        for food in foods:
+            values: List[Optional[float]] = [None] * len(NUTRIENT_IDS)
+            for food_nutrient in food.get("foodNutrients", []):
+                nutrient = food_nutrient.get("nutrient", {})
+                nutrient_id = nutrient.get("id", food_nutrient.get("nutrientId"))
+                if nutrient_id in NUTRIENT_IDS:
+                    value = food_nutrient.get("amount", food_nutrient.get("value"))
+                    values[NUTRIENT_IDS.index(nutrient_id)] = float(value or 0.0)
+            if any(value is not None for value in values):
+                yield (food["fdcId"], food["description"], food.get("dataType"), *values)
+
+
+food_index: Optional[FoodIndex] = None
+
+
+def get_food_index() -> Optional[FoodIndex]:
+    # None when no index is configured or it hasn't been built yet
+    global food_index
+    if food_index is None and settings.food_index_path and os.path.exists(settings.food_index_path):
+        food_index = FoodIndex(settings.food_index_path)
+    return food_index
+
+
+def close_food_index():
+    global food_index
+    if food_index is not None:
+        food_index.close()
+        food_index = None
@@ -0,0 +1,17 @@
+import importlib.util
+import sys
+
+
+def lazy_import(name: str):
+    # Returns the module right away but only runs its import on first
+    # attribute access, so a worker doesn't pay for heavy modules that just
+    # some requests need before it can start serving
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
@@ -0,0 +1,104 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+from redis.exceptions import RedisError
+from app.core.config import settings
+from app.core.database import get_redis_client
+
+
+class LocalCache:
+    # Bounded in-process LRU cache with a per-entry TTL. Values are kept
+    # already decoded, so a hit costs neither a Redis round trip nor json.loads.
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def get(self, key: str) -> Optional[Any]:
+        entry = self.entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self.entries[key]
+            self.stats["misses"] += 1
+            return None
+        self.entries.move_to_end(key)
+        self.stats["hits"] += 1
+        return entry[1]
+
+    def set(self, key: str, value: Any):
+        if self.max_size <= 0:
+            return
+        self.entries[key] = (time.monotonic() + self.ttl, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def delete(self, key: str):
+        self.entries.pop(key, None)
+
+    def clear(self):
+        self.entries.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {**self.stats, "size": len(self.entries), "max_size": self.max_size}
+
+
+class CacheInvalidationListener:
+    # Drops in-process entries when any worker publishes an invalidation.
+    # Keys are namespaced, so each key is dropped from every local cache; a
+    # message of "*" clears them all.
+
+    def __init__(self, local_caches: List[LocalCache], channel: str):
+        self.local_caches = local_caches
+        self.channel = channel
+        self.task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self.task is None:
+            self.task = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+    async def _listen(self):
+        while True:
+            pubsub = get_redis_client().pubsub()
+            try:
+                await pubsub.subscribe(self.channel)
+                while True:
+                    message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                    if message is None:
+                        continue
+                    key = message["data"].decode()
+                    for local_cache in self.local_caches:
+                        if key == "*":
+                            local_cache.clear()
+                        else:
+                            local_cache.delete(key)
+            except (RedisError, OSError) as e:
+                # Invalidations may have been missed while disconnected
+                print(f"Cache invalidation listener reconnecting: {str(e)}")
+                for local_cache in self.local_caches:
+                    local_cache.clear()
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.aclose()
+
+
+async def publish_invalidation(key: str):
+    await get_redis_client().publish(settings.cache_invalidation_channel, key)
+
+
+l1_cache = LocalCache(settings.l1_cache_max_size, settings.l1_cache_ttl)
+principal_cache = LocalCache(settings.principal_cache_max_size, settings.principal_local_ttl)
+invalidation_listener = CacheInvalidationListener([l1_cache, principal_cache], settings.cache_invalidation_channel)
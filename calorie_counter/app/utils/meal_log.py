@@ -0,0 +1,131 @@
+import asyncio
+import json
+from collections import deque
+from datetime import date
+from typing import Any, Dict, List, Optional
+from fastapi import HTTPException
+from sqlalchemy.exc import DBAPIError, InterfaceError, OperationalError, SQLAlchemyError, TimeoutError
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.crud.meal import MealCrud, rollup_deltas
+
+
+def is_transient(error: Exception) -> bool:
+    # Failures of the connection or the server, which a later flush may not
+    # hit; anything else is taken to be caused by the rows themselves
+    if isinstance(error, (OperationalError, InterfaceError, TimeoutError, OSError)):
+        return True
+    return isinstance(error, DBAPIError) and error.connection_invalidated
+
+
+class MealLogWriter:
+    # Write-behind queue for meal entries. Requests only append to memory; a
+    # background task inserts everything queued in one transaction whenever
+    # `batch_size` entries are waiting or `flush_interval` seconds have
+    # passed. Entries not yet committed are still counted by `pending_totals`,
+    # so a user's own reads stay consistent with what they just logged. A
+    # batch that fails on a transient error is kept for the next flush; one
+    # that the database rejects is split in halves until the rows it rejects
+    # are found, which are set aside in `dead_letters` and logged.
+
+    def __init__(self, session_factory, batch_size: int, flush_interval: float, max_pending: int):
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.queue: List[Dict[str, Any]] = []
+        self.flushing: List[Dict[str, Any]] = []
+        self.lock = asyncio.Lock()
+        self.wakeup = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+        self.dead_letters = deque(maxlen=max_pending)
+        self.stats = {"queued": 0, "flushed": 0, "flushes": 0, "failed_flushes": 0, "dead_lettered": 0}
+
+    def enqueue(self, row: Dict[str, Any]):
+        if len(self.queue) + len(self.flushing) >= self.max_pending:
+            raise HTTPException(status_code=503, detail="Meal log is busy, please try again shortly")
+        self.queue.append(row)
+        self.stats["queued"] += 1
+        if len(self.queue) >= self.batch_size:
+            self.wakeup.set()
+
+    def pending_totals(self, user_id: int, start: date, end: date) -> Dict[date, Dict[str, float]]:
+        rows = [row for row in (*self.flushing, *self.queue)
+                if row["user_id"] == user_id and start <= row["day"] <= end]
+        return {day: delta for (_, day), delta in rollup_deltas(rows).items()}
+
+    def start(self):
+        if self.task is None:
+            self.task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+        # Nothing queued may be lost on a clean shutdown
+        await self.flush()
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self.wakeup.clear()
+            await self.flush()
+
+    async def flush(self) -> int:
+        async with self.lock:
+            if not self.queue:
+                return 0
+            self.flushing, self.queue = self.queue, []
+            remaining = self.flushing
+            dead_lettered = self.stats["dead_lettered"]
+            try:
+                remaining = await self._write(self.flushing)
+            finally:
+                batch, self.flushing = self.flushing, []
+                if remaining:
+                    # Keep them for the next flush rather than dropping them
+                    self.stats["failed_flushes"] += 1
+                    self.queue[:0] = remaining
+            written = len(batch) - len(remaining) - (self.stats["dead_lettered"] - dead_lettered)
+            if written:
+                self.stats["flushes"] += 1
+                self.stats["flushed"] += written
+            return written
+
+    async def _write(self, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        # Returns the rows left to write after a transient error
+        try:
+            async with self.session_factory() as db:
+                await MealCrud(db).add_entries(rows)
+            return []
+        except (SQLAlchemyError, OSError) as e:
+            if is_transient(e):
+                print(f"Meal log flush failed: {str(e)}")
+                return rows
+            if len(rows) == 1:
+                self.dead_letter(rows[0], e)
+                return []
+        # One bad row fails the whole transaction, so each half is retried on
+        # its own; every row is tried at most log2(batch size) more times
+        middle = len(rows) // 2
+        remaining = await self._write(rows[:middle])
+        if remaining:
+            return remaining + rows[middle:]
+        return await self._write(rows[middle:])
+
+    def dead_letter(self, row: Dict[str, Any], error: Exception):
+        self.dead_letters.append(row)
+        self.stats["dead_lettered"] += 1
+        print(f"Meal log entry rejected, not retrying: {json.dumps(row, default=str)}: {str(error)}")
+
+
+meal_log_writer = MealLogWriter(
+    SessionLocal, settings.meal_log_batch_size, settings.meal_log_flush_interval, settings.meal_log_max_pending
+)
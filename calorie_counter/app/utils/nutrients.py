@@ -0,0 +1,82 @@
+from __future__ import annotations
+from functools import cached_property
+from typing import Any, Dict, List
+from app.utils.lazy import lazy_import
+
+np = lazy_import("numpy")
+
+
+# FoodData Central nutrient ids, in matrix column order
+MACRO_NUTRIENTS = {
+    "energy": 1008,
+    "protein": 1003,
+    "fat": 1004,
+    "carbohydrate": 1005,
+    "fiber": 1079,
+    "sugars": 2000,
+    "saturated_fat": 1258,
+    "sodium": 1093
+}
+
+# Grams per unit; anything unknown (e.g. "ml", "cup") is treated as grams
+SERVING_UNITS = {"g": 1.0, "grm": 1.0, "kg": 1000.0, "mg": 0.001, "oz": 28.3495, "onz": 28.3495, "lb": 453.592}
+
+# kcal per gram, used when a food reports no energy value
+ATWATER_FACTORS = {"protein": 4.0, "carbohydrate": 4.0, "fat": 9.0}
+
+
+class NutrientEngine:
+    # Turns N food records into a dense (foods x nutrients) matrix in one pass
+    # over their foodNutrients, then does serving-size scaling and the
+    # Atwater energy fallback as array operations over every food at once.
+
+    def __init__(self, nutrients: Dict[str, int] = MACRO_NUTRIENTS):
+        self.names = list(nutrients)
+        self.columns = {nutrient_id: column for column, nutrient_id in enumerate(nutrients.values())}
+        self.energy = self.names.index("energy")
+
+    @cached_property
+    def atwater(self) -> np.ndarray:
+        # Built on first use so NumPy isn't loaded at import
+        return np.array([ATWATER_FACTORS.get(name, 0.0) for name in self.names])
+
+    def matrix(self, foods: List[Dict[str, Any]]) -> np.ndarray:
+        # Nutrient amounts per 100 g as reported by FoodData Central; missing
+        # nutrients are 0
+        rows, columns, values = [], [], []
+        for row, food in enumerate(foods):
+            for nutrient in food.get("foodNutrients", []):
+                column = self.columns.get(nutrient.get("nutrientId"))
+                if column is not None:
+                    rows.append(row)
+                    columns.append(column)
+                    values.append(nutrient.get("value") or 0.0)
+        matrix = np.zeros((len(foods), len(self.names)))
+        matrix[rows, columns] = values
+        return matrix
+
+    def serving_grams(self, foods: List[Dict[str, Any]]) -> np.ndarray:
+        sizes = np.array([food.get("servingSize") or 100.0 for food in foods], dtype=np.float64)
+        units = np.array([SERVING_UNITS.get(str(food.get("servingSizeUnit", "g")).lower(), 1.0) for food in foods])
+        return sizes * units
+
+    def per_serving(self, foods: List[Dict[str, Any]]) -> np.ndarray:
+        # (foods x nutrients) per serving, with energy filled from protein,
+        # carbohydrate and fat wherever a food reports none
+        matrix = self.matrix(foods)
+        missing_energy = matrix[:, self.energy] <= 0
+        matrix[missing_energy, self.energy] = matrix[missing_energy] @ self.atwater
+        return np.round(matrix * (self.serving_grams(foods) / 100.0)[:, None], 2)
+
+    def profiles(self, foods: List[Dict[str, Any]]) -> List[Dict[str, float]]:
+        return [dict(zip(self.names, row.tolist())) for row in self.per_serving(foods)]
+
+    def totals(self, profiles: List[Dict[str, float]], servings: List[int]) -> Dict[str, float]:
+        # Meal totals: servings-weighted sum of per-serving profiles
+        if not profiles:
+            return {name: 0.0 for name in self.names}
+        matrix = np.array([[profile.get(name, 0.0) for name in self.names] for profile in profiles])
+        return dict(zip(self.names, np.round(np.asarray(servings, dtype=np.float64) @ matrix, 2).tolist()))
+
+
+nutrient_engine = NutrientEngine()
@@ -0,0 +1,87 @@
+import asyncio
+import cProfile
+import hmac
+import os
+import random
+import re
+import time
+from fastapi import Request
+from app.core.config import settings
+
+
+class RequestProfiler:
+    # Runs cProfile around a sample of requests (PROFILE_SAMPLE_RATE) or any
+    # request carrying X-Profile-Token, and keeps the slowest PROFILE_MAX_FILES
+    # profiles as "<duration_ms>ms_<route>_<time>.pstats" in PROFILE_DIR. The
+    # middleware is only installed when enabled, so it costs nothing otherwise.
+    #
+    # cProfile sees the whole thread, so a profile also contains whatever
+    # other requests the event loop ran meanwhile; only one request is
+    # profiled at a time.
+
+    def __init__(self, directory: str, sample_rate: float, token: str, max_files: int, min_duration_ms: float):
+        self.directory = directory
+        self.sample_rate = sample_rate
+        self.token = token
+        self.max_files = max_files
+        self.min_duration_ms = min_duration_ms
+        self.active = False
+
+    @property
+    def enabled(self) -> bool:
+        return self.sample_rate > 0 or bool(self.token)
+
+    def requested(self, request: Request) -> bool:
+        header = request.headers.get("x-profile-token")
+        return bool(self.token and header and hmac.compare_digest(header.encode(), self.token.encode()))
+
+    async def middleware(self, request: Request, call_next):
+        requested = self.requested(request)
+        if self.active or not (requested or random.random() < self.sample_rate):
+            return await call_next(request)
+
+        self.active = True
+        profiler = cProfile.Profile()
+        started = time.perf_counter()
+        profiler.enable()
+        try:
+            response = await call_next(request)
+        finally:
+            profiler.disable()
+            self.active = False
+        duration_ms = (time.perf_counter() - started) * 1000
+
+        if requested or duration_ms >= self.min_duration_ms:
+            route = request.scope.get("route")
+            name = await asyncio.to_thread(
+                self.save, profiler, route.path if route is not None else "unmatched", duration_ms
+            )
+            if requested:
+                response.headers["X-Profile-Id"] = name
+        return response
+
+    def save(self, profiler: cProfile.Profile, route: str, duration_ms: float) -> str:
+        os.makedirs(self.directory, exist_ok=True)
+        slug = re.sub(r"[^A-Za-z0-9]+", "_", route).strip("_") or "root"
+        # Zero-padded duration first, so a plain sort orders files fastest first
+        name = f"{int(duration_ms):08d}ms_{slug}_{time.time_ns()}.pstats"
+        profiler.dump_stats(os.path.join(self.directory, name))
+        self.prune()
+        return name
+
+    def prune(self):
+        profiles = sorted(name for name in os.listdir(self.directory) if name.endswith(".pstats"))
+        for name in profiles[:max(len(profiles) - self.max_files, 0)]:
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass  # another worker pruned it first
+
+
+request_profiler = RequestProfiler(
+    settings.profile_dir,
+    settings.profile_sample_rate,
+    settings.profile_token,
+    settings.profile_max_files,
+    settings.profile_min_duration_ms
+)
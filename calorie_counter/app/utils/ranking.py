@@ -0,0 +1,84 @@
+from __future__ import annotations
+import re
+from itertools import chain
+from typing import Dict, List, Tuple
+from app.utils.lazy import lazy_import
+
+np = lazy_import("numpy")
+
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> List[str]:
+    # Whole tokens only ("egg" must not match "eggplant"), with a light plural
+    # strip so "eggs" still matches "Egg, whole, raw".
+    tokens = TOKEN_PATTERN.findall(text.casefold())
+    return [token[:-1] if len(token) > 3 and token.endswith("s") and not token.endswith("ss") else token
+            for token in tokens]
+
+
+class RankingEngine:
+    # Scores a whole candidate set at once. Descriptions are tokenized once
+    # into ids from a shared vocabulary and cached, so repeated candidates
+    # (USDA returns the same foods for many queries) cost a dict lookup.
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75, max_cached: int = 50000):
+        self.k1 = k1
+        self.b = b
+        self.max_cached = max_cached
+        self.vocabulary: Dict[str, int] = {}
+        self.cache: Dict[str, Tuple[int, ...]] = {}
+
+    def encode(self, text: str) -> Tuple[int, ...]:
+        token_ids = self.cache.get(text)
+        if token_ids is None:
+            token_ids = tuple(self.vocabulary.setdefault(token, len(self.vocabulary)) for token in tokenize(text))
+            self.cache[text] = token_ids
+        return token_ids
+
+    def score(self, query: str, descriptions: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        # Returns (coverage, bm25) per candidate: the fraction of query tokens
+        # present and a BM25 weight with IDF taken over the candidate set.
+        if len(self.cache) + len(descriptions) > self.max_cached:
+            # Ids are only comparable within one vocabulary, so reset together
+            self.cache.clear()
+            self.vocabulary.clear()
+
+        count = len(descriptions)
+        query_ids = np.array(sorted(set(self.encode(query))), dtype=np.int64)
+        terms = len(query_ids)
+        if not count or not terms:
+            return np.zeros(count), np.zeros(count)
+
+        documents = list(map(self.encode, descriptions))
+        lengths = list(map(len, documents))
+        total = sum(lengths)
+        tokens = np.fromiter(chain.from_iterable(documents), dtype=np.int64, count=total)
+        owners = np.repeat(np.arange(count), lengths)
+
+        # Term frequency of every query token in every candidate (count x terms),
+        # counted with one bincount over (candidate, query column) pairs
+        columns = np.searchsorted(query_ids, tokens)
+        np.minimum(columns, terms - 1, out=columns)
+        matched = query_ids[columns] == tokens
+        term_frequency = np.bincount(
+            owners[matched] * terms + columns[matched], minlength=count * terms
+        ).reshape(count, terms)
+
+        present = term_frequency > 0
+        document_frequency = present.sum(axis=0)
+        idf = np.log((count - document_frequency + 0.5) / (document_frequency + 0.5) + 1)
+        length_norm = self.k1 * (1 - self.b) + (self.k1 * self.b * count / max(total, 1)) * np.array(lengths)
+        bm25 = (term_frequency * (self.k1 + 1) / (term_frequency + length_norm[:, None])) @ idf
+        return present.sum(axis=1) / terms, bm25
+
+    def best_index(self, query: str, descriptions: List[str]) -> int:
+        # Most query tokens matched wins and BM25 breaks ties (it is far below
+        # one coverage step after scaling). argmax keeps USDA's own relevance
+        # order for exact ties.
+        coverage, bm25 = self.score(query, descriptions)
+        return int(np.argmax(coverage * 1e6 + bm25))
+
+
+ranking_engine = RankingEngine()
@@ -0,0 +1,216 @@
+import math
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict
+from redis.exceptions import RedisError
+from app.core.config import settings
+from app.core.database import get_redis_client
+from app.utils.redis_script import RedisScript
+
+
+# Every script takes KEYS[1] = bucket key and ARGV = limit, window (ms), cost,
+# and returns {allowed, remaining, reset_ms, retry_ms} in a single round trip.
+# Time comes from the Redis server so all workers share one clock.
+
+FIXED_WINDOW_SCRIPT = RedisScript("""
+local limit = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local current = redis.call('INCRBY', KEYS[1], cost)
+local ttl = redis.call('PTTL', KEYS[1])
+if ttl < 0 then
+    redis.call('PEXPIRE', KEYS[1], window)
+    ttl = window
+end
+if current > limit then
+    return {0, 0, ttl, ttl}
+end
+return {1, limit - current, ttl, 0}
+""")
+
+SLIDING_WINDOW_SCRIPT = RedisScript("""
+if redis.replicate_commands then redis.replicate_commands() end
+local limit = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) * 1000 + math.floor(tonumber(clock[2]) / 1000)
+local index = math.floor(now / window)
+local state = redis.call('HMGET', KEYS[1], 'w', 'c', 'p')
+local stored = tonumber(state[1]) or index
+local current = tonumber(state[2]) or 0
+local previous = tonumber(state[3]) or 0
+if index == stored + 1 then
+    previous = current
+    current = 0
+elseif index > stored + 1 then
+    previous = 0
+    current = 0
+end
+local elapsed = now - index * window
+local estimated = previous * (window - elapsed) / window + current
+local allowed = 0
+local retry = 0
+if estimated + cost <= limit then
+    allowed = 1
+    current = current + cost
+    estimated = estimated + cost
+elseif current + cost > limit or previous == 0 then
+    retry = window - elapsed
+else
+    retry = math.max(math.ceil(window - (limit - current - cost) * window / previous - elapsed), 1)
+end
+redis.call('HSET', KEYS[1], 'w', index, 'c', current, 'p', previous)
+redis.call('PEXPIRE', KEYS[1], window * 2)
+return {allowed, math.max(math.floor(limit - estimated), 0), window - elapsed, retry}
+""")
+
+TOKEN_BUCKET_SCRIPT = RedisScript("""
+if redis.replicate_commands then redis.replicate_commands() end
+local limit = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) * 1000 + math.floor(tonumber(clock[2]) / 1000)
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or limit
+local updated = tonumber(state[2]) or now
+tokens = math.min(limit, tokens + (now - updated) * limit / window)
+local allowed = 0
+local retry = 0
+if tokens >= cost then
+    allowed = 1
+    tokens = tokens - cost
+else
+    retry = math.ceil((cost - tokens) * window / limit)
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', now)
+redis.call('PEXPIRE', KEYS[1], window)
+return {allowed, math.floor(tokens), math.ceil((limit - tokens) * window / limit), retry}
+""")
+
+SCRIPTS = {
+    "fixed_window": FIXED_WINDOW_SCRIPT,
+    "sliding_window": SLIDING_WINDOW_SCRIPT,
+    "token_bucket": TOKEN_BUCKET_SCRIPT
+}
+
+
+@dataclass
+class RateLimitResult:
+    allowed: bool
+    limit: int
+    remaining: int
+    reset_after: float
+    retry_after: float = 0.0
+
+    def headers(self) -> Dict[str, str]:
+        headers = {
+            "RateLimit-Limit": str(self.limit),
+            "RateLimit-Remaining": str(self.remaining),
+            "RateLimit-Reset": str(math.ceil(self.reset_after))
+        }
+        if not self.allowed:
+            headers["Retry-After"] = str(max(math.ceil(self.retry_after), 1))
+        return headers
+
+
+class LocalRateLimiter:
+    # Per-worker limiter used while Redis is unreachable. It mirrors the
+    # Redis algorithms, so limits are per worker rather than cluster wide.
+
+    def __init__(self, algorithm: str, max_keys: int):
+        self.algorithm = algorithm
+        self.max_keys = max_keys
+        self.buckets: "OrderedDict[str, list]" = OrderedDict()
+
+    def hit(self, key: str, limit: int, window: float, cost: int = 1) -> RateLimitResult:
+        now = time.monotonic()
+        state = self.buckets.pop(key, None)
+        if self.algorithm == "token_bucket":
+            result, state = self._token_bucket(state, now, limit, window, cost)
+        elif self.algorithm == "sliding_window":
+            result, state = self._sliding_window(state, now, limit, window, cost)
+        else:
+            result, state = self._fixed_window(state, now, limit, window, cost)
+
+        self.buckets[key] = state
+        while len(self.buckets) > self.max_keys:
+            self.buckets.popitem(last=False)
+        return result
+
+    def _fixed_window(self, state, now, limit, window, cost):
+        if not state or now >= state[0]:
+            state = [now + window, 0]
+        state[1] += cost
+        reset = state[0] - now
+        if state[1] > limit:
+            return RateLimitResult(False, limit, 0, reset, reset), state
+        return RateLimitResult(True, limit, limit - state[1], reset), state
+
+    def _sliding_window(self, state, now, limit, window, cost):
+        index = math.floor(now / window)
+        if not state or index > state[0] + 1:
+            state = [index, 0, 0]
+        elif index == state[0] + 1:
+            state = [index, 0, state[1]]
+        elapsed = now - index * window
+        estimated = state[2] * (window - elapsed) / window + state[1]
+        if estimated + cost <= limit:
+            state[1] += cost
+            return RateLimitResult(True, limit, int(limit - estimated - cost), window - elapsed), state
+        if state[1] + cost > limit or not state[2]:
+            retry = window - elapsed
+        else:
+            retry = window - (limit - state[1] - cost) * window / state[2] - elapsed
+        return RateLimitResult(False, limit, max(int(limit - estimated), 0), window - elapsed, retry), state
+
+    def _token_bucket(self, state, now, limit, window, cost):
+        tokens, updated = state or (limit, now)
+        tokens = min(limit, tokens + (now - updated) * limit / window)
+        if tokens >= cost:
+            tokens -= cost
+            reset = (limit - tokens) * window / limit
+            return RateLimitResult(True, limit, int(tokens), reset), [tokens, now]
+        reset = (limit - tokens) * window / limit
+        retry = (cost - tokens) * window / limit
+        return RateLimitResult(False, limit, int(tokens), reset, retry), [tokens, now]
+
+
+class RateLimiter:
+
+    def __init__(self, algorithm: str = None, limit: int = None, window: int = None):
+        self.algorithm = algorithm or settings.rate_limit_algorithm
+        self.limit = limit or settings.rate_limit
+        self.window = window or settings.rate_limit_time
+        self.script = SCRIPTS[self.algorithm]
+        self.local = LocalRateLimiter(self.algorithm, settings.rate_limit_local_max_keys)
+        self.redis_down_until = 0.0
+        # Endpoints that count as more (or, at cost 0, less) than one request
+        self.route_costs = {
+            "/get-calories/batch": settings.batch_rate_limit_cost,
+            "/foods/suggest": settings.suggest_rate_limit_cost,
+            "/metrics": 0
+        }
+
+    def cost_for(self, path: str) -> int:
+        return self.route_costs.get(path, 1)
+
+    async def hit(self, key: str, cost: int = 1) -> RateLimitResult:
+        # Skip Redis for a short while after a failure so an outage doesn't
+        # add a connect timeout to every request.
+        if time.monotonic() >= self.redis_down_until:
+            try:
+                allowed, remaining, reset_ms, retry_ms = await self.script(
+                    get_redis_client(), [key], [self.limit, self.window * 1000, cost]
+                )
+                return RateLimitResult(bool(allowed), self.limit, int(remaining),
+                                       int(reset_ms) / 1000, int(retry_ms) / 1000)
+            except (RedisError, OSError) as e:
+                print(f"Rate limiter falling back to in-process limits: {str(e)}")
+                self.redis_down_until = time.monotonic() + settings.rate_limit_redis_retry_interval
+        return self.local.hit(key, self.limit, self.window, cost)
+
+
+rate_limiter = RateLimiter()
@@ -0,0 +1,19 @@
+import hashlib
+from typing import Any, List
+from redis.exceptions import NoScriptError
+
+
+class RedisScript:
+    # Lua script runner that is not bound to a client, so it survives the
+    # Redis client being recreated across app lifespans.
+
+    def __init__(self, source: str):
+        self.source = source
+        self.sha = hashlib.sha1(source.encode()).hexdigest()
+
+    async def __call__(self, redis_client, keys: List[str], args: List[Any]):
+        try:
+            return await redis_client.evalsha(self.sha, len(keys), *keys, *args)
+        except NoScriptError:
+            # First call on this Redis server; EVAL also caches it for EVALSHA
+            return await redis_client.eval(self.source, len(keys), *keys, *args)
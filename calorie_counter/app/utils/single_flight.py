@@ -0,0 +1,119 @@
+import asyncio
+import time
+from uuid import uuid4
+from typing import Any, Awaitable, Callable, Dict, Optional
+from redis.exceptions import RedisError
+from app.core.config import settings
+from app.core.database import get_redis_client
+from app.utils.redis_script import RedisScript
+
+
+# Only delete the lock if we still own it; it may have expired and been
+# taken by another worker in the meantime.
+RELEASE_LOCK_SCRIPT = RedisScript("""
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+""")
+
+
+class SingleFlight:
+    # Coalesces concurrent calls for the same key: within a worker followers
+    # await the leader's task, across workers a short Redis lock elects one
+    # leader and the others poll `wait_for_fill` until the result is cached.
+
+    def __init__(self, namespace: str):
+        self.namespace = namespace
+        self.in_flight: Dict[str, asyncio.Task] = {}
+        # Background refreshes are kept apart: they may return None (failed,
+        # or another worker is on it) and run at background priority, so live
+        # callers never await them
+        self.refreshing: Dict[str, asyncio.Task] = {}
+        self.stats = {"leaders": 0, "local_coalesced": 0, "remote_coalesced": 0, "refreshes": 0}
+
+    async def run(self, key: str, fn: Callable[[], Awaitable[Any]],
+                  wait_for_fill: Optional[Callable[[], Awaitable[Any]]] = None):
+        task = self.in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._lead(key, fn, wait_for_fill))
+            self.in_flight[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+        else:
+            self.stats["local_coalesced"] += 1
+        # Shielded so a disconnecting client doesn't cancel the shared lookup
+        return await asyncio.shield(task)
+
+    def refresh_in_background(self, key: str, fn: Callable[[], Awaitable[Any]]):
+        # Fire-and-forget revalidation of a stale entry. Skipped when this
+        # worker or (through the lock) any other worker is already on it.
+        if key in self.in_flight or key in self.refreshing:
+            return
+        self.stats["refreshes"] += 1
+
+        async def refresh():
+            try:
+                return await fn()
+            except Exception as e:
+                print(f"Background refresh of {self.namespace}:{key} failed: {str(e)}")
+
+        task = asyncio.ensure_future(self._lead(key, refresh, None, background=True))
+        self.refreshing[key] = task
+        task.add_done_callback(lambda done: self._finish(key, done, self.refreshing))
+
+    def _finish(self, key: str, task: asyncio.Task, tasks: Dict[str, asyncio.Task] = None):
+        tasks = self.in_flight if tasks is None else tasks
+        if tasks.get(key) is task:
+            del tasks[key]
+        if not task.cancelled():
+            task.exception()  # mark retrieved when every waiter went away
+
+    async def _lead(self, key: str, fn, wait_for_fill, background: bool = False):
+        self.stats["leaders"] += 1
+        if wait_for_fill is None and not background:
+            return await fn()
+
+        redis_client = get_redis_client()
+        lock_key = f"single_flight:{self.namespace}:{key}"
+        token = uuid4().hex
+        try:
+            acquired = await redis_client.set(
+                lock_key, token, nx=True, px=int(settings.single_flight_lock_ttl * 1000)
+            )
+        except (RedisError, OSError):
+            return await fn()
+
+        if acquired:
+            try:
+                return await fn()
+            finally:
+                try:
+                    await RELEASE_LOCK_SCRIPT(redis_client, [lock_key], [token])
+                except (RedisError, OSError):
+                    pass  # the lock expires on its own
+
+        if background:
+            return None
+        value = await self._wait_for_fill(redis_client, lock_key, wait_for_fill)
+        if value is not None:
+            self.stats["remote_coalesced"] += 1
+            return value
+        # The other worker failed or is too slow; do the lookup ourselves
+        return await fn()
+
+    async def _wait_for_fill(self, redis_client, lock_key: str, wait_for_fill):
+        deadline = time.monotonic() + settings.single_flight_wait_timeout
+        try:
+            while time.monotonic() < deadline:
+                await asyncio.sleep(settings.single_flight_poll_interval)
+                value = await wait_for_fill()
+                if value is not None:
+                    return value
+                if not await redis_client.exists(lock_key):
+                    return await wait_for_fill()
+        except (RedisError, OSError):
+            pass
+        return None
+
+
+dish_lookups = SingleFlight("dish")
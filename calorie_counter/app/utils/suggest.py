@@ -0,0 +1,185 @@
+import asyncio
+import heapq
+import math
+import re
+from bisect import bisect_left, insort
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+from redis.exceptions import RedisError
+from app.core.config import settings
+from app.core.database import get_redis_client
+from app.utils.food_index import get_food_index
+
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+# Entries are indexed from each of their first few words, so "breast" finds
+# "chicken breast" as well as "chi" does.
+MAX_INDEXED_WORDS = 4
+
+# Prefixes up to this many characters match too many entries to rank on each
+# keystroke, so their top results are kept up to date as popularity changes.
+RANKED_PREFIX_LENGTH = 3
+
+
+def prefix_keys(name: str) -> List[str]:
+    tokens = TOKEN_PATTERN.findall(name.casefold())
+    return [" ".join(tokens[position:]) for position in range(min(len(tokens), MAX_INDEXED_WORDS))]
+
+
+def build_keys(names: Iterable[str]) -> List[Tuple[str, str]]:
+    return sorted((key, name) for name in names for key in prefix_keys(name))
+
+
+def short_prefixes(name: str) -> List[str]:
+    return sorted({key[:length] for key in prefix_keys(name) for length in range(1, RANKED_PREFIX_LENGTH + 1)})
+
+
+class SuggestionIndex:
+    # Sorted arrays of (prefix key, name) pairs searched with bisect: `keys`
+    # for every entry and `popular_keys` for entries with any hits. A query
+    # ranks every popular match (from `top` for short prefixes, whose
+    # top-k is kept as popularity changes) and fills up with entries from
+    # the first `scan_limit` matching keys. Ties are broken by name.
+
+    def __init__(self, max_entries: int, scan_limit: int, top_k: int = 10):
+        self.max_entries = max_entries
+        self.scan_limit = scan_limit
+        self.top_k = top_k
+        self.keys: List[Tuple[str, str]] = []
+        self.popular_keys: List[Tuple[str, str]] = []
+        self.top: Dict[str, List[str]] = {}
+        self.popularity: Dict[str, float] = {}
+        self.pending: Counter = Counter()
+
+    def rank(self, name: str) -> Tuple[float, str]:
+        return -self.popularity[name], name
+
+    def add(self, name: str, popularity: float = 0.0) -> bool:
+        if name in self.popularity:
+            return False
+        if len(self.popularity) >= self.max_entries:
+            return False
+        self.popularity[name] = 0.0
+        for key in prefix_keys(name):
+            insort(self.keys, (key, name))
+        self.set_popularity(name, popularity)
+        return True
+
+    def extend(self, names: List[str], keys: List[Tuple[str, str]]):
+        # Merge a pre-sorted batch (built off the event loop) in one pass
+        for name in names:
+            self.popularity.setdefault(name, 0.0)
+        self.keys = list(heapq.merge(self.keys, keys))
+
+    def set_popularity(self, name: str, popularity: float):
+        previous = self.popularity[name]
+        if popularity == previous:
+            return
+        self.popularity[name] = popularity
+        if previous == 0:
+            for key in prefix_keys(name):
+                insort(self.popular_keys, (key, name))
+        for prefix in short_prefixes(name):
+            top = self.top.get(prefix, [])
+            if name in top and popularity < previous:
+                # Something outside the top-k may outrank it now
+                ranked = self.ranked(self.popular_keys, prefix, self.top_k, math.inf)
+                self.top[prefix] = [other for other in ranked if self.popularity[other] > 0]
+                continue
+            if name not in top:
+                top.append(name)
+            self.top[prefix] = sorted(top, key=self.rank)[:self.top_k]
+
+    def record_hit(self, name: str):
+        self.add(name)
+        if name in self.popularity:
+            self.set_popularity(name, self.popularity[name] + 1)
+            self.pending[name] += 1
+
+    def merge_popularity(self, scores: List[Tuple[str, float]]):
+        # Cluster-wide counts from Redis plus hits not yet flushed there
+        for name, score in scores:
+            self.add(name)
+            if name in self.popularity:
+                self.set_popularity(name, score + self.pending.get(name, 0))
+
+    def ranked(self, keys: List[Tuple[str, str]], prefix: str, limit: int, scan_limit: float) -> List[str]:
+        names = set()
+        position = bisect_left(keys, (prefix,))
+        end = min(position + scan_limit, len(keys))
+        while position < end and keys[position][0].startswith(prefix):
+            names.add(keys[position][1])
+            position += 1
+        return heapq.nsmallest(limit, names, key=self.rank)
+
+    def suggest(self, query: str, limit: int) -> List[Tuple[str, float]]:
+        prefix = " ".join(TOKEN_PATTERN.findall(query.casefold()))
+        if not prefix:
+            return []
+        if len(prefix) <= RANKED_PREFIX_LENGTH and limit <= self.top_k:
+            names = self.top.get(prefix, [])[:limit]
+        else:
+            names = self.ranked(self.popular_keys, prefix, limit, self.scan_limit)
+        if len(names) < limit:
+            # Every popular match is in; the rest have no hits
+            names = heapq.nsmallest(limit, set(names) | set(self.ranked(self.keys, prefix, limit, self.scan_limit)),
+                                    key=self.rank)
+        return [(name, self.popularity[name]) for name in names]
+
+
+class SuggestionSync:
+    # Background task that seeds the index from the offline food index, then
+    # periodically pushes local hit counts to a Redis sorted set and pulls the
+    # cluster-wide most popular dishes back, so dishes cached by other workers
+    # show up here too.
+
+    def __init__(self, index: SuggestionIndex, redis_key: str):
+        self.index = index
+        self.redis_key = redis_key
+        self.task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self.task is None:
+            self.task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+    async def _run(self):
+        food_index = get_food_index()
+        if food_index is not None:
+            names = await asyncio.to_thread(food_index.descriptions, self.index.max_entries)
+            names = [name for name in names if name not in self.index.popularity]
+            keys = await asyncio.to_thread(build_keys, names)
+            self.index.extend(names, keys)
+        while True:
+            try:
+                await self.sync()
+            except (RedisError, OSError) as e:
+                print(f"Suggestion sync failed: {str(e)}")
+            await asyncio.sleep(settings.suggest_sync_interval)
+
+    async def sync(self):
+        pending, self.index.pending = self.index.pending, Counter()
+        try:
+            async with get_redis_client().pipeline(transaction=False) as pipe:
+                for name, hits in pending.items():
+                    pipe.zincrby(self.redis_key, hits, name)
+                pipe.zremrangebyrank(self.redis_key, 0, -(self.index.max_entries + 1))
+                pipe.zrevrange(self.redis_key, 0, settings.suggest_sync_size - 1, withscores=True)
+                results = await pipe.execute()
+        except (RedisError, OSError):
+            self.index.pending.update(pending)
+            raise
+        self.index.merge_popularity([(name.decode(), score) for name, score in results[-1]])
+
+
+suggestion_index = SuggestionIndex(settings.suggest_max_entries, settings.suggest_scan_limit, settings.suggest_max_results)
+suggestion_sync = SuggestionSync(suggestion_index, settings.suggest_redis_key)
@@ -0,0 +1,156 @@
+import asyncio
+import heapq
+import itertools
+import time
+from typing import List, Tuple
+from fastapi import HTTPException
+from redis.exceptions import RedisError
+from app.core.config import settings
+from app.core.database import get_redis_client
+from app.utils.redis_script import RedisScript
+
+
+# Request priorities, lowest first
+LIVE = 0
+BACKGROUND = 1
+
+# Token bucket shared by every worker. ARGV = limit, window (ms), cost and a
+# floor that must remain after taking; background calls pass the live
+# reserve as their floor. Returns {allowed, tokens left, retry_ms}.
+QUOTA_SCRIPT = RedisScript("""
+if redis.replicate_commands then redis.replicate_commands() end
+local limit = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local floor = tonumber(ARGV[4])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) * 1000 + math.floor(tonumber(clock[2]) / 1000)
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or limit
+local updated = tonumber(state[2]) or now
+tokens = math.min(limit, tokens + (now - updated) * limit / window)
+local allowed = 0
+local retry = 0
+if tokens - cost >= floor then
+    allowed = 1
+    tokens = tokens - cost
+else
+    retry = math.ceil((cost + floor - tokens) * window / limit)
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', now)
+redis.call('PEXPIRE', KEYS[1], window)
+return {allowed, math.floor(tokens), retry}
+""")
+
+
+class QuotaScheduler:
+    # Spends the USDA key's quota from a Redis token bucket shared by every
+    # worker and node. Callers that find it empty queue in this worker by
+    # priority and are admitted by one dispatcher task as tokens refill, so
+    # excess calls wait (up to their max wait) instead of being sent and
+    # rejected. Background work may not dip into the last `reserve` share of
+    # the bucket, which keeps live requests ahead of it cluster-wide.
+
+    def __init__(self, key: str, limit: int, window: float, reserve: float, max_waiting: int):
+        self.key = key
+        self.limit = limit
+        self.window = window
+        self.floors = {LIVE: 0, BACKGROUND: int(limit * reserve)}
+        self.max_waiting = max_waiting
+        self.waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self.sequence = itertools.count()
+        self.dispatcher = None
+        self.wakeup = None
+        self.redis_down_until = 0.0
+        self.stats = {"admitted": 0, "queued": 0, "rejected": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.limit > 0
+
+    async def acquire(self, priority: int = LIVE, max_wait: float = None):
+        if not self.enabled:
+            return
+        if max_wait is None:
+            max_wait = settings.usda_quota_live_max_wait if priority == LIVE else settings.usda_quota_background_max_wait
+        # Only waiters of the same or a more urgent priority are ahead, so
+        # live calls don't queue behind background work held back by the reserve
+        while self.waiters and self.waiters[0][2].done():
+            heapq.heappop(self.waiters)
+        if not self.waiters or self.waiters[0][0] > priority:
+            allowed, _ = await self._take(priority)
+            if allowed:
+                self.stats["admitted"] += 1
+                return
+        if len(self.waiters) >= self.max_waiting:
+            self._reject()
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self.waiters, (priority, next(self.sequence), future))
+        self.stats["queued"] += 1
+        if self.dispatcher is None or self.dispatcher.done():
+            self.wakeup = asyncio.Event()
+            self.dispatcher = asyncio.create_task(self._dispatch())
+        elif self.waiters[0][2] is future:
+            # New head of the queue: retry now, with its priority's floor
+            self.wakeup.set()
+        try:
+            await asyncio.wait_for(asyncio.shield(future), timeout=max_wait)
+        except asyncio.TimeoutError:
+            if not future.done():
+                self._reject()
+        finally:
+            # Timed out, or cancelled from outside (the USDA deadline, a client
+            # that went away): the dispatcher skips it
+            if not future.done():
+                future.cancel()
+        self.stats["admitted"] += 1
+
+    def _reject(self):
+        self.stats["rejected"] += 1
+        raise HTTPException(status_code=429, detail="USDA API quota exhausted", headers={"Retry-After": "60"})
+
+    async def _dispatch(self):
+        while self.waiters:
+            priority, _, future = self.waiters[0]
+            if future.done():
+                heapq.heappop(self.waiters)
+                continue
+            allowed, retry_after = await self._take(priority)
+            if allowed:
+                # Hand the token to the first waiter that is still waiting
+                while self.waiters:
+                    _, _, future = heapq.heappop(self.waiters)
+                    if not future.done():
+                        future.set_result(None)
+                        break
+            else:
+                self.wakeup.clear()
+                try:
+                    await asyncio.wait_for(self.wakeup.wait(), min(retry_after, settings.usda_quota_max_poll_interval))
+                except asyncio.TimeoutError:
+                    pass
+
+    async def _take(self, priority: int) -> Tuple[bool, float]:
+        # Fails open while Redis is down; the circuit breaker still guards
+        # against a burst of upstream 429s
+        if time.monotonic() < self.redis_down_until:
+            return True, 0.0
+        try:
+            allowed, _, retry_ms = await QUOTA_SCRIPT(
+                get_redis_client(), [self.key], [self.limit, int(self.window * 1000), 1, self.floors[priority]]
+            )
+            return bool(allowed), int(retry_ms) / 1000
+        except (RedisError, OSError) as e:
+            print(f"USDA quota scheduler letting calls through while Redis is down: {str(e)}")
+            self.redis_down_until = time.monotonic() + settings.rate_limit_redis_retry_interval
+            return True, 0.0
+
+
+usda_quota = QuotaScheduler(
+    "usda_quota",
+    settings.usda_quota_limit,
+    settings.usda_quota_window,
+    settings.usda_quota_background_reserve,
+    settings.usda_quota_max_waiting
+)
@@ -1,4 +1,8 @@
 import jwt
+import json
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
 from passlib.context import CryptContext
 from fastapi.responses import JSONResponse
 from datetime import datetime, timezone, timedelta
@@ -6,22 +10,63 @@ from app.core.config import settings
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from app.models.user import User
-from app.core.database import get_async_db
+from app.core.database import get_async_db, get_async_read_db
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.crud.user import UserCrud
+from app.core.database import get_redis_client
+from app.core.metrics import time_stage
+from app.utils.local_cache import principal_cache, publish_invalidation
+from redis.exceptions import RedisError
+
+
+class PasswordHasher:
+    # bcrypt runs in a small dedicated thread pool (it releases the GIL), so a
+    # burst of logins can't stall the event loop. Work beyond the pool plus a
+    # bounded queue is refused with 503 instead of piling up.
+
+    def __init__(self, rounds: int, workers: int, max_waiting: int):
+        self.pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=rounds)
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        self.capacity = workers + max_waiting
+        self.in_use = 0
+
+    async def _run(self, fn, *args):
+        if self.in_use >= self.capacity:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many concurrent logins, please retry",
+                headers={"Retry-After": "1"}
+            )
+        self.in_use += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+        finally:
+            self.in_use -= 1
+
+    async def hash(self, password: str) -> str:
+        return await self._run(self.pwd_context.hash, password)
+
+    async def verify_and_update(self, password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        # Returns a new hash when the stored one uses a different cost factor
+        return await self._run(self.pwd_context.verify_and_update, password, hashed_password)
+
+
+password_hasher = PasswordHasher(
+    settings.bcrypt_rounds, settings.password_hash_workers, settings.password_hash_max_waiting
+)
 
 
 class UserService:
     # User service for authentication and password management
     
     def __init__(self):
-        self.pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+        self.password_hasher = password_hasher
     
-    def hash_password(self, password: str):
-        return self.pwd_context.hash(password)
+    async def hash_password(self, password: str):
+        return await self.password_hasher.hash(password)
     
-    def verify_password(self, plain_password: str, hashed_password: str):
-        return self.pwd_context.verify(plain_password, hashed_password)
+    async def verify_password(self, plain_password: str, hashed_password: str):
+        return await self.password_hasher.verify_and_update(plain_password, hashed_password)
     
     def create_access_token(self, data: dict):
         to_encode = data.copy()
@@ -31,7 +76,8 @@ class UserService:
     
     def verify_token(self, token: str):
         try:
-            return jwt.decode(token, settings.jwt_secret_key, algorithms=[settings.jwt_algorithm])
+            with time_stage("jwt_decode"):
+                return jwt.decode(token, settings.jwt_secret_key, algorithms=[settings.jwt_algorithm])
         except jwt.PyJWTError:
             return None
     
@@ -45,21 +91,85 @@ class UserService:
             user_id = payload.get("user_id")        
             if not user_email or not user_id:
                 return None
-                
-            user_crud = UserCrud(db)
-            return await user_crud.get_by_email(user_email)
+
+            with time_stage("user_lookup"):
+                if settings.auth_mode == "trusted":
+                    return await self.get_trusted_user(db, payload)
+
+                user_crud = UserCrud(db)
+                return self.check_token_version(payload, await user_crud.get_by_email(user_email))
         except:
             return None
 
+    def check_token_version(self, payload: dict, user: Optional[User]) -> Optional[User]:
+        # Tokens issued before the user's last revocation carry an older version
+        if user is None or payload.get("ver", 0) < (user.token_version or 0):
+            return None
+        return user
+
+    async def get_trusted_user(self, db: AsyncSession, payload: dict):
+        # Trusts the signed claims and resolves the principal from cache, so
+        # steady-state requests run no SQL (the session is never checked out).
+        # The token version is checked so revoked tokens stop working within
+        # PRINCIPAL_LOCAL_TTL.
+        user_email, user_id = payload["sub"], payload["user_id"]
+        cache_key = f"principal:{user_id}"
+        cached = principal_cache.get(cache_key)
+        if cached is None:
+            try:
+                principal_json, token_version = await get_redis_client().mget(
+                    cache_key, f"token_version:{user_id}"
+                )
+            except (RedisError, OSError):
+                # Without Redis, check the revocation against the users row
+                return self.check_token_version(payload, await UserCrud(db).get_by_email(user_email))
+
+            if principal_json:
+                principal = json.loads(principal_json)
+            else:
+                user = await UserCrud(db).get_by_email(user_email)
+                if not user:
+                    return None
+                principal = {"id": user.id, "email": user.email, "first_name": user.first_name,
+                             "last_name": user.last_name, "token_version": user.token_version or 0}
+                try:
+                    await get_redis_client().set(cache_key, json.dumps(principal), ex=settings.principal_cache_ttl)
+                except (RedisError, OSError):
+                    pass  # only the Redis tier of the principal cache is skipped
+            # The row's version still counts if Redis lost its counter
+            cached = (principal, max(int(token_version or 0), principal.get("token_version", 0)))
+            principal_cache.set(cache_key, cached)
+
+        principal, token_version = cached
+        if payload.get("ver", 0) < token_version or principal["email"] != user_email:
+            return None
+        return User(**principal)
+
+    async def revoke_tokens(self, db: AsyncSession, user_id: int):
+        # Every token issued before this call carries an older version. The
+        # users row holds the version for strict mode and Redis outages; Redis
+        # carries it to the trusted path.
+        token_version = await UserCrud(db).bump_token_version(user_id)
+        await get_redis_client().set(f"token_version:{user_id}", token_version)
+        await get_redis_client().delete(f"principal:{user_id}")
+        principal_cache.delete(f"principal:{user_id}")
+        await publish_invalidation(f"principal:{user_id}")
+
 
 security = HTTPBearer()
 
 # Dependency for authenticated apis
 async def get_current_active_user(credentials: HTTPAuthorizationCredentials = Depends(security),
-                                db: AsyncSession = Depends(get_async_db)) -> User:
+                                db: AsyncSession = Depends(get_async_read_db),
+                                primary_db: AsyncSession = Depends(get_async_db)) -> User:
+    # Users are looked up on the read replica (when one is configured). The
+    # primary session only checks out a connection if it is used: for users
+    # who registered too recently to have reached the replica.
     user_service = UserService()
     token = credentials.credentials    
     user = await user_service.get_current_user(db, token)    
+    if not user and db.bind is not primary_db.bind:
+        user = await user_service.get_current_user(primary_db, token)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""Bytes per cache entry and encode/decode time for each cache codec.
+
+Usage:
+    python benchmarks/cache_codec_benchmark.py [--entries 10000] [--repeat 3]
+    python benchmarks/cache_codec_benchmark.py --redis redis://localhost:6379/15 [--buckets 1024]
+
+With --redis, every codec's entries are also written to that (scratch)
+database once as a key per entry and once packed into --buckets hashes, and
+the growth of Redis' used_memory is reported per entry. Everything written is
+deleted afterwards. For the hash layout to pay off, hash-max-listpack-value must
+fit the payload and hash-max-listpack-entries the entries per bucket; the
+report prints both limits as the server has them.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+import zlib
+from typing import Any, Dict, List
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils.cache_codec import JsonCodec, StructCodec, NUTRIENT_NAMES, decode_entry
+
+
+WORDS = ["chicken", "breast", "raw", "cooked", "roasted", "egg", "whole", "fried", "rice", "white", "brown",
+         "pizza", "cheese", "pepperoni", "frozen", "apple", "juice", "salad", "beef", "ground", "pasta", "sauce"]
+
+CODECS = {"json": JsonCodec(), "struct": StructCodec(), "struct+zlib": StructCodec(compress_min_bytes=64)}
+
+
+def make_values(count: int, rng: random.Random) -> List[Dict[str, Any]]:
+    values = []
+    for _ in range(count):
+        nutrients = {name: round(rng.uniform(0, 500), 2) for name in NUTRIENT_NAMES}
+        values.append({
+            "description": ", ".join(rng.sample(WORDS, rng.randint(2, 6))).capitalize(),
+            "fdc_id": rng.randint(100000, 2999999),
+            "calories_per_serving": nutrients["energy"],
+            "nutrients": nutrients,
+            "serving_grams": round(rng.uniform(20, 300), 1),
+            "serving_description": rng.choice(["1 cup", "1 slice", "1 piece", "1 serving", None])
+        })
+    return values
+
+
+def measure(codec, values, repeat: int):
+    now = time.time()
+    encode_s = decode_s = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        payloads = [codec.encode(value, now + 86400, now + 604800) for value in values]
+        encode_s = min(encode_s, time.perf_counter() - started)
+        started = time.perf_counter()
+        for payload in payloads:
+            decode_entry(payload)
+        decode_s = min(decode_s, time.perf_counter() - started)
+    return payloads, encode_s / len(values) * 1e6, decode_s / len(values) * 1e6
+
+
+def redis_bytes_per_entry(client, payloads: List[bytes], buckets: int) -> Dict[str, float]:
+    result = {}
+    for layout in ("keys", "buckets"):
+        client.delete(*client.keys("codec_benchmark:*") or ["codec_benchmark:none"])
+        before = client.info("memory")["used_memory"]
+        pipe = client.pipeline(transaction=False)
+        for index, payload in enumerate(payloads):
+            key = f"codec_benchmark:dish {index}"
+            if layout == "keys":
+                pipe.set(key, payload, ex=3600)
+            else:
+                bucket = f"codec_benchmark:bucket:{zlib.crc32(key.encode()) % buckets}"
+                pipe.hset(bucket, f"dish {index}", payload)
+                pipe.expire(bucket, 3600)
+        pipe.execute()
+        result[layout] = (client.info("memory")["used_memory"] - before) / len(payloads)
+    client.delete(*client.keys("codec_benchmark:*") or ["codec_benchmark:none"])
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entries", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--redis", help="URL of a scratch Redis database to measure real memory use in")
+    parser.add_argument("--buckets", type=int, default=1024)
+    args = parser.parse_args()
+
+    values = make_values(args.entries, random.Random(42))
+    client = None
+    if args.redis:
+        import redis
+        client = redis.Redis.from_url(args.redis)
+        limits = client.config_get("hash-max-*")
+        print("Redis " + ", ".join(f"{name}={value}" for name, value in sorted(limits.items())))
+        print(f"{args.entries} entries over {args.buckets} buckets, ~{args.entries / args.buckets:.0f} per bucket\n")
+
+    header = f"{'codec':>12} {'bytes/entry':>12} {'encode us':>10} {'decode us':>10}"
+    print(header + (f" {'redis keys B':>13} {'redis hash B':>13}" if client else ""))
+    for name, codec in CODECS.items():
+        payloads, encode_us, decode_us = measure(codec, values, args.repeat)
+        size = sum(len(payload) for payload in payloads) / len(payloads)
+        line = f"{name:>12} {size:>12.1f} {encode_us:>10.2f} {decode_us:>10.2f}"
+        if client:
+            memory = redis_bytes_per_entry(client, payloads, args.buckets)
+            line += f" {memory['keys']:>13.1f} {memory['buckets']:>13.1f}"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
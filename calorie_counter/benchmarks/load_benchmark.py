@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+"""Load and latency benchmark for the running service.
+
+Starts the USDA stub (benchmarks/usda_stub.py), starts the API under uvicorn
+against it, then drives each scenario at each concurrency level and reports
+throughput and p50/p95/p99 latency. Results are written as JSON, keyed by
+git commit, so runs can be compared across commits with --compare.
+
+Scenarios:
+    login       POST /auth/login for a benchmark user (bcrypt-bound)
+    calories    POST /get-calories with --miss-ratio of never-seen dishes
+    rate_limit  a few clients hammering the rate limiter until rejected
+
+The API still needs PostgreSQL (migrated, configured through the usual DB_*
+settings) and a Redis: the one from REDIS_HOST/REDIS_PORT, or an in-process
+fakeredis server with --fakeredis (needs `pip install "fakeredis[lua]"`).
+
+Usage:
+    python benchmarks/load_benchmark.py [--scenarios login calories rate_limit]
+        [--concurrency 1 8 32] [--requests 500] [--miss-ratio 0.1]
+        [--usda-latency-ms 80] [--usda-rate-limited 0.01] [--usda-recording responses.json]
+        [--output results.json] [--compare baseline.json]
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+import httpx
+import numpy as np
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_DIR = os.path.dirname(BENCHMARK_DIR)
+sys.path.append(BENCHMARK_DIR)
+
+from usda_stub import USDAStub, load_recording
+
+
+HOT_DISHES = ["chicken breast", "fried rice", "egg", "pepperoni pizza", "apple juice", "ground beef",
+              "caesar salad", "banana", "oatmeal", "greek yogurt", "salmon", "black beans"]
+MISS_WORDS = ["grilled", "steamed", "spicy", "baked", "smoked", "roasted", "tofu", "lentil", "quinoa", "mango"]
+PROBE_PATH = "/rate-limit-probe"
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=PROJECT_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def client_ip(number: int) -> str:
+    # Distinct X-Forwarded-For addresses, so per-IP rate limits only bite in
+    # the rate_limit scenario
+    return f"10.{(number >> 16) & 255}.{(number >> 8) & 255}.{number & 255}"
+
+
+def start_fakeredis(port: int):
+    try:
+        from fakeredis import TcpFakeServer
+    except ImportError:
+        sys.exit('--fakeredis needs fakeredis with Lua support: pip install "fakeredis[lua]"')
+    server = TcpFakeServer(("127.0.0.1", port), server_type="redis")
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def start_service(args, port: int, usda_url: str, redis_port: Optional[int]) -> subprocess.Popen:
+    env = {
+        **os.environ,
+        "USDA_API_URL": usda_url,
+        "USDA_FOODS_URL": usda_url.removesuffix("/search"),
+        "USDA_API_KEY": "benchmark",
+        # A fresh cache namespace per run, so "miss" means a USDA lookup
+        "CACHE_NAMESPACE": f"bench-{uuid.uuid4().hex[:8]}",
+        "FOOD_INDEX_PATH": args.food_index or "",
+        "RATE_LIMIT": str(args.rate_limit),
+        "RATE_LIMIT_TIME": "60",
+        "DEBUG": "false"
+    }
+    if redis_port is not None:
+        env.update({"REDIS_HOST": "127.0.0.1", "REDIS_PORT": str(redis_port), "REDIS_DB": "0"})
+    command = [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+               "--workers", str(args.workers), "--proxy-headers", "--forwarded-allow-ips", "127.0.0.1",
+               "--log-level", "warning", "--no-access-log"]
+    return subprocess.Popen(command, cwd=PROJECT_DIR, env=env)
+
+
+async def wait_until_ready(base_url: str, process: subprocess.Popen, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                sys.exit(f"Service exited with code {process.returncode}")
+            try:
+                if (await client.get("/openapi.json")).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.2)
+    sys.exit("Service did not become ready")
+
+
+async def drive(client: httpx.AsyncClient, send: Callable[[int], Any], requests: int, concurrency: int):
+    # `concurrency` workers pull request numbers until `requests` are sent
+    numbers = iter(range(requests))
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+
+    async def worker():
+        for number in numbers:
+            started = time.perf_counter()
+            try:
+                response = await send(number)
+                statuses[str(response.status_code)] += 1
+            except httpx.HTTPError as e:
+                statuses[type(e).__name__] += 1
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - started
+
+    latencies_ms = np.array(latencies) * 1000
+    p50, p95, p99 = np.percentile(latencies_ms, [50, 95, 99])
+    ok = sum(count for status, count in statuses.items() if status.startswith("2"))
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "duration_s": round(elapsed, 3),
+        "throughput_rps": round(requests / elapsed, 1),
+        "success_rate": round(ok / requests, 4),
+        "statuses": dict(statuses),
+        "latency_ms": {
+            "mean": round(float(latencies_ms.mean()), 2),
+            "p50": round(float(p50), 2),
+            "p95": round(float(p95), 2),
+            "p99": round(float(p99), 2),
+            "max": round(float(latencies_ms.max()), 2)
+        }
+    }
+
+
+class Scenarios:
+    # Each scenario returns the `send(number)` coroutine function for drive()
+
+    def __init__(self, client: httpx.AsyncClient, args):
+        self.client = client
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.ips = itertools.count(1)
+        self.email = f"bench-{uuid.uuid4().hex[:8]}@example.com"
+        self.token: Optional[str] = None
+
+    def headers(self, ip: Optional[str] = None) -> Dict[str, str]:
+        headers = {"X-Forwarded-For": ip or client_ip(next(self.ips))}
+        if self.token:
+            headers["Authorization"] = f"Bearer {self.token}"
+        return headers
+
+    async def setup(self):
+        credentials = {"email": self.email, "password": "benchmark-password"}
+        response = await self.client.post("/auth/register", headers=self.headers(),
+                                          json={**credentials, "first_name": "Bench", "last_name": "Mark"})
+        if response.status_code != 201:
+            sys.exit(f"Could not register the benchmark user: {response.status_code} {response.text}")
+        self.token = response.json()["access_token"]
+        # Warm the hot set so "hits" are cache hits
+        for dish in HOT_DISHES:
+            await self.client.post("/get-calories", headers=self.headers(), json={"dish_name": dish, "servings": 1})
+
+    def login(self):
+        credentials = {"email": self.email, "password": "benchmark-password"}
+        return lambda number: self.client.post("/auth/login", headers=self.headers(), json=credentials)
+
+    def calories(self):
+        def send(number: int):
+            if self.rng.random() < self.args.miss_ratio:
+                dish = f"{self.rng.choice(MISS_WORDS)} {self.rng.choice(HOT_DISHES)} {uuid.uuid4().hex[:6]}"
+            else:
+                dish = self.rng.choice(HOT_DISHES)
+            servings = self.rng.randint(1, 3)
+            return self.client.post("/get-calories", headers=self.headers(),
+                                    json={"dish_name": dish, "servings": servings})
+        return send
+
+    def rate_limit(self):
+        # A handful of clients, each well over the limit: measures the
+        # limiter itself (an unknown path, so nothing runs after it)
+        ips = [client_ip(250 * 65536 + client) for client in range(self.args.rate_limit_clients)]
+        return lambda number: self.client.get(PROBE_PATH, headers=self.headers(ips[number % len(ips)]))
+
+
+def compare(results: Dict[str, Any], baseline_path: str):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    print(f"\nvs {baseline_path} ({(baseline.get('commit') or 'unknown')[:10]})")
+    print(f"{'run':<22} {'rps':>14} {'p50 ms':>14} {'p99 ms':>14}")
+    for name, run in results["runs"].items():
+        before = baseline["runs"].get(name)
+        if before is None:
+            continue
+
+        def change(new: float, old: float) -> str:
+            return f"{(new - old) / old * 100:+.1f}%" if old else "n/a"
+
+        print(f"{name:<22} {change(run['throughput_rps'], before['throughput_rps']):>14} "
+              f"{change(run['latency_ms']['p50'], before['latency_ms']['p50']):>14} "
+              f"{change(run['latency_ms']['p99'], before['latency_ms']['p99']):>14}")
+
+
+async def run(args) -> Dict[str, Any]:
+    stub = USDAStub(args.usda_latency_ms, args.usda_jitter_ms, args.usda_rate_limited,
+                    load_recording(args.usda_recording), seed=args.seed)
+    usda_url = stub.start(port=free_port())
+    redis_port = None
+    if args.fakeredis:
+        redis_port = free_port()
+        start_fakeredis(redis_port)
+
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    process = start_service(args, port, usda_url, redis_port)
+    runs = {}
+    try:
+        await wait_until_ready(base_url, process)
+        limits = httpx.Limits(max_connections=max(args.concurrency), max_keepalive_connections=max(args.concurrency))
+        async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60.0) as client:
+            scenarios = Scenarios(client, args)
+            await scenarios.setup()
+            for scenario in args.scenarios:
+                for concurrency in args.concurrency:
+                    name = f"{scenario}@{concurrency}"
+                    runs[name] = await drive(client, getattr(scenarios, scenario)(), args.requests, concurrency)
+                    latency = runs[name]["latency_ms"]
+                    print(f"{name:<22} {runs[name]['throughput_rps']:>9} rps  p50 {latency['p50']:>8} ms  "
+                          f"p95 {latency['p95']:>8} ms  p99 {latency['p99']:>8} ms  {runs[name]['statuses']}")
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+        stub.stop()
+
+    return {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "compare")},
+        "usda_stub": dict(stub.stats),
+        "runs": runs
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", nargs="+", choices=["login", "calories", "rate_limit"],
+                        default=["login", "calories", "rate_limit"])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=500, help="requests per scenario and concurrency level")
+    parser.add_argument("--miss-ratio", type=float, default=0.1)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers for the API")
+    parser.add_argument("--rate-limit", type=int, default=100, help="RATE_LIMIT per client per minute")
+    parser.add_argument("--rate-limit-clients", type=int, default=4)
+    parser.add_argument("--usda-latency-ms", type=float, default=80.0)
+    parser.add_argument("--usda-jitter-ms", type=float, default=20.0)
+    parser.add_argument("--usda-rate-limited", type=float, default=0.0, help="share of USDA calls answered 429")
+    parser.add_argument("--usda-recording", help="JSON file mapping query -> recorded USDA search response")
+    parser.add_argument("--food-index", help="FOOD_INDEX_PATH for the API (default: none)")
+    parser.add_argument("--fakeredis", action="store_true", help="serve Redis from an in-process fakeredis")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="results file (default: benchmarks/results/<commit>-<time>.json)")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    output = args.output or os.path.join(
+        BENCHMARK_DIR, "results", f"{(results['commit'] or 'unknown')[:10]}-{int(time.time())}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults written to {output}")
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""Micro-benchmark: legacy FoodMatcher word scoring vs the ranking engine.
+
+Usage:
+    python benchmarks/matcher_benchmark.py [--sizes 5 50 200] [--repeat 200]
+"""
+import argparse
+import os
+import random
+import sys
+import timeit
+from typing import Any, List
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils.ranking import RankingEngine
+
+
+WORDS = ["chicken", "breast", "raw", "cooked", "roasted", "egg", "eggplant", "whole", "fried", "rice",
+         "white", "brown", "pizza", "cheese", "pepperoni", "frozen", "apple", "juice", "pineapple", "salad",
+         "dressing", "beef", "ground", "lean", "pasta", "sauce", "tomato", "canned", "sweetened", "bread"]
+
+
+class LegacyFoodMatcher:
+    # FoodMatcher as it was before the ranking engine, kept for comparison
+
+    def calculate_word_score(self, dish_name: str, description: str) -> float:
+        dish_name_words = dish_name.lower().split()
+        description_lower = description.lower()
+        matches = sum(1 for word in dish_name_words if word in description_lower)
+        return matches / len(dish_name_words)
+
+    def find_best_match(self, dish_name: str, foods: List[Any]):
+        scores = np.array([
+            self.calculate_word_score(dish_name, item["description"])
+            for item in foods
+        ])
+        best_score = np.max(scores)
+        best_score_index = np.where(scores == best_score)[0]
+        return foods[best_score_index[0]]
+
+
+def make_foods(size: int, rng: random.Random):
+    return [{"description": ", ".join(rng.sample(WORDS, rng.randint(2, 8))).capitalize()} for _ in range(size)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[5, 50, 200])
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    queries = ["chicken breast", "fried rice", "egg", "pepperoni pizza", "apple juice", "ground beef"]
+    legacy = LegacyFoodMatcher()
+    engine = RankingEngine()
+
+    print(f"{'candidates':>10} {'legacy us/call':>15} {'engine us/call':>15} {'speedup':>8}")
+    for size in args.sizes:
+        candidate_sets = [make_foods(size, rng) for _ in queries]
+
+        def run_legacy():
+            for query, foods in zip(queries, candidate_sets):
+                legacy.find_best_match(query, foods)
+
+        def run_engine():
+            for query, foods in zip(queries, candidate_sets):
+                foods[engine.best_index(query, [food["description"] for food in foods])]
+
+        calls = args.repeat * len(queries)
+        legacy_us = min(timeit.repeat(run_legacy, number=args.repeat, repeat=3)) / calls * 1e6
+        engine_us = min(timeit.repeat(run_engine, number=args.repeat, repeat=3)) / calls * 1e6
+        print(f"{size:>10} {legacy_us:>15.1f} {engine_us:>15.1f} {legacy_us / engine_us:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
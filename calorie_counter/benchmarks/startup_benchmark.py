@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""Cold-start benchmark: how long a fresh worker takes to import the app and run its startup.
+
+Usage:
+    python benchmarks/startup_benchmark.py [--runs 5] [--budget-ms 1500] [--top 15]
+
+Each run is a new interpreter that imports `main` and enters the app's
+lifespan, as a uvicorn worker does before it accepts requests. Startup waits on no
+connection, so no PostgreSQL or Redis is needed, but the usual settings must
+be in the environment or .env. Exits with status 1 when the median cold start
+(import + lifespan) is over --budget-ms, or when a module that should load
+lazily was loaded during startup, so it can gate CI. --top also lists the
+slowest top-level imports of one run, from python -X importtime.
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that should only load when a request needs them
+LAZY_MODULES = ["numpy"]
+
+SNIPPET = """
+import asyncio, json, sys, time
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+
+async def start():
+    async with main.app.router.lifespan_context(main.app):
+        return time.perf_counter()
+
+ready = asyncio.run(start())
+loaded = [name for name in %r if type(sys.modules.get(name)).__name__ == "module"]
+print(json.dumps({"import_ms": (imported - started) * 1000, "lifespan_ms": (ready - imported) * 1000,
+                  "loaded": loaded}))
+""" % LAZY_MODULES
+
+
+def run_once():
+    started = time.perf_counter()
+    output = subprocess.run([sys.executable, "-c", SNIPPET], cwd=APP_DIR, capture_output=True, text=True, check=True)
+    result = json.loads(output.stdout.strip().splitlines()[-1])
+    result["process_ms"] = (time.perf_counter() - started) * 1000
+    return result
+
+
+def slowest_imports(top: int):
+    # Cumulative time per top-level package (wherever it was first imported
+    # from), from one -X importtime run
+    output = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"],
+                            cwd=APP_DIR, capture_output=True, text=True, check=True)
+    totals = defaultdict(int)
+    for line in output.stderr.splitlines():
+        match = re.match(r"import time:\s+\d+ \|\s+(\d+) \|\s*(\S+)$", line)
+        if match and "." not in match.group(2) and match.group(2) != "main":
+            totals[match.group(2)] = max(totals[match.group(2)], int(match.group(1)))
+    return sorted(totals.items(), key=lambda item: -item[1])[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=1500.0)
+    parser.add_argument("--top", type=int, default=0, help="also list the N slowest top-level imports")
+    args = parser.parse_args()
+
+    results = [run_once() for _ in range(args.runs)]
+    median = {key: statistics.median(result[key] for result in results)
+              for key in ("import_ms", "lifespan_ms", "process_ms")}
+    cold_start = median["import_ms"] + median["lifespan_ms"]
+    print(f"median of {args.runs} runs: import {median['import_ms']:.0f} ms, lifespan {median['lifespan_ms']:.0f} ms, "
+          f"whole process {median['process_ms']:.0f} ms")
+    loaded = results[-1]["loaded"]
+    if loaded:
+        print(f"FAIL: {', '.join(loaded)} loaded at startup, although only requests need them")
+
+    if args.top:
+        print(f"\n{'module':>24} {'cumulative ms':>14}")
+        for name, micros in slowest_imports(args.top):
+            print(f"{name:>24} {micros / 1000:>14.1f}")
+        print()
+
+    if cold_start > args.budget_ms:
+        print(f"FAIL: cold start {cold_start:.0f} ms is over the {args.budget_ms:.0f} ms budget")
+    if cold_start > args.budget_ms or loaded:
+        sys.exit(1)
+    print(f"OK: cold start {cold_start:.0f} ms is within the {args.budget_ms:.0f} ms budget")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""Local stand-in for the USDA FoodData Central search and food-details API.
+
+Serves recorded responses (a JSON file mapping query -> search response) and
+synthesizes a deterministic match for any other query, after a configurable
+latency, answering 429 for a configurable share of requests. Full records for
+any fdcIds, with one household portion each, are synthesized the same way.
+
+Usage:
+    python benchmarks/usda_stub.py [--port 8765] [--latency-ms 80] [--jitter-ms 20]
+                                   [--rate-limited 0.01] [--recording responses.json]
+"""
+import argparse
+import asyncio
+import json
+import random
+import threading
+import time
+from typing import Any, Dict, Optional
+import uvicorn
+from fastapi import FastAPI, Query
+from fastapi.responses import JSONResponse
+
+
+SEARCH_PATH = "/fdc/v1/foods/search"
+FOODS_PATH = "/fdc/v1/foods"
+
+
+def synthesize(query: str) -> Dict[str, Any]:
+    # Stable per query, so repeated runs see the same foods
+    rng = random.Random(query)
+    foods = []
+    for position in range(5):
+        description = query.capitalize() if position == 0 else f"{query.capitalize()}, variant {position}"
+        foods.append({
+            "fdcId": rng.randint(100000, 999999),
+            "description": description,
+            "dataType": "Survey (FNDDS)",
+            "foodNutrients": [
+                {"nutrientId": 1008, "value": round(rng.uniform(20, 500), 1)},
+                {"nutrientId": 1003, "value": round(rng.uniform(0, 30), 1)},
+                {"nutrientId": 1004, "value": round(rng.uniform(0, 30), 1)},
+                {"nutrientId": 1005, "value": round(rng.uniform(0, 60), 1)}
+            ]
+        })
+    return {"totalHits": len(foods), "foods": foods}
+
+
+def synthesize_record(fdc_id: int) -> Dict[str, Any]:
+    rng = random.Random(fdc_id)
+    return {"fdcId": fdc_id, "foodPortions": [{
+        "sequenceNumber": 1, "amount": 1.0, "measureUnit": {"name": "cup"}, "modifier": "",
+        "gramWeight": round(rng.uniform(30, 300), 1)
+    }]}
+
+
+class USDAStub:
+    # The stub app plus the knobs the benchmark turns; `stats` counts what it
+    # served so a run can check how many lookups actually reached "USDA".
+
+    def __init__(self, latency_ms: float = 80.0, jitter_ms: float = 20.0, rate_limited: float = 0.0,
+                 recording: Optional[Dict[str, Any]] = None, seed: int = 42):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.rate_limited = rate_limited
+        self.recording = recording or {}
+        self.rng = random.Random(seed)
+        self.stats = {"requests": 0, "rate_limited": 0, "recorded": 0, "synthesized": 0, "details": 0}
+        self.app = FastAPI(title="USDA stub")
+        self.app.get(SEARCH_PATH)(self.search)
+        self.app.get(FOODS_PATH)(self.foods)
+        self.server: Optional[uvicorn.Server] = None
+
+    async def respond(self) -> Optional[JSONResponse]:
+        # Latency and rate limiting, shared by both endpoints
+        self.stats["requests"] += 1
+        delay = max(0.0, self.latency_ms + self.rng.uniform(-self.jitter_ms, self.jitter_ms)) / 1000
+        await asyncio.sleep(delay)
+        if self.rng.random() < self.rate_limited:
+            self.stats["rate_limited"] += 1
+            return JSONResponse(status_code=429, content={"error": {"code": "OVER_RATE_LIMIT"}})
+        return None
+
+    async def search(self, query: str = Query(...)):
+        limited = await self.respond()
+        if limited is not None:
+            return limited
+        if query in self.recording:
+            self.stats["recorded"] += 1
+            return self.recording[query]
+        self.stats["synthesized"] += 1
+        return synthesize(query)
+
+    async def foods(self, fdcIds: str = Query(...)):
+        limited = await self.respond()
+        if limited is not None:
+            return limited
+        self.stats["details"] += 1
+        return [synthesize_record(int(fdc_id)) for fdc_id in fdcIds.split(",")]
+
+    def start(self, host: str = "127.0.0.1", port: int = 8765):
+        # Runs on its own thread and event loop so it does not compete with
+        # the load generator
+        self.server = uvicorn.Server(uvicorn.Config(self.app, host=host, port=port, log_level="warning"))
+        threading.Thread(target=self.server.run, daemon=True).start()
+        while not self.server.started:
+            time.sleep(0.01)
+        return f"http://{host}:{port}{SEARCH_PATH}"
+
+    def stop(self):
+        if self.server is not None:
+            self.server.should_exit = True
+
+
+def load_recording(path: Optional[str]) -> Dict[str, Any]:
+    if not path:
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=80.0)
+    parser.add_argument("--jitter-ms", type=float, default=20.0)
+    parser.add_argument("--rate-limited", type=float, default=0.0, help="share of requests answered with 429")
+    parser.add_argument("--recording", help="JSON file mapping query -> recorded search response")
+    args = parser.parse_args()
+
+    stub = USDAStub(args.latency_ms, args.jitter_ms, args.rate_limited, load_recording(args.recording))
+    uvicorn.run(stub.app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,27 @@
+#!/usr/bin/env python3
+"""Build the offline FoodData Central index from a bulk download.
+
+Usage:
+    python build_food_index.py <FoodData_Central_csv_dir | FoodData_Central_*.json> [output.sqlite3]
+
+The output defaults to FOOD_INDEX_PATH. Download the bulk data from
+https://fdc.nal.usda.gov/download-datasets.html
+"""
+import sys
+import time
+from app.core.config import settings
+from app.utils.food_index import FoodIndexBuilder
+
+
+if len(sys.argv) < 2:
+    print(__doc__)
+    sys.exit(1)
+
+output = sys.argv[2] if len(sys.argv) > 2 else settings.food_index_path
+if not output:
+    print("No output path given and FOOD_INDEX_PATH is not set")
+    sys.exit(1)
+
+started = time.perf_counter()
+count = FoodIndexBuilder(output).build(sys.argv[1])
+print(f"Indexed {count} foods into {output} in {time.perf_counter() - started:.1f}s")
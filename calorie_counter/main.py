@@ -1,17 +1,51 @@
-from fastapi import FastAPI, HTTPException, Request
+import time
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Request, Response
 from fastapi.exceptions import RequestValidationError
-from app.api import user_router, calorie_router
+from app.api import user_router, calorie_router, meal_router
 from app.utils.user import format_error_response
-from app.utils.calorie import RedisCache
-from app.core.config import settings
+from app.utils.rate_limit import rate_limiter
+from app.core.database import init_engines, dispose_engines, init_redis_client, close_redis_client
+from app.core.http_client import init_http_client, close_http_client
+from app.core.metrics import request_latency, time_stage, render_metrics, mark_worker_dead
+from app.utils.local_cache import invalidation_listener
+from app.utils.calorie import bucket_sweeper
+from app.utils.food_index import get_food_index, close_food_index
+from app.utils.suggest import suggestion_sync
+from app.utils.meal_log import meal_log_writer
+from app.utils.profiling import request_profiler
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    init_engines()
+    init_redis_client()
+    init_http_client()
+    get_food_index()
+    invalidation_listener.start()
+    suggestion_sync.start()
+    meal_log_writer.start()
+    bucket_sweeper.start()
+    yield
+    await bucket_sweeper.stop()
+    await meal_log_writer.stop()
+    await dispose_engines()
+    await suggestion_sync.stop()
+    await invalidation_listener.stop()
+    close_food_index()
+    await close_http_client()
+    await close_redis_client()
+    mark_worker_dead()
 
 
 app = FastAPI(
-    title="Meal Calorie Counter"
+    title="Meal Calorie Counter",
+    lifespan=lifespan
 )
 
 app.include_router(user_router)
 app.include_router(calorie_router)
+app.include_router(meal_router)
 
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request: Request, exc: HTTPException):
@@ -23,22 +57,55 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
     return format_error_response(422, messages)
 
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    content, content_type = render_metrics()
+    return Response(content=content, media_type=content_type)
+
+
 @app.middleware("http")
 async def rate_limit_middleware(request: Request, call_next):
-    client = request.client.host
-    key = f"rate_limit:{client}"
-    cache = RedisCache()
-    current_count = cache.redis_client.incr(key)
+    cost = rate_limiter.cost_for(request.url.path)
+    if not cost:
+        return await call_next(request)
 
-    if current_count == 1:
-        cache.redis_client.expire(key, settings.rate_limit_time)
+    client = request.client.host
+    with time_stage("rate_limit"):
+        result = await rate_limiter.hit(f"rate_limit:{client}", cost=cost)
 
-    if current_count > settings.rate_limit:
-        ttl = cache.redis_client.ttl(key) 
-        return format_error_response(
+    if not result.allowed:
+        response = format_error_response(
             status_code=429,
-            message=f"Too many requests. Try again in {ttl} seconds."
+            message=f"Too many requests. Try again in {result.headers()['Retry-After']} seconds."
         )
+        response.headers.update(result.headers())
+        return response
+
+    response = await call_next(request)
+    if not is_cacheable(response):
+        response.headers.update(result.headers())
+    return response
+
+
+def is_cacheable(response: Response) -> bool:
+    # A stored copy would replay this request's quota to later ones
+    cache_control = response.headers.get("Cache-Control", "")
+    return bool(cache_control) and "no-store" not in cache_control
+
 
+if request_profiler.enabled:
+    app.middleware("http")(request_profiler.middleware)
+
+
+@app.middleware("http")
+async def metrics_middleware(request: Request, call_next):
+    # Outermost middleware, so rejected (429) requests are measured too.
+    # Routes are labelled by template ("/meals/history", not the raw URL) to
+    # keep label cardinality bounded.
+    started = time.perf_counter()
     response = await call_next(request)
-    return response
\ No newline at end of file
+    route = request.scope.get("route")
+    request_latency.labels(
+        request.method, route.path if route is not None else "unmatched", response.status_code
+    ).observe(time.perf_counter() - started)
+    return response
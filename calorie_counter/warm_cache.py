@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""Pre-warm the dish cache before switching traffic to a new Redis or region.
+
+Usage:
+    python warm_cache.py dishes.txt [--state dishes.txt.warmed] [--concurrency 8] [--batch-size 100]
+    python warm_cache.py --popular 5000 [...]
+    python warm_cache.py --popular 5000 --dump hot_dishes.txt
+
+Dish names are read one per line, or taken from the cluster's most
+looked-up dishes with --popular. --dump only writes those names to a file, e.g.
+to carry them from an old region to a new one. Lookups run at background
+priority within the shared USDA quota. Finished dishes are recorded in the
+state file, so re-running the same command resumes an interrupted warm-up.
+The state file is removed once a run finishes.
+"""
+import argparse
+import asyncio
+from app.core.database import init_redis_client, close_redis_client
+from app.core.http_client import init_http_client, close_http_client
+from app.utils.food_index import get_food_index, close_food_index
+from app.utils.cache_warmer import CacheWarmer, popular_dishes
+
+
+async def main(args):
+    init_redis_client()
+    init_http_client()
+    get_food_index()
+    try:
+        if args.popular:
+            names = await popular_dishes(args.popular)
+            if args.dump:
+                with open(args.dump, "w") as f:
+                    f.writelines(f"{name}\n" for name in names)
+                print(f"Wrote {len(names)} dish names to {args.dump}")
+                return
+        else:
+            with open(args.dishes) as f:
+                names = f.read().splitlines()
+
+        state = args.state or f"{args.dishes or 'popular'}.warmed"
+        warmer = CacheWarmer(state, concurrency=args.concurrency, batch_size=args.batch_size,
+                             force=args.force, progress_interval=args.progress_interval)
+        await warmer.run(names)
+    finally:
+        close_food_index()
+        await close_http_client()
+        await close_redis_client()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("dishes", nargs="?", help="file with one dish name per line")
+    parser.add_argument("--popular", type=int, help="warm the N most looked-up dishes instead")
+    parser.add_argument("--dump", help="with --popular, only write the names to this file")
+    parser.add_argument("--state", help="resume file (default: <dishes>.warmed or popular.warmed)")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--progress-interval", type=float, default=5.0)
+    parser.add_argument("--force", action="store_true", help="also refresh dishes that are already cached")
+    args = parser.parse_args()
+    if not args.dishes and not args.popular:
+        parser.error("give a dish list file or --popular N")
+    try:
+        asyncio.run(main(args))
+    except KeyboardInterrupt:
+        print("Interrupted; run the same command again to resume")